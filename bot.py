@@ -16,14 +16,26 @@ from discord.ext import commands, tasks
 from cogs.cache import InitializedSlashCommands
 from cogs.errors import CommandIsNotAvailable
 from core.config import ConfigManager
+from core.audio_workers import AudioWorkerPool
+from core.broadcast import BroadcastHub
 from core.errors import VoiceChannelWithUserNotFoundError, BotIsNotRunningError, PlayerCriticalError, \
     InsufficientPermissionsToExecuteCommand
+from core.ffmpeg_pool import FFmpegProcessPool
+from core.launch_profiles import LaunchProfiles
+from core.loudness import LoudnessSettings
 from core.log_utils import get_logger
+from core.path_utils import get_path_to_static_file
+from storage.registry import MetadataRegistry
+from storage.trackindex import TrackSearchIndex
 from core.wrappers import ContextWrapper
 from utils.taskmanager.protocols import TaskManagerProtocol
 from utils.taskmanager.taskmanager import TaskManager
+from utils.looplag import EventLoopLagMonitor
+from utils.timerwheel import TimerWheel
 from core.thread import ThreadManager
+from yandex.autocomplete import AutocompleteEngine
 from yandex.client import YandexMusicBase, YandexMusicAccount
+from yandex.speculative import SpeculativeResolver
 from core.help import CactusDiscordHelpCommand
 from core.message_manager import MessageManager
 from core.factories import BotFactory
@@ -51,13 +63,42 @@ class CactusDiscordBot(commands.Bot):
         super().__init__(command_prefix=self._config["prefix"], help_command=help_command, intents=intents)
 
         self._thread_manager = ThreadManager(self)
-        self._yandex_music = YandexMusicAccount(self._config)
+        self._track_index = TrackSearchIndex(get_path_to_static_file("track_index.json.gz"),
+                                             int(self._config["track_index_max_tracks"]),
+                                             float(self._config["track_index_guild_play_weight"]))
+        self._track_index.load()
+        self._metadata_registry = MetadataRegistry()
+        self._yandex_music = YandexMusicAccount(self._config, self._track_index, self._metadata_registry)
+        self._autocomplete = AutocompleteEngine(self._yandex_music, self._track_index, self._config)
+        self._timer_wheel: TimerWheel = TimerWheel()
+        self._speculative = SpeculativeResolver(self._yandex_music, self._config, self._timer_wheel)
         self.__loaded_cogs = ["cogs.music", "cogs.player", "cogs.utils"]
         if self._config["slash_supported"]:
             self.__loaded_cogs.extend(["cogs.musicslash", "cogs.playerslash", "cogs.utilsslash"])
         self._database_api = ClientDataBaseAPI(self._config)
         self._bot_factory = BotFactory(self, self._config)
         self._task_manager: TaskManager = TaskManager()
+        loudness_settings = LoudnessSettings(enabled=self._config.get_bool("loudness_normalization"),
+                                             target=float(self._config["loudness_target"]),
+                                             max_gain=float(self._config["loudness_max_gain"]),
+                                             peak_limit=float(self._config["loudness_peak_limit"]))
+        self._launch_profiles: LaunchProfiles = LaunchProfiles(get_path_to_static_file("launch_profiles.json"),
+                                                               int(self._config["launch_profiles_max_files"]),
+                                                               loudness_settings,
+                                                               int(self._config["loudness_analysis_concurrency"]))
+        self._launch_profiles.load()
+        self._audio_workers: AudioWorkerPool | None = None
+        if int(self._config["audio_workers"]) > 0:
+            self._audio_workers = AudioWorkerPool(int(self._config["audio_workers"]),
+                                                  int(self._config["audio_workers_buffer_frames"]))
+            self._audio_workers.start()
+        self._ffmpeg_pool: FFmpegProcessPool = FFmpegProcessPool(int(self._config["ffmpeg_pool_idle_processes"]),
+                                                                 int(self._config["ffmpeg_pool_max_processes"]),
+                                                                 float(self._config["ffmpeg_pool_idle_lifetime"]),
+                                                                 self._launch_profiles,
+                                                                 self._audio_workers)
+        self._loop_lag_monitor: EventLoopLagMonitor = EventLoopLagMonitor()
+        self._broadcast_hub: BroadcastHub = BroadcastHub(self._bot_factory.create_broadcast_station)
         self._bot_is_running: bool = False
         # Все команды через слеш
         self._initialized_slash_commands: InitializedSlashCommands = InitializedSlashCommands(self._config)
@@ -100,6 +141,34 @@ class CactusDiscordBot(commands.Bot):
         """
         return self._yandex_music
 
+    @property
+    def track_index(self) -> TrackSearchIndex:
+        """
+            Все треки, которые бот когда-либо получал. Один на все гильдии
+        """
+        return self._track_index
+
+    @property
+    def metadata_registry(self) -> MetadataRegistry:
+        """
+            Треки и альбомы, общие для всех гильдий
+        """
+        return self._metadata_registry
+
+    @property
+    def autocomplete(self) -> AutocompleteEngine:
+        """
+            Подсказки для команды /play. Один кэш на все гильдии
+        """
+        return self._autocomplete
+
+    @property
+    def speculative(self) -> SpeculativeResolver:
+        """
+            Заранее подготовленные первые подсказки /play
+        """
+        return self._speculative
+
     @property
     def factory(self) -> BotFactory:
         return self._bot_factory
@@ -128,6 +197,27 @@ class CactusDiscordBot(commands.Bot):
     def task_manager(self) -> TaskManagerProtocol:
         return self._task_manager
 
+    @property
+    def timer_wheel(self) -> TimerWheel:
+        """
+            Все таймеры бота (например, отключение от голосового канала). Один на все гильдии
+        """
+        return self._timer_wheel
+
+    @property
+    def ffmpeg_pool(self) -> FFmpegProcessPool:
+        """
+            Заранее запущенные процессы FFmpeg. Один на все гильдии
+        """
+        return self._ffmpeg_pool
+
+    @property
+    def broadcast_hub(self) -> BroadcastHub:
+        """
+            Общие эфиры. Одна станция на запрос, сколько бы гильдий ее ни слушало
+        """
+        return self._broadcast_hub
+
     async def is_owner(self, user: discord.User) -> bool:
         if user.id in self.bot_owner_ids:
             return True
@@ -215,11 +305,23 @@ class CactusDiscordBot(commands.Bot):
 
         await self._thread_manager.init()
 
+        self._loop_lag_monitor.start()
         self.autoupdate.start()
         self.__process_task_manager.start()
         logger.info("Bot is ready to work.")
         self._bot_is_running = True
 
+    async def close(self) -> None:
+        await self.__save_track_index()
+        await self.__save_launch_profiles()
+        await self._yandex_music.close()
+        self._broadcast_hub.close()
+        self._ffmpeg_pool.close()
+        if self._audio_workers is not None:
+            self._audio_workers.close()
+        self._loop_lag_monitor.stop()
+        await super().close()
+
     async def on_connect(self) -> None:
         await self.load_extensions()
         await self._yandex_music.init()
@@ -383,6 +485,16 @@ class CactusDiscordBot(commands.Bot):
             Код вызывается раз в час
         """
         await self._thread_manager.update_thread()
+        self._yandex_music.log_statistics()
+        self._metadata_registry.log_statistics()
+        self._timer_wheel.log_statistics()
+        self._ffmpeg_pool.log_statistics()
+        self._broadcast_hub.log_statistics()
+        self._loop_lag_monitor.log_statistics()
+        # Заодно заменяем устаревшие и завершившиеся ждущие процессы
+        await asyncio.to_thread(self._ffmpeg_pool.warm_up)
+        await self.__save_track_index()
+        await self.__save_launch_profiles()
 
     @tasks.loop(seconds=1)
     async def __process_task_manager(self) -> None:
@@ -408,6 +520,31 @@ class CactusDiscordBot(commands.Bot):
             return ctx.command.name in self.config["commands_that_ignore_music_text_channel"]
         return False
 
+    async def __save_track_index(self) -> None:
+        snapshot = self._track_index.get_snapshot()
+        if snapshot is None:
+            return
+
+        try:
+            # Запись файла не должна блокировать event loop
+            await asyncio.to_thread(self._track_index.save_snapshot, snapshot)
+            self._track_index.mark_saved()
+            logger.info(f"Track index saved: {len(snapshot)} tracks.")
+        except OSError as e:
+            logger.error(f"Failed to save the track index: {e}.")
+
+    async def __save_launch_profiles(self) -> None:
+        snapshot = self._launch_profiles.get_snapshot()
+        if snapshot is None:
+            return
+
+        try:
+            await asyncio.to_thread(self._launch_profiles.save_snapshot, snapshot)
+            self._launch_profiles.mark_saved()
+            logger.info(f"Launch profiles saved: {len(snapshot)} files.")
+        except OSError as e:
+            logger.error(f"Failed to save launch profiles: {e}.")
+
     async def __wait_for_connected(self) -> None:
         await self.wait_until_ready()
         await self._connected.wait()
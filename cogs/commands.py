@@ -6,7 +6,7 @@ from bot import CactusDiscordBot
 from core.interaction import SenderMessagesWithGuild
 from core.log_utils import get_logger
 from core.playerfacade import PlayerFacade
-from core.string_utils import check_yandex_url
+from core.string_utils import check_yandex_url, parse_time
 
 logger = get_logger(__name__)
 
@@ -16,7 +16,10 @@ async def play_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordB
         Совмещает в себя все команды
     """
     api = bot.yandex_music_api
-    yandex_music_api = api.get_automatic_request(request=request, max_tracks=1)
+    # Если пользователь выбрал заранее подготовленную подсказку, данные уже получены
+    yandex_music_api = bot.speculative.take(interaction.guild_id, request)
+    if yandex_music_api is None:
+        yandex_music_api = api.get_automatic_request(request=request, max_tracks=1)
 
     thread = bot.thread_manager.get_thread_by_guild_id(interaction.guild_id)
     content = bot.config["messages"]["command_play_running"]
@@ -25,6 +28,22 @@ async def play_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordB
     await thread.player.add_track_request_and_play(yandex_music_api)
 
 
+async def radio_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot, request: str) -> None:
+    """
+        Подключает гильдию к общему эфиру. Эфир с тем же запросом уже может идти на других серверах
+    """
+    api = bot.yandex_music_api
+    max_tracks = int(bot.config["broadcast_max_tracks"])
+    thread = bot.thread_manager.get_thread_by_guild_id(interaction.guild_id)
+    content = bot.config["messages"]["command_radio_running"].format(request)
+
+    # Первый запуск станции загружает треки, поэтому отвечаем заранее
+    await bot.message_manager.send_message(interaction, content=content)
+    listener = await bot.broadcast_hub.subscribe(
+        request, lambda: api.get_automatic_request(request=request, max_tracks=max_tracks))
+    await thread.player.play_broadcast(listener)
+
+
 async def favorite_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot) -> None:
     api = bot.yandex_music_api
     yandex_music_api = api.get_request_from_favorite(index=0)
@@ -98,6 +117,15 @@ async def loop_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordB
     await bot.message_manager.send_message(interaction, content=message)
 
 
+async def shuffle_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot, player: PlayerFacade) -> None:
+    await player.change_shuffle()
+    if player.is_shuffle():
+        message = bot.config["messages"]["shuffle_command_completed_on"]
+    else:
+        message = bot.config["messages"]["shuffle_command_completed_off"]
+    await bot.message_manager.send_message(interaction, content=message)
+
+
 async def pause_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot, player: PlayerFacade) -> None:
     await player.pause_track()
     if player.is_paused():
@@ -111,3 +139,49 @@ async def stop_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordB
     await player.stop_track(disconnect=False)
     message = bot.config["messages"]["stop_command_completed"]
     await bot.message_manager.send_message(interaction, content=message)
+
+
+async def remove_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot, player: PlayerFacade,
+                         number: int) -> None:
+    if await player.remove_track(number):
+        message = bot.config["messages"]["remove_command_completed"].format(number)
+    else:
+        message = bot.config["messages"]["queue_position_not_found"]
+    await bot.message_manager.send_message(interaction, content=message)
+
+
+async def move_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot, player: PlayerFacade,
+                       from_number: int, to_number: int) -> None:
+    if await player.move_track(from_number, to_number):
+        message = bot.config["messages"]["move_command_completed"].format(from_number, to_number)
+    else:
+        message = bot.config["messages"]["queue_position_not_found"]
+    await bot.message_manager.send_message(interaction, content=message)
+
+
+async def playnext_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot, player: PlayerFacade,
+                           number: int) -> None:
+    if await player.play_track_next(number):
+        message = bot.config["messages"]["playnext_command_completed"].format(number)
+    else:
+        message = bot.config["messages"]["queue_position_not_found"]
+    await bot.message_manager.send_message(interaction, content=message)
+
+
+async def jump_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot, player: PlayerFacade,
+                       number: int) -> None:
+    if await player.jump_to_track(number):
+        message = bot.config["messages"]["jump_command_completed"].format(number)
+    else:
+        message = bot.config["messages"]["queue_position_not_found"]
+    await bot.message_manager.send_message(interaction, content=message)
+
+
+async def seek_command(interaction: SenderMessagesWithGuild, bot: CactusDiscordBot, player: PlayerFacade,
+                       time: str) -> None:
+    position = parse_time(time)
+    if position is not None and await player.seek_track(position):
+        message = bot.config["messages"]["seek_command_completed"].format(time)
+    else:
+        message = bot.config["messages"]["seek_position_not_found"]
+    await bot.message_manager.send_message(interaction, content=message)
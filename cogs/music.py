@@ -1,7 +1,7 @@
 from discord.ext import commands
 
 from bot import CactusDiscordBot
-from cogs.commands import favorite_command, url_command, search_command, play_command
+from cogs.commands import favorite_command, url_command, search_command, play_command, radio_command
 from core.log_utils import get_logger
 from core.permissions import music_permissions
 from core.voice_utils import try_to_connect_to_voice_channel
@@ -76,6 +76,24 @@ class Music(commands.Cog, name="music"):
         wrapper = ContextWrapper(context)
         await play_command(wrapper, self._bot, request)
 
+    @commands.command(name="radio")
+    @commands.bot_has_guild_permissions(**music_permissions)
+    @check_availability_of_command()
+    async def radio(self, context: commands.Context, *request_dirty: str) -> None:
+        request = ' '.join(request_dirty)
+        if not request:
+            content = self._bot.config["messages"]["play_request_is_empty"]
+            await self.__send_message(context, message=content)
+            return
+
+        state = await self.__validation_and_send_message(context)
+        if not state:
+            return
+
+        logger.debug("Run radio command")
+        wrapper = ContextWrapper(context)
+        await radio_command(wrapper, self._bot, request)
+
     async def __validation_and_send_message(self, context: commands.Context) -> bool:
         state, message_key = await try_to_connect_to_voice_channel(self._bot.thread_manager,
                                                                    context,
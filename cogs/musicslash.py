@@ -5,14 +5,11 @@ from discord import app_commands
 from discord.ext import commands
 
 from bot import CactusDiscordBot
-from cogs.commands import favorite_command, url_command, search_command, play_command
+from cogs.commands import favorite_command, url_command, search_command, play_command, radio_command
 from core.log_utils import get_logger
 from core.voice_utils import try_to_connect_to_voice_channel
 from core.wrappers import InteractionWrapper
-from requests_to_music_service.executing_requests import ExecutingRequests
-from storage.data import TrackData
-from storage.storage import Storage
-from yandex.utils import get_track_wrapper, is_yandex_music_url
+from yandex.utils import is_yandex_music_url
 
 logger = get_logger(__name__)
 
@@ -62,6 +59,17 @@ class MusicSlash(commands.Cog, name="music_slash"):
         wrapper = InteractionWrapper(interaction.response, interaction.guild_id)
         await play_command(wrapper, self._bot, search)
 
+    @app_commands.command(name="radio", description="Включает общий эфир, который одновременно слушают все серверы с тем же запросом")
+    @app_commands.describe(request="Ссылка или запрос к Яндекс.Музыке")
+    async def _radio(self, interaction: discord.Interaction, request: str) -> None:
+        state = await self.__validation_and_send_message(interaction)
+        if not state:
+            return
+
+        logger.debug("Run radio command")
+        wrapper = InteractionWrapper(interaction.response, interaction.guild_id)
+        await radio_command(wrapper, self._bot, request)
+
     # @_search.autocomplete("search")  # Команда отключена
     async def __search_autocomplete(self, interaction: discord.Interaction, current: str) -> typing.List[app_commands.Choice]:
         if current is None:
@@ -70,7 +78,7 @@ class MusicSlash(commands.Cog, name="music_slash"):
         if len(current) < 1:
             return []
 
-        result = await self.__search_tracks(current)
+        result = await self.__search_tracks(interaction, current)
         return result
 
     @_play.autocomplete("search")
@@ -86,6 +94,8 @@ class MusicSlash(commands.Cog, name="music_slash"):
             return []
 
         if is_yandex_music_url(current):
+            # Ссылку пользователь уже вставил, скорее всего он ее и отправит
+            self._bot.speculative.prepare(interaction.guild_id, current)
             return []
 
         result: typing.List[app_commands.Choice] = []
@@ -99,25 +109,15 @@ class MusicSlash(commands.Cog, name="music_slash"):
         if current is None or len(current) < 0 or current == "":
             return []
 
-        result = await self.__search_tracks(current)
+        result = await self.__search_tracks(interaction, current)
+        if len(result) != 0:
+            # Обычно выбирают первую подсказку, готовим ее, пока пользователь смотрит на список
+            self._bot.speculative.prepare(interaction.guild_id, result[0].value)
         return result
 
-    async def __search_tracks(self, request: str) -> typing.List[app_commands.Choice]:
-        search_request = self._bot.yandex_music_api.get_request_by_search(request, max_tracks=10)
-        executing = ExecutingRequests(number_of_attempts=5, delay_between_errors=5)
-        storage = Storage(executing)
-        await storage.add(search_request)
-
-        tracks: typing.Tuple[TrackData] = storage.get_tracks_range(0, 10)
-        if len(tracks) == 0:
-            return []
-
-        wrappers = [get_track_wrapper(track, storage) for track in tracks]
-        result: typing.List[app_commands.Choice] = []
-        for track in wrappers:
-            choice = app_commands.Choice(name=track.get_name_to_search(), value=track.url)
-            result.append(choice)
-        return result
+    async def __search_tracks(self, interaction: discord.Interaction, request: str) -> typing.List[app_commands.Choice]:
+        choices = await self._bot.autocomplete.search(interaction.user.id, interaction.guild_id, request)
+        return [app_commands.Choice(name=choice.name, value=choice.value) for choice in choices]
 
     async def __validation_and_send_message(self, interaction: discord.Interaction) -> bool:
         if not isinstance(interaction.response, discord.InteractionResponse):
@@ -1,7 +1,8 @@
 from discord.ext import commands
 
 from bot import CactusDiscordBot
-from cogs.commands import previous_command, next_command, loop_command, pause_command, stop_command
+from cogs.commands import previous_command, next_command, loop_command, pause_command, stop_command, \
+    shuffle_command, remove_command, move_command, playnext_command, jump_command, seek_command
 from core.permissions import player_permissions
 from core.playerfacade import PlayerFacade
 from core.errors import BotIsNotRunningError
@@ -43,6 +44,16 @@ class Player(commands.Cog):
         wrapper = ContextWrapper(context)
         await loop_command(wrapper, self._bot, player)
 
+    @commands.command(name="shuffle")
+    @commands.bot_has_guild_permissions(**player_permissions)
+    async def shuffle(self, context: commands.Context) -> None:
+        player = self.__get_player_with_error_if_contains(context.guild.id)
+        if player is None:
+            return
+
+        wrapper = ContextWrapper(context)
+        await shuffle_command(wrapper, self._bot, player)
+
     @commands.command(name="pause")
     @commands.bot_has_guild_permissions(**player_permissions)
     async def pause(self, context: commands.Context) -> None:
@@ -76,6 +87,56 @@ class Player(commands.Cog):
 
         await player.show_track_queue()
 
+    @commands.command(name="remove")
+    @commands.bot_has_guild_permissions(**player_permissions)
+    async def remove(self, context: commands.Context, number: int) -> None:
+        player = self.__get_player_with_error_if_contains(context.guild.id)
+        if player is None:
+            return
+
+        wrapper = ContextWrapper(context)
+        await remove_command(wrapper, self._bot, player, number)
+
+    @commands.command(name="move")
+    @commands.bot_has_guild_permissions(**player_permissions)
+    async def move(self, context: commands.Context, from_number: int, to_number: int) -> None:
+        player = self.__get_player_with_error_if_contains(context.guild.id)
+        if player is None:
+            return
+
+        wrapper = ContextWrapper(context)
+        await move_command(wrapper, self._bot, player, from_number, to_number)
+
+    @commands.command(name="playnext")
+    @commands.bot_has_guild_permissions(**player_permissions)
+    async def playnext(self, context: commands.Context, number: int) -> None:
+        player = self.__get_player_with_error_if_contains(context.guild.id)
+        if player is None:
+            return
+
+        wrapper = ContextWrapper(context)
+        await playnext_command(wrapper, self._bot, player, number)
+
+    @commands.command(name="jump")
+    @commands.bot_has_guild_permissions(**player_permissions)
+    async def jump(self, context: commands.Context, number: int) -> None:
+        player = self.__get_player_with_error_if_contains(context.guild.id)
+        if player is None:
+            return
+
+        wrapper = ContextWrapper(context)
+        await jump_command(wrapper, self._bot, player, number)
+
+    @commands.command(name="seek")
+    @commands.bot_has_guild_permissions(**player_permissions)
+    async def seek(self, context: commands.Context, time: str) -> None:
+        player = self.__get_player_with_error_if_contains(context.guild.id)
+        if player is None:
+            return
+
+        wrapper = ContextWrapper(context)
+        await seek_command(wrapper, self._bot, player, time)
+
     def __get_player_with_error_if_contains(self, guild_id: int) -> PlayerFacade | None:
         thread = self._bot.thread_manager.get_thread_by_guild_id(guild_id)
 
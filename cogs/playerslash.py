@@ -3,7 +3,8 @@ from discord import app_commands
 from discord.ext import commands
 
 from bot import CactusDiscordBot
-from cogs.commands import previous_command, next_command, loop_command, pause_command, stop_command
+from cogs.commands import previous_command, next_command, loop_command, pause_command, stop_command, \
+    shuffle_command, remove_command, move_command, playnext_command, jump_command, seek_command
 from core.playerfacade import PlayerFacade
 from core.wrappers import InteractionWrapper
 
@@ -41,6 +42,15 @@ class PlayerSlash(commands.Cog, name="player_slash"):
         wrapper = InteractionWrapper(interaction.response, interaction.guild.id)
         await loop_command(wrapper, self._bot, player)
 
+    @app_commands.command(name="shuffle", description="Включает/Выключает перемешивание очереди")
+    async def _shuffle(self, interaction: discord.Interaction) -> None:
+        player = await self.__get_player_with_error_if_contains(interaction)
+        if player is None:
+            return
+
+        wrapper = InteractionWrapper(interaction.response, interaction.guild.id)
+        await shuffle_command(wrapper, self._bot, player)
+
     @app_commands.command(name="pause", description="Включает/Выключает паузу у трека")
     async def _pause(self, interaction: discord.Interaction) -> None:
         player = await self.__get_player_with_error_if_contains(interaction)
@@ -59,6 +69,57 @@ class PlayerSlash(commands.Cog, name="player_slash"):
         wrapper = InteractionWrapper(interaction.response, interaction.guild.id)
         await stop_command(wrapper, self._bot, player)
 
+    @app_commands.command(name="remove", description="Удаляет трек из очереди по его номеру")
+    @app_commands.describe(number="Номер трека в очереди")
+    async def _remove(self, interaction: discord.Interaction, number: app_commands.Range[int, 1]) -> None:
+        player = await self.__get_player_with_error_if_contains(interaction)
+        if player is None:
+            return
+
+        wrapper = InteractionWrapper(interaction.response, interaction.guild.id)
+        await remove_command(wrapper, self._bot, player, number)
+
+    @app_commands.command(name="move", description="Перемещает трек в очереди на другое место")
+    @app_commands.describe(from_number="Текущий номер трека в очереди", to_number="Новый номер трека в очереди")
+    async def _move(self, interaction: discord.Interaction,
+                    from_number: app_commands.Range[int, 1], to_number: app_commands.Range[int, 1]) -> None:
+        player = await self.__get_player_with_error_if_contains(interaction)
+        if player is None:
+            return
+
+        wrapper = InteractionWrapper(interaction.response, interaction.guild.id)
+        await move_command(wrapper, self._bot, player, from_number, to_number)
+
+    @app_commands.command(name="playnext", description="Ставит трек из очереди следующим")
+    @app_commands.describe(number="Номер трека в очереди")
+    async def _playnext(self, interaction: discord.Interaction, number: app_commands.Range[int, 1]) -> None:
+        player = await self.__get_player_with_error_if_contains(interaction)
+        if player is None:
+            return
+
+        wrapper = InteractionWrapper(interaction.response, interaction.guild.id)
+        await playnext_command(wrapper, self._bot, player, number)
+
+    @app_commands.command(name="jump", description="Включает трек из очереди, пропуская все треки перед ним")
+    @app_commands.describe(number="Номер трека в очереди")
+    async def _jump(self, interaction: discord.Interaction, number: app_commands.Range[int, 1]) -> None:
+        player = await self.__get_player_with_error_if_contains(interaction)
+        if player is None:
+            return
+
+        wrapper = InteractionWrapper(interaction.response, interaction.guild.id)
+        await jump_command(wrapper, self._bot, player, number)
+
+    @app_commands.command(name="seek", description="Перематывает текущий трек на указанное время")
+    @app_commands.describe(time="Время от начала трека, например 1:23")
+    async def _seek(self, interaction: discord.Interaction, time: str) -> None:
+        player = await self.__get_player_with_error_if_contains(interaction)
+        if player is None:
+            return
+
+        wrapper = InteractionWrapper(interaction.response, interaction.guild.id)
+        await seek_command(wrapper, self._bot, player, time)
+
     async def __get_player_with_error_if_contains(self, interaction: discord.Interaction) -> PlayerFacade | None:
         if not isinstance(interaction.response, discord.InteractionResponse):
             return None
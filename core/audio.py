@@ -0,0 +1,238 @@
+"""
+    Источник звука, который проигрывает треки друг за другом без паузы
+    Голосовое соединение читает один и тот же источник, а треки внутри него меняются.
+    Следующий трек открывается заранее (FFmpeg запускается за несколько секунд до конца текущего),
+    поэтому на переходе не тратится время на запуск процесса.
+    Треки могут быть уже закодированы в Opus (процессы core.audio_worker), тогда плавного перехода нет
+"""
+import threading
+import typing
+
+from discord import AudioSource
+
+try:
+    import audioop
+except ImportError:  # Модуль удален в Python 3.13, без него не будет плавного перехода и нормализации громкости
+    audioop = None
+
+# 20 мс PCM: 48 кГц, 2 канала, 16 бит
+FRAME_SIZE = 3840
+FRAMES_PER_SECOND = 50
+SAMPLE_WIDTH = 2
+# Кадр тишины Opus
+OPUS_SILENCE = b"\xf8\xff\xfe"
+
+
+class GainAudioSource(AudioSource):
+    """
+        Постоянное усиление PCM (нормализация громкости).
+        discord.PCMVolumeTransformer не усиливает больше чем в 2 раза (~6 дБ), а тихим трекам нужно до loudness_max_gain
+    """
+
+    def __init__(self, source: AudioSource, gain: float) -> None:
+        self._source: AudioSource = source
+        self._gain: float = gain
+
+    def read(self) -> bytes:
+        data = self._source.read()
+        if not data or audioop is None:
+            return data
+        # Сэмплы за пределами 16 бит обрезаются, пик ограничивает loudness_peak_limit
+        return audioop.mul(data, SAMPLE_WIDTH, self._gain)
+
+    def is_opus(self) -> bool:
+        return False
+
+    def cleanup(self) -> None:
+        self._source.cleanup()
+
+
+class GaplessAudioSource(AudioSource):
+    """
+        read вызывается из потока проигрывания discord, остальные методы - из цикла событий.
+        Кадр читается без блокировки: под ней только замена источников и счетчики,
+        поэтому цикл событий не ждет, пока FFmpeg подготовит кадр.
+        Замененные источники закрывает поток проигрывания: закрыть источник, который сейчас читается, нельзя.
+        О событиях источник сообщает через колбэки, которые вызываются в потоке проигрывания.
+        Длительность 0 - неизвестна: переход только по концу трека, без заранее открытого следующего (см. set_duration)
+    """
+
+    def __init__(self, source: AudioSource, duration: float,
+                 preroll: float, crossfade: float,
+                 on_next_source_needed: typing.Callable[[], None],
+                 on_source_switched: typing.Callable[[], None],
+                 position: float = 0) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._source: AudioSource = source
+        # Все треки источника открываются одинаково: либо PCM, либо Opus
+        self._is_opus: bool = source.is_opus()
+        self._next_source: AudioSource | None = None
+        self._next_duration: float = 0
+        # Замененные из цикла событий источники, их закроет поток проигрывания
+        self._retired_sources: typing.List[AudioSource] = []
+
+        # Позиция в текущем треке: с какого момента начали и сколько кадров прочитано
+        self._start_position: float = position
+        self._played_frames: int = 0
+        # Сколько кадров осталось до конца текущего трека (по длительности трека). None - длительность неизвестна
+        self._remaining_frames: int | None = self.__get_remaining_frames(duration, position)
+        self._preroll_frames: int = self.__get_frames(preroll)
+        # Смешивать можно только PCM
+        self._crossfade_frames: int = \
+            self.__get_frames(crossfade) if audioop is not None and not self._is_opus else 0
+        self._next_source_requested: bool = False
+        # Сколько кадров следующего трека уже прозвучало при плавном переходе
+        self._mixed_frames: int = 0
+
+        self._on_next_source_needed: typing.Callable[[], None] = on_next_source_needed
+        self._on_source_switched: typing.Callable[[], None] = on_source_switched
+
+    @property
+    def position(self) -> float:
+        """
+            Позиция в текущем треке (сек.). Точность - один кадр (20 мс): соединение читает трек целыми кадрами,
+            и неизвестно, какая часть последнего прочитанного кадра уже прозвучала.
+            Сама перемотка точнее: FFmpeg начинает с нужного сэмпла
+        """
+        return self._start_position + self._played_frames / FRAMES_PER_SECOND
+
+    def seek(self, source: AudioSource, position: float, duration: float) -> None:
+        """
+            source уже открыт с позиции position. Заранее открытый следующий трек закрывается
+        """
+        with self._lock:
+            self._retired_sources.append(self._source)
+            if self._next_source is not None:
+                self._retired_sources.append(self._next_source)
+                self._next_source = None
+            self._source = source
+            self._start_position = position
+            self._played_frames = 0
+            self._remaining_frames = self.__get_remaining_frames(duration, position)
+            self._mixed_frames = 0
+            self._next_source_requested = False
+
+    def set_next_source(self, source: AudioSource, duration: float) -> None:
+        with self._lock:
+            if self._next_source is not None:
+                self._retired_sources.append(self._next_source)
+            self._next_source = source
+            self._next_duration = duration
+
+    def set_duration(self, source: AudioSource, duration: float) -> None:
+        """
+            Длительность трека source определилась, пока он уже был открыт.
+            Если source уже не звучит и не ждет своей очереди, ничего не меняется
+        """
+        if duration <= 0:
+            return
+
+        with self._lock:
+            if source is self._next_source:
+                self._next_duration = duration
+            elif source is self._source and self._remaining_frames is None:
+                self._remaining_frames = self.__get_frames(duration - self._start_position) - self._played_frames
+
+    def read(self) -> bytes:
+        self.__cleanup_retired_sources()
+
+        with self._lock:
+            source = self._source
+            next_source = self._next_source
+            self._played_frames += 1
+            remaining_frames = self._remaining_frames
+            if remaining_frames is not None:
+                remaining_frames -= 1
+                self._remaining_frames = remaining_frames
+            need_next_source = not self._next_source_requested and remaining_frames is not None and \
+                remaining_frames <= self._preroll_frames
+            if need_next_source:
+                self._next_source_requested = True
+
+        if need_next_source:
+            self._on_next_source_needed()
+
+        data = source.read()
+        if next_source is None:
+            return data
+
+        if self._crossfade_frames > 0 and remaining_frames is not None and remaining_frames < self._crossfade_frames:
+            # Длительность трека известна с точностью до секунды: по ее истечении переходим в любом случае
+            if self.__is_finished(data) or remaining_frames <= 0:
+                return self.__switch(source, next_source)
+            return self.__mix(data, next_source, remaining_frames)
+
+        if self.__is_finished(data):
+            return self.__switch(source, next_source)
+        return data
+
+    def is_opus(self) -> bool:
+        return self._is_opus
+
+    def cleanup(self) -> None:
+        with self._lock:
+            self._retired_sources.append(self._source)
+            if self._next_source is not None:
+                self._retired_sources.append(self._next_source)
+                self._next_source = None
+        self.__cleanup_retired_sources()
+
+    def __cleanup_retired_sources(self) -> None:
+        if not self._retired_sources:
+            return
+        with self._lock:
+            sources, self._retired_sources = self._retired_sources, []
+        for source in sources:
+            source.cleanup()
+
+    def __mix(self, data: bytes, next_source: AudioSource, remaining_frames: int) -> bytes:
+        # Текущий трек затихает, следующий становится громче
+        volume = remaining_frames / self._crossfade_frames
+        next_data = self.__pad(next_source.read())
+        with self._lock:
+            self._mixed_frames += 1
+        return audioop.add(audioop.mul(self.__pad(data), SAMPLE_WIDTH, volume),
+                           audioop.mul(next_data, SAMPLE_WIDTH, 1 - volume),
+                           SAMPLE_WIDTH)
+
+    def __switch(self, source: AudioSource, next_source: AudioSource) -> bytes:
+        with self._lock:
+            if self._source is not source or self._next_source is not next_source:
+                # Пока кадр читался, трек перемотали или заменили следующий
+                return self.__get_silence()
+
+            self._retired_sources.append(source)
+            self._source = next_source
+            self._next_source = None
+            remaining_frames = self.__get_remaining_frames(self._next_duration, 0)
+            self._remaining_frames = None if remaining_frames is None else remaining_frames - self._mixed_frames - 1
+            self._start_position = 0
+            self._played_frames = self._mixed_frames + 1
+            self._mixed_frames = 0
+            self._next_source_requested = False
+        self._on_source_switched()
+
+        data = next_source.read()
+        if self._is_opus:
+            return data or OPUS_SILENCE
+        return self.__pad(data)
+
+    def __is_finished(self, data: bytes) -> bool:
+        # Пакеты Opus разной длины, трек Opus заканчивается пустым пакетом
+        return not data if self._is_opus else len(data) < FRAME_SIZE
+
+    def __get_silence(self) -> bytes:
+        return OPUS_SILENCE if self._is_opus else b"\x00" * FRAME_SIZE
+
+    def __get_remaining_frames(self, duration: float, position: float) -> int | None:
+        if duration <= 0:
+            return None
+        return self.__get_frames(duration - position)
+
+    @staticmethod
+    def __pad(data: bytes) -> bytes:
+        return data + b"\x00" * (FRAME_SIZE - len(data)) if len(data) < FRAME_SIZE else data
+
+    @staticmethod
+    def __get_frames(seconds: float) -> int:
+        return int(seconds * FRAMES_PER_SECOND)
@@ -0,0 +1,232 @@
+"""
+    Процесс, который готовит звук для бота: декодирует треки через FFmpeg, применяет громкость и кодирует в Opus
+    Запускается ботом (python -m core.audio_worker), команды получает через stdin, пакеты Opus отдает через stdout.
+    Процесс бота только отправляет готовые пакеты, поэтому чтение PCM и кодирование не конкурируют с циклом событий за GIL.
+    Модуль не импортирует core.log_utils: тот очищает файл логов бота при импорте. Ошибки пишутся в stderr
+"""
+import json
+import struct
+import subprocess
+import sys
+import threading
+import typing
+
+from discord.opus import Encoder
+
+try:
+    import audioop
+except ImportError:  # Модуль удален в Python 3.13, без него треки играют без нормализации громкости
+    audioop = None
+
+# Заголовок сообщения: тип, номер потока, размер данных (для CREDIT - число кадров)
+HEADER = struct.Struct("<BII")
+PACKET_LENGTH = struct.Struct("<H")
+
+# Команды бота
+OPEN = 1
+CREDIT = 2
+CLOSE = 3
+# Ответы процесса
+PACKETS = 1
+END = 2
+
+# 20 мс PCM: 48 кГц, 2 канала, 16 бит
+FRAME_SIZE = 3840
+SAMPLES_PER_FRAME = 960
+SAMPLE_WIDTH = 2
+INPUT_CHUNK_SIZE = 64 * 1024
+# Сколько секунд ждем остановки трека при завершении процесса
+STOP_TIMEOUT = 1
+
+
+def write_input(process: subprocess.Popen, filename: str, header_size: int, offset: int) -> None:
+    """
+        Передает файл в stdin FFmpeg. При перемотке - header_size байт заголовков и файл со смещения offset
+    """
+    try:
+        with open(filename, "rb") as file:
+            if offset > 0:
+                if header_size > 0:
+                    process.stdin.write(file.read(header_size))
+                file.seek(offset)
+            while True:
+                chunk = file.read(INPUT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                process.stdin.write(chunk)
+    except (OSError, ValueError):
+        # Процесс остановлен раньше, чем прочитал весь файл (например, трек переключили)
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+
+class WorkerStream:
+    """
+        Один трек. Кадры готовятся в отдельном потоке, но не больше, чем разрешил бот (credits),
+        поэтому процесс не уходит вперед больше чем на размер буфера слушателя
+    """
+
+    def __init__(self, worker: "AudioWorker", stream_id: int, request: dict) -> None:
+        self._worker: AudioWorker = worker
+        self._stream_id: int = stream_id
+        self._request: dict = request
+        self._condition: threading.Condition = threading.Condition()
+        self._credits: int = 0
+        self._is_closed: bool = False
+        self._thread: threading.Thread = threading.Thread(target=self.__run, daemon=True,
+                                                          name=f"audio-stream:{stream_id}")
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def add_credits(self, number_of_frames: int) -> None:
+        with self._condition:
+            self._credits += number_of_frames
+            self._condition.notify()
+
+    def close(self) -> None:
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify()
+
+    def join(self, timeout: float) -> None:
+        self._thread.join(timeout)
+
+    def __wait_credits(self) -> int:
+        with self._condition:
+            while self._credits == 0 and not self._is_closed:
+                self._condition.wait()
+            if self._is_closed:
+                return 0
+            credits, self._credits = self._credits, 0
+            return credits
+
+    def __run(self) -> None:
+        process: subprocess.Popen | None = None
+        try:
+            encoder = Encoder()
+            process = subprocess.Popen(self._request["command"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            threading.Thread(target=write_input,
+                             args=(process, self._request["filename"],
+                                   self._request["header_size"], self._request["offset"]),
+                             daemon=True, name=f"ffmpeg-input:{process.pid}").start()
+            self.__encode(process.stdout, encoder)
+        except Exception as e:
+            print(f"Audio stream {self._stream_id} failed: {e!r}", file=sys.stderr, flush=True)
+        finally:
+            if process is not None:
+                process.kill()
+                process.stdout.close()
+                process.wait()
+            if not self._is_closed:
+                self._worker.send(END, self._stream_id)
+            self._worker.remove_stream(self._stream_id)
+
+    def __encode(self, stdout: typing.BinaryIO, encoder: Encoder) -> None:
+        skip_bytes: int = self._request["skip_bytes"]
+        while skip_bytes > 0:
+            skipped = stdout.read(min(skip_bytes, INPUT_CHUNK_SIZE))
+            if not skipped:
+                return
+            skip_bytes -= len(skipped)
+
+        gain: float = self._request["gain"]
+        apply_gain = gain != 1 and audioop is not None
+        while True:
+            credits = self.__wait_credits()
+            if credits == 0:
+                return
+
+            packets = []
+            is_finished = False
+            for _ in range(credits):
+                data = stdout.read(FRAME_SIZE)
+                if len(data) != FRAME_SIZE:
+                    is_finished = True
+                    break
+                if apply_gain:
+                    # Как core.audio.GainAudioSource: без ограничения PCMVolumeTransformer в 2 раза
+                    data = audioop.mul(data, SAMPLE_WIDTH, gain)
+                packet = encoder.encode(data, SAMPLES_PER_FRAME)
+                packets.append(PACKET_LENGTH.pack(len(packet)))
+                packets.append(packet)
+
+            if packets:
+                self._worker.send(PACKETS, self._stream_id, b"".join(packets))
+            if is_finished:
+                return
+
+
+class AudioWorker:
+    """
+        Все треки, которые процесс готовит для бота
+    """
+
+    def __init__(self, input_stream: typing.BinaryIO, output_stream: typing.BinaryIO) -> None:
+        self._input: typing.BinaryIO = input_stream
+        self._output: typing.BinaryIO = output_stream
+        # Ответы пишутся из потоков треков
+        self._output_lock: threading.Lock = threading.Lock()
+        self._streams_lock: threading.Lock = threading.Lock()
+        self._streams: typing.Dict[int, WorkerStream] = {}
+
+    def run(self) -> None:
+        while True:
+            header = self._input.read(HEADER.size)
+            if len(header) < HEADER.size:
+                # Бот закрыл канал
+                break
+            message_type, stream_id, size = HEADER.unpack(header)
+            if message_type == OPEN:
+                self.__open(stream_id, json.loads(self._input.read(size)))
+            elif message_type == CREDIT:
+                stream = self._streams.get(stream_id)
+                if stream is not None:
+                    stream.add_credits(size)
+            elif message_type == CLOSE:
+                stream = self._streams.get(stream_id)
+                if stream is not None:
+                    stream.close()
+
+        with self._streams_lock:
+            streams = list(self._streams.values())
+        for stream in streams:
+            stream.close()
+        # Потоки треков останавливают свои процессы FFmpeg
+        for stream in streams:
+            stream.join(STOP_TIMEOUT)
+
+    def send(self, message_type: int, stream_id: int, data: bytes = b"") -> None:
+        with self._output_lock:
+            try:
+                self._output.write(HEADER.pack(message_type, stream_id, len(data)))
+                self._output.write(data)
+                self._output.flush()
+            except (OSError, ValueError):
+                # Бот завершился
+                pass
+
+    def remove_stream(self, stream_id: int) -> None:
+        with self._streams_lock:
+            self._streams.pop(stream_id, None)
+
+    def __open(self, stream_id: int, request: dict) -> None:
+        stream = WorkerStream(self, stream_id, request)
+        with self._streams_lock:
+            self._streams[stream_id] = stream
+        stream.start()
+
+
+def main() -> None:
+    output = sys.stdout.buffer
+    # stdout занят пакетами: случайный print не должен попасть в канал
+    sys.stdout = sys.stderr
+    AudioWorker(sys.stdin.buffer, output).run()
+
+
+if __name__ == "__main__":
+    main()
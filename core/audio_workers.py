@@ -0,0 +1,269 @@
+"""
+    Пул процессов, которые готовят звук для голосовых соединений (core.audio_worker)
+    Включается настройкой audio_workers. Трек декодируется и кодируется в Opus в отдельном процессе,
+    в процесс бота приходят готовые пакеты: поток проигрывания discord только отправляет их.
+    Процесс готовит трек не больше чем на buffer_frames кадров вперед: бот возвращает кадры (credits) по мере отправки
+"""
+import collections
+import itertools
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import typing
+
+from discord import AudioSource
+
+from core.audio import OPUS_SILENCE
+from core.audio_worker import HEADER, PACKET_LENGTH, OPEN, CREDIT, CLOSE, PACKETS, END
+from core.log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Кадры возвращаем процессу пачками, чтобы не отправлять сообщение на каждый кадр
+CREDIT_BATCH = 5
+# Процесс запускается как модуль, поэтому рабочая папка - корень проекта
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Сколько секунд ждем завершения процесса при закрытии
+STOP_TIMEOUT = 2
+
+
+class WorkerAudioSource(AudioSource):
+    """
+        Пакеты Opus одного трека. read вызывается из потока проигрывания discord,
+        push - из потока, который читает ответы процесса
+    """
+
+    def __init__(self, worker: "AudioWorkerProcess", stream_id: int, on_cleanup: typing.Callable[[], None]) -> None:
+        self._worker: AudioWorkerProcess = worker
+        self._stream_id: int = stream_id
+        self._on_cleanup: typing.Callable[[], None] = on_cleanup
+        # None - трек закончился. Размер ограничен тем, сколько кадров разрешено подготовить процессу
+        self._packets: typing.Deque[bytes | None] = collections.deque()
+        self._consumed_frames: int = 0
+        self._is_closed: bool = False
+
+    def push(self, packets: typing.List[bytes | None]) -> None:
+        self._packets.extend(packets)
+
+    def read(self) -> bytes:
+        try:
+            packet = self._packets.popleft()
+        except IndexError:
+            # Процесс еще не подготовил кадр
+            return OPUS_SILENCE
+        if packet is None:
+            self._packets.appendleft(None)
+            return b""
+
+        self._consumed_frames += 1
+        if self._consumed_frames >= CREDIT_BATCH:
+            self._worker.add_credits(self._stream_id, self._consumed_frames)
+            self._consumed_frames = 0
+        return packet
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        if self._is_closed:
+            return
+        self._is_closed = True
+        self._worker.close_stream(self._stream_id)
+        self._on_cleanup()
+
+
+class AudioWorkerProcess:
+    """
+        Один процесс и его треки
+        Команды пишет в канал отдельный поток: если процесс не успевает читать и канал заполнен,
+        ждет только этот поток, а не цикл событий и не потоки проигрывания discord
+    """
+
+    def __init__(self) -> None:
+        creation_flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        self._process: subprocess.Popen = subprocess.Popen((sys.executable, "-m", "core.audio_worker"),
+                                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                                           cwd=PROJECT_DIRECTORY, creationflags=creation_flags)
+        # Команды приходят из цикла событий и из потоков проигрывания discord. None - закрыть канал
+        self._messages: queue.SimpleQueue[bytes | None] = queue.SimpleQueue()
+        self._streams: typing.Dict[int, WorkerAudioSource] = {}
+        self._is_alive: bool = True
+        self._is_closing: bool = False
+        self._reader: threading.Thread = threading.Thread(target=self.__read_packets, daemon=True,
+                                                          name=f"audio-worker:{self._process.pid}")
+        self._reader.start()
+        self._writer: threading.Thread = threading.Thread(target=self.__write_messages, daemon=True,
+                                                          name=f"audio-worker-input:{self._process.pid}")
+        self._writer.start()
+
+    @property
+    def is_alive(self) -> bool:
+        return self._is_alive
+
+    @property
+    def number_of_streams(self) -> int:
+        return len(self._streams)
+
+    def open(self, stream_id: int, request: dict, buffer_frames: int,
+             on_cleanup: typing.Callable[[], None]) -> WorkerAudioSource:
+        source = WorkerAudioSource(self, stream_id, on_cleanup)
+        self._streams[stream_id] = source
+        data = json.dumps(request).encode()
+        self.__send(OPEN, stream_id, len(data), data)
+        self.__send(CREDIT, stream_id, buffer_frames)
+        return source
+
+    def add_credits(self, stream_id: int, number_of_frames: int) -> None:
+        self.__send(CREDIT, stream_id, number_of_frames)
+
+    def close_stream(self, stream_id: int) -> None:
+        if self._streams.pop(stream_id, None) is not None:
+            self.__send(CLOSE, stream_id, 0)
+
+    def close(self) -> None:
+        self._is_closing = True
+        # Процесс завершается, когда закрыт его stdin: поток записи закроет его после уже отправленных команд
+        self._messages.put(None)
+        try:
+            self._process.wait(STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+    def __send(self, message_type: int, stream_id: int, size: int, data: bytes = b"") -> None:
+        if self._is_alive:
+            self._messages.put(HEADER.pack(message_type, stream_id, size) + data)
+
+    def __write_messages(self) -> None:
+        stdin = self._process.stdin
+        while True:
+            message = self._messages.get()
+            if message is None:
+                break
+            # Все накопившиеся команды отправляем одной записью
+            messages = [message]
+            is_closed = False
+            while True:
+                try:
+                    message = self._messages.get_nowait()
+                except queue.Empty:
+                    break
+                if message is None:
+                    is_closed = True
+                    break
+                messages.append(message)
+
+            try:
+                stdin.write(b"".join(messages))
+                stdin.flush()
+            except (OSError, ValueError):
+                # Процесс завершился. Треки закончит поток чтения ответов
+                break
+            if is_closed:
+                break
+
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+    def __read_packets(self) -> None:
+        stdout = self._process.stdout
+        while True:
+            header = stdout.read(HEADER.size)
+            if len(header) < HEADER.size:
+                break
+            message_type, stream_id, size = HEADER.unpack(header)
+            data = stdout.read(size) if size > 0 else b""
+
+            source = self._streams.get(stream_id)
+            if source is None:
+                # Трек уже закрыт, а процесс успел прислать кадры
+                continue
+            if message_type == PACKETS:
+                source.push(self.__split_packets(data))
+            elif message_type == END:
+                source.push([None])
+
+        self._is_alive = False
+        code = self._process.wait()
+        if not self._is_closing:
+            logger.error(f"Audio worker {self._process.pid} exited with code {code}, "
+                         f"{len(self._streams)} tracks stopped.")
+        for source in list(self._streams.values()):
+            source.push([None])
+
+    @staticmethod
+    def __split_packets(data: bytes) -> typing.List[bytes | None]:
+        packets: typing.List[bytes | None] = []
+        position = 0
+        while position < len(data):
+            (length,) = PACKET_LENGTH.unpack_from(data, position)
+            position += PACKET_LENGTH.size
+            packets.append(data[position:position + length])
+            position += length
+        return packets
+
+
+class AudioWorkerPool:
+    """
+        Один пул на весь бот. Трек достается процессу, у которого меньше всего треков
+        buffer_frames - на сколько кадров (по 20 мс) процесс готовит трек заранее
+    """
+
+    def __init__(self, number_of_workers: int, buffer_frames: int) -> None:
+        self._number_of_workers: int = number_of_workers
+        self._buffer_frames: int = buffer_frames
+        self._workers: typing.List[AudioWorkerProcess] = []
+        self._stream_ids: typing.Iterator[int] = itertools.count(1)
+
+        # Статистика
+        self._number_of_streams: int = 0
+        self._number_of_restarts: int = 0
+
+    def start(self) -> None:
+        while len(self._workers) < self._number_of_workers:
+            self._workers.append(AudioWorkerProcess())
+        logger.info(f"Audio workers started: {self._number_of_workers}.")
+
+    def open(self, command: typing.Sequence[str], filename: str,
+             header_size: int, offset: int, skip_bytes: int, gain: float,
+             on_cleanup: typing.Callable[[], None]) -> WorkerAudioSource:
+        """
+            command - полная команда запуска FFmpeg (вход - stdin, выход - PCM в stdout).
+            Остальные параметры - как у PooledFFmpegAudio, gain - множитель громкости
+        """
+        worker = self.__get_worker()
+        self._number_of_streams += 1
+        request = {
+            "command": list(command),
+            "filename": filename,
+            "header_size": header_size,
+            "offset": offset,
+            "skip_bytes": skip_bytes,
+            "gain": gain
+        }
+        return worker.open(next(self._stream_ids), request, self._buffer_frames, on_cleanup)
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.close()
+        self._workers.clear()
+
+    def log_statistics(self) -> None:
+        active = sum(worker.number_of_streams for worker in self._workers)
+        logger.info(f"Audio workers: processes: {len(self._workers)}; active tracks: {active}; "
+                    f"opened: {self._number_of_streams}; restarts: {self._number_of_restarts}.")
+
+    def __get_worker(self) -> AudioWorkerProcess:
+        for index, worker in enumerate(self._workers):
+            if not worker.is_alive:
+                # Процесс упал: его треки уже закончены, следующим нужен новый процесс
+                self._workers[index] = AudioWorkerProcess()
+                self._number_of_restarts += 1
+        if not self._workers:
+            self.start()
+        return min(self._workers, key=lambda worker: worker.number_of_streams)
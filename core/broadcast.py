@@ -0,0 +1,350 @@
+"""
+    Общий эфир (радио) для нескольких гильдий
+    У станции один источник PCM и один кодировщик Opus, готовые кадры раздаются всем подписанным голосовым соединениям.
+    Нагрузка на процессор зависит от числа станций, а не от числа слушающих гильдий.
+    Если треки уже закодированы процессами core.audio_worker, станция раздает их пакеты без кодирования
+"""
+import asyncio
+import collections
+import threading
+import time
+import typing
+
+from discord import AudioSource
+from discord.opus import Encoder
+
+from core.audio import GaplessAudioSource, FRAME_SIZE, OPUS_SILENCE
+from core.errors import FFmpegProcessesLimitError
+from core.ffmpeg_pool import FFmpegProcessPool
+from core.log_utils import get_logger
+from requests_to_music_service.protocol import RequestToServiceProtocol
+from storage.storage import Storage
+from yandex.collector import TrackQueueManager
+from yandex.track import TrackWrapperBase
+
+logger = get_logger(__name__)
+
+FRAME_DURATION = 0.02
+SAMPLES_PER_FRAME = 960
+# Если станция отстала больше чем на секунду (например, процесс был приостановлен), не догоняем ее
+MAX_DELAY = 1
+
+
+class BroadcastListener(AudioSource):
+    """
+        Кадры станции для одного голосового соединения
+        Буфер ограничен: слушатель, который не успевает читать, теряет старые кадры и не задерживает остальных
+    """
+
+    def __init__(self, station: "BroadcastStation", buffer_frames: int) -> None:
+        self._station: BroadcastStation = station
+        # None - эфир закончился
+        self._frames: typing.Deque[bytes | None] = collections.deque(maxlen=buffer_frames)
+        self._is_closed: bool = False
+
+    @property
+    def station(self) -> "BroadcastStation":
+        return self._station
+
+    def push(self, frame: bytes | None) -> None:
+        self._frames.append(frame)
+
+    def read(self) -> bytes:
+        try:
+            frame = self._frames.popleft()
+        except IndexError:
+            # Станция еще не подготовила кадр
+            return OPUS_SILENCE
+        if frame is None:
+            return b""
+        return frame
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        if self._is_closed:
+            return
+        self._is_closed = True
+        self._station.unsubscribe(self)
+
+
+class BroadcastStation:
+    """
+        Проигрывает очередь треков в реальном времени, независимо от того, сколько гильдий слушает
+        Подключиться можно в любой момент: новый слушатель получает кадры с текущего места
+    """
+
+    def __init__(self, name: str, queue: TrackQueueManager, storage: Storage, ffmpeg_pool: FFmpegProcessPool,
+                 preroll: float, crossfade: float, buffer_frames: int,
+                 on_finished: typing.Callable[["BroadcastStation"], None]) -> None:
+        self._name: str = name
+        self._queue: TrackQueueManager = queue
+        self._storage: Storage = storage
+        self._ffmpeg_pool: FFmpegProcessPool = ffmpeg_pool
+        self._preroll: float = preroll
+        self._crossfade: float = crossfade
+        self._buffer_frames: int = buffer_frames
+        self._on_finished: typing.Callable[[BroadcastStation], None] = on_finished
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # Слушатели и источник меняются из цикла событий и из потоков проигрывания
+        self._lock: threading.Lock = threading.Lock()
+        self._listeners: typing.List[BroadcastListener] = []
+        self._source: GaplessAudioSource | None = None
+        self._current_track: TrackWrapperBase | None = None
+        self._prepared_track: TrackWrapperBase | None = None
+        self._stopped: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def number_of_listeners(self) -> int:
+        return len(self._listeners)
+
+    @property
+    def current_track(self) -> TrackWrapperBase | None:
+        return self._current_track
+
+    async def start(self, request: RequestToServiceProtocol) -> bool:
+        self._loop = asyncio.get_running_loop()
+        if not await self._storage.add(request):
+            self.__finish()
+            return False
+
+        await self._queue.upload_queue_async()
+        track = self._queue.get_next_track()
+        if track is None or not self.__play(track):
+            self.__finish()
+            return False
+
+        self._thread = threading.Thread(target=self.__run, daemon=True, name=f"broadcast:{self._name}")
+        self._thread.start()
+        logger.info(f"Broadcast {self._name} started.")
+        return True
+
+    def subscribe(self) -> BroadcastListener:
+        listener = BroadcastListener(self, self._buffer_frames)
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener: BroadcastListener) -> None:
+        """
+            Вызывается из потока проигрывания discord
+        """
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+            is_empty = len(self._listeners) == 0
+        if is_empty and self._loop is not None:
+            self.__call_soon(self.__stop_if_nobody_listens)
+
+    def stop(self) -> None:
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._on_finished(self)
+        logger.info(f"Broadcast {self._name} stopped.")
+
+    def __run(self) -> None:
+        encoder = Encoder()
+        next_time = time.perf_counter()
+        while not self._stopped.is_set():
+            with self._lock:
+                source = self._source
+            data = source.read() if source is not None else b""
+
+            if data and source.is_opus():
+                frame = data
+            elif len(data) == FRAME_SIZE:
+                frame = encoder.encode(data, SAMPLES_PER_FRAME)
+            else:
+                frame = OPUS_SILENCE
+                if source is not None:
+                    # Трек закончился, а следующий еще не открыт
+                    with self._lock:
+                        self._source = None
+                    if not self.__call_soon(self.__on_track_finished, source):
+                        source.cleanup()
+                        self._stopped.set()
+
+            with self._lock:
+                for listener in self._listeners:
+                    listener.push(frame)
+
+            next_time += FRAME_DURATION
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -MAX_DELAY:
+                next_time = time.perf_counter()
+
+        with self._lock:
+            source, self._source = self._source, None
+            listeners = list(self._listeners)
+        if source is not None:
+            source.cleanup()
+        for listener in listeners:
+            listener.push(None)
+
+    def __call_soon(self, callback: typing.Callable[..., None], *args: typing.Any) -> bool:
+        """
+            Вызов в цикле событий из другого потока. False - цикл уже закрыт (бот завершается)
+        """
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            return False
+        return True
+
+    def __play(self, track: TrackWrapperBase) -> bool:
+        filename = track.get_filename()
+        if filename is None:
+            logger.error("Filename is None.")
+            return False
+
+        try:
+            track_source = self._ffmpeg_pool.open(filename)
+        except FFmpegProcessesLimitError as e:
+            logger.error(f"Broadcast {self._name}: {e}")
+            return False
+        source = GaplessAudioSource(
+            track_source, self.__get_duration(track, filename, track_source),
+            preroll=self._preroll,
+            crossfade=self._crossfade,
+            on_next_source_needed=lambda: self.__call_soon(self.__prepare_next_source, source),
+            on_source_switched=lambda: self.__call_soon(self.__on_source_switched, source))
+        with self._lock:
+            self._source = source
+        self._current_track = track
+        self._prepared_track = None
+        self._queue.update_queue(None)
+        logger.info(f"Broadcast {self._name}: {track.title}.")
+        return True
+
+    def __prepare_next_source(self, source: GaplessAudioSource) -> None:
+        if source is not self._source:
+            return
+
+        track = self._queue.peek_next_track()
+        if track is None:
+            return
+        filename = track.get_filename()
+        if filename is None:
+            return
+
+        try:
+            track_source = self._ffmpeg_pool.open(filename)
+        except FFmpegProcessesLimitError as e:
+            logger.warning(f"Broadcast {self._name}: next track is not prepared: {e}")
+            return
+        self._prepared_track = track
+        source.set_next_source(track_source, self.__get_duration(track, filename, track_source))
+
+    def __get_duration(self, track: TrackWrapperBase, filename: str, track_source: AudioSource) -> float:
+        """
+            Как в Player: длительность 0 - неизвестна, track_source получит ее после определения файла
+        """
+        duration = track.duration()
+        if duration > 0:
+            return duration
+
+        def on_probed(probed_duration: float) -> None:
+            with self._lock:
+                source = self._source
+            if source is not None:
+                source.set_duration(track_source, probed_duration)
+
+        return self._ffmpeg_pool.get_duration(filename, on_probed)
+
+    def __on_source_switched(self, source: GaplessAudioSource) -> None:
+        if source is not self._source:
+            return
+
+        self._current_track = self._queue.get_next_track()
+        self._prepared_track = None
+        self._queue.update_queue(None)
+        if self._current_track is not None:
+            logger.info(f"Broadcast {self._name}: {self._current_track.title}.")
+
+    def __on_track_finished(self, source: GaplessAudioSource) -> None:
+        source.cleanup()
+        if self._stopped.is_set():
+            return
+        self.__play_next_track()
+
+    def __play_next_track(self) -> None:
+        track = self._queue.get_next_track()
+        if track is not None:
+            if not self.__play(track):
+                self.__play_next_track()
+            return
+
+        # Следующие треки еще загружаются
+        if not self._queue.is_empty:
+            self._queue.update_queue(self.__play_next_track)
+            return
+
+        self.__finish()
+
+    def __stop_if_nobody_listens(self) -> None:
+        if len(self._listeners) == 0:
+            self.stop()
+
+    def __finish(self) -> None:
+        logger.info(f"Broadcast {self._name} finished.")
+        if self._thread is None:
+            # Поток не запускался: сообщаем слушателям о конце эфира сами
+            with self._lock:
+                listeners = list(self._listeners)
+            for listener in listeners:
+                listener.push(None)
+        self.stop()
+
+
+class BroadcastHub:
+    """
+        Все станции бота. Станция создается при первом подключении и останавливается, когда ее никто не слушает
+    """
+
+    def __init__(self, create_station: typing.Callable[[str, typing.Callable[[BroadcastStation], None]], BroadcastStation]) -> None:
+        self._create_station = create_station
+        self._stations: typing.Dict[str, BroadcastStation] = {}
+
+    @property
+    def number_of_stations(self) -> int:
+        return len(self._stations)
+
+    async def subscribe(self, name: str,
+                        create_request: typing.Callable[[], RequestToServiceProtocol]) -> BroadcastListener | None:
+        """
+            None - станцию не удалось запустить
+        """
+        key = name.strip().lower()
+        station = self._stations.get(key)
+        if station is not None:
+            return station.subscribe()
+
+        station = self._create_station(key, self.__on_station_finished)
+        self._stations[key] = station
+        # Подписываемся до запуска: гильдии, пришедшие во время загрузки, подключатся к этой же станции
+        listener = station.subscribe()
+        if not await station.start(create_request()):
+            return None
+        return listener
+
+    def log_statistics(self) -> None:
+        listeners = sum(station.number_of_listeners for station in self._stations.values())
+        logger.info(f"Broadcast: stations: {len(self._stations)}; listeners: {listeners}.")
+
+    def close(self) -> None:
+        for station in list(self._stations.values()):
+            station.stop()
+
+    def __on_station_finished(self, station: BroadcastStation) -> None:
+        if self._stations.get(station.name) is station:
+            del self._stations[station.name]
@@ -29,11 +29,50 @@ class ConfigManager:
         "database_url": "mysql+pymysql://{user}:{password}@{host}/{database}?charset=utf8mb4",
         "maximum_number_recent_requests_in_message":  5, # Не более 10. Так как дискорд за раз может отправить только 10 Embed
         "max_tracks_in_list": 3,  # Сколько максимально будем держать скаченных треков (Для одного канала)
+        "max_played_tracks_in_history": 100,  # Сколько прослушанных треков помним для перехода к предыдущему треку (Для одного канала)
+        "gapless_preroll": 5,  # За сколько секунд до конца трека открываем следующий, чтобы между треками не было паузы
+        "crossfade_duration": 0,  # Длительность (сек.) плавного перехода между треками. 0 - без перехода. Должна быть меньше gapless_preroll
+        "ffmpeg_pool_idle_processes": 2,  # Сколько процессов FFmpeg держим запущенными заранее, чтобы трек стартовал быстрее
+        "ffmpeg_pool_max_processes": 64,  # Сколько всего процессов FFmpeg может работать на сервере. Сверх этого пул не пополняется и новые треки не запускаются
+        "ffmpeg_pool_idle_lifetime": 600,  # Через сколько секунд ждущий процесс FFmpeg заменяется новым
+        "audio_workers": 0,  # Сколько отдельных процессов декодируют треки и кодируют их в Opus. 0 - звук готовится в процессе бота
+        "audio_workers_buffer_frames": 25,  # На сколько кадров (по 20 мс) процесс готовит трек заранее
+        "loudness_normalization": True,  # Выравниваем громкость треков по заранее измеренной громкости
+        "loudness_target": -14,  # Целевая громкость (LUFS)
+        "loudness_max_gain": 12,  # Максимальное усиление тихих треков (дБ)
+        "loudness_peak_limit": -1,  # Выше какого уровня (dBFS) не поднимаем пик трека при усилении
+        "loudness_analysis_concurrency": 1,  # Сколько треков одновременно анализируем в фоне. Анализ декодирует трек целиком
+        "broadcast_buffer_frames": 25,  # Сколько кадров (по 20 мс) эфира ждут слушателя. Слушатель, который не успевает, теряет старые кадры
+        "broadcast_max_tracks": 100,  # Сколько треков запрашиваем для эфира
+        "launch_profiles_max_files": 10000,  # Для скольких закэшированных файлов помним параметры потока, чтобы FFmpeg не определял их при каждом запуске
         "commands_that_ignore_music_text_channel": ["help", "recreate"],  # Команды, которые можно вызывать из любого текстового канала
         "number_of_attempts_when_requesting_music_service": 10,   # Кол-во попыток при возникновение ошибке при запросе
         "delay_in_case_of_error_when_requesting_music_service": 30,  # Время ожидания прежде чем выполним следующий запрос к сервису
         "loading_tracks_into_ram": False,  # Куда загружаем треки, если RAM = false, то грузим на жесткий диск (пока поддерживается только жесткий диск). TODO: На текущие момент не поддерживается загрузка из ОЗУ
         "maximum_display_of_tracks_in_queue": 10,  # Максимальное кол-во треков, которое показываем в очереди. ВАЖНО: число должно быть меньше 25. Так как мы рисуем с помощью embed
+        "yandex_metadata_pool_size": 20,  # Максимальное кол-во постоянных соединений для запросов метаданных к Я.Музыке
+        "yandex_media_pool_size": 10,  # Максимальное кол-во постоянных соединений для загрузки треков
+        "yandex_metadata_timeout": 5,  # Таймаут (сек.) запросов метаданных
+        "yandex_media_timeout": 60,  # Таймаут (сек.) загрузки трека
+        "yandex_keepalive_timeout": 60,  # Сколько секунд держим неиспользуемое соединение открытым
+        "yandex_dns_cache_ttl": 300,  # Время жизни (сек.) записи в DNS кэше
+        "yandex_throttle_cooldown": 60,  # Сколько секунд не используем аккаунт Я.Музыки после ограничения со стороны сервиса
+        "autocomplete_max_choices": 10,  # Кол-во подсказок при вводе запроса в /play. Не более 25
+        "autocomplete_deadline": 2.5,  # Сколько секунд ждем ответ на подсказку. Дискорд ждет ответ не более 3 секунд
+        "autocomplete_debounce": 0.3,  # Задержка (сек.) перед поиском. Если пользователь продолжает ввод, поиск отменяется
+        "autocomplete_cache_size": 1000,  # Максимальное кол-во запросов в кэше подсказок
+        "autocomplete_cache_ttl": 600,  # Время жизни (сек.) подсказок в кэше
+        "autocomplete_local_min_results": 3,  # Сколько треков должно найтись в локальном индексе, чтобы не обращаться к Я.Музыке
+        "track_index_max_tracks": 100000,  # Максимальное кол-во треков в локальном поисковом индексе
+        "track_index_guild_play_weight": 5,  # Во сколько раз прослушивания в своей гильдии важнее общих при сортировке подсказок
+        "speculative_autocomplete": False,  # Пока показаны подсказки /play, заранее получаем и скачиваем первую из них
+        "speculative_lifetime": 60,  # Сколько секунд подготовленная подсказка ждет выбора пользователя
+        "speculative_download_budget_mb": 50,  # Сколько МБ упреждающих загрузок может пропасть впустую за окно времени
+        "speculative_budget_window": 600,  # Окно времени (сек.) для бюджета упреждающих загрузок
+        "speculative_max_concurrent": 1,  # Кол-во одновременных упреждающих загрузок
+        "storage_spill_threshold": 20000,  # Сколько треков очереди гильдия держит в памяти. Большие плейлисты сверх этого хранятся на диске
+        "storage_spill_page_size": 256,  # Сколько треков читаем с диска за раз
+        "storage_spill_hot_pages": 8,  # Сколько прочитанных с диска страниц держим в памяти
     }
 
     # Доступные команды и команды на отключение
@@ -49,13 +88,21 @@ class ConfigManager:
         "next": True,
         "loop": True,
         "pause": True,
+        "shuffle": True,
         "stop": True,
-        "queue": True
+        "queue": True,
+        "remove": True,
+        "move": True,
+        "playnext": True,
+        "jump": True,
+        "seek": True,
+        "radio": True
     }
 
     protected_keys = {
         "discord_token": None,
         "yandex_token": None,
+        "yandex_tokens": None,  # Несколько токенов через запятую. Запросы распределяются между аккаунтами
         "is_production": False,
 
         "database_user": None,
@@ -127,6 +174,15 @@ class ConfigManager:
         value = self._cache[key]
         return value
 
+    def get_bool(self, key: str) -> bool:
+        """
+            Значения из .env приходят строками, поэтому bool("false") не подходит
+        """
+        value = self.get(key)
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "1", "yes")
+        return bool(value)
+
     def get_unsafe(self, key: str) -> typing.Any | None:
         if not isinstance(key, str):
             return None
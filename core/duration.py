@@ -0,0 +1,349 @@
+"""
+    Определение параметров и длительности MP3 и Ogg (Vorbis, Opus) без запуска ffprobe
+    MP3: заголовок Xing/Info или VBRI, для CBR без них - размер данных и битрейт первого кадра.
+    Ogg: позиция (granule position) последней страницы потока.
+    Здесь же строится таблица перемотки: смещения в файле с шагом SEEK_TABLE_INTERVAL
+"""
+import array
+import dataclasses
+import os
+import struct
+import typing
+
+# Сколько байт ищем первый кадр MP3 после тегов
+MP3_SYNC_SEARCH_SIZE = 64 * 1024
+# Сколько байт с конца файла ищем последнюю страницу Ogg. Страница не больше 65307 байт
+OGG_TAIL_SIZE = 64 * 1024
+OPUS_SAMPLE_RATE = 48000
+# Шаг таблицы перемотки в секундах
+SEEK_TABLE_INTERVAL = 0.5
+
+# Битрейты (кбит/с) по индексу: (MPEG1 или MPEG2/2.5, слой)
+MP3_BITRATES: typing.Dict[typing.Tuple[bool, int], typing.Tuple[int, ...]] = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Частоты дискретизации по версии MPEG (3 - MPEG1, 2 - MPEG2, 0 - MPEG2.5)
+MP3_SAMPLE_RATES: typing.Dict[int, typing.Tuple[int, int, int]] = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+@dataclasses.dataclass
+class ParsedStream:
+    format: str
+    codec: str
+    sample_rate: int
+    channels: int
+    duration: float
+
+
+@dataclasses.dataclass
+class SeekTable:
+    """
+        Точка k - кадр (страница), в котором звучит момент k * SEEK_TABLE_INTERVAL.
+        Для перемотки декодеру передаем header_size байт заголовков и данные с найденного смещения
+    """
+    sample_rate: int
+    header_size: int
+    # Смещение кадра в файле
+    offsets: array.array
+    # С какого сэмпла начинается кадр
+    positions: array.array
+
+    def find(self, position: float) -> typing.Tuple[int, float]:
+        """
+            Смещение в файле и время (сек.), с которого начнется звук. Время не больше position
+        """
+        index = min(max(int(position / SEEK_TABLE_INTERVAL), 0), len(self.offsets) - 1)
+        return self.offsets[index], self.positions[index] / self.sample_rate
+
+
+@dataclasses.dataclass
+class _Mp3Frame:
+    is_mpeg1: bool
+    layer: int
+    bitrate: int  # бит/с
+    sample_rate: int
+    channels: int
+    samples_per_frame: int
+    length: int
+
+
+def read_stream(path: str) -> ParsedStream | None:
+    """
+        None - формат не поддерживается или файл поврежден
+    """
+    try:
+        with open(path, "rb") as file:
+            signature = file.read(4)
+            file.seek(0)
+            if signature == b"OggS":
+                return _read_ogg(file)
+            return _read_mp3(file, os.fstat(file.fileno()).st_size)
+    except (OSError, struct.error):
+        return None
+
+
+def build_seek_table(path: str) -> SeekTable | None:
+    """
+        Читает файл целиком, поэтому вызывается в отдельном потоке
+    """
+    try:
+        with open(path, "rb") as file:
+            signature = file.read(4)
+            file.seek(0)
+            if signature == b"OggS":
+                return _build_ogg_seek_table(file.read())
+            return _build_mp3_seek_table(file)
+    except (OSError, struct.error):
+        return None
+
+
+def _get_mp3_audio_range(file: typing.BinaryIO, file_size: int) -> typing.Tuple[int, int]:
+    audio_start = 0
+    header = file.read(10)
+    # ID3v2: размер записан 7-битными байтами
+    if len(header) == 10 and header[:3] == b"ID3":
+        audio_start = 10 + ((header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9])
+        if header[5] & 0x10:
+            audio_start += 10
+
+    audio_end = file_size
+    if file_size >= 128:
+        file.seek(file_size - 128)
+        if file.read(3) == b"TAG":
+            audio_end -= 128
+    return audio_start, audio_end
+
+
+def _read_mp3(file: typing.BinaryIO, file_size: int) -> ParsedStream | None:
+    audio_start, audio_end = _get_mp3_audio_range(file, file_size)
+    file.seek(audio_start)
+    data = file.read(MP3_SYNC_SEARCH_SIZE)
+    position, frame = _find_mp3_frame(data)
+    if frame is None:
+        return None
+
+    duration = _read_xing_duration(data, position, frame)
+    if duration is None:
+        duration = _read_vbri_duration(data, position, frame)
+    if duration is None:
+        # CBR: все кадры одного размера
+        duration = (audio_end - audio_start - position) * 8 / frame.bitrate
+
+    return ParsedStream(format="mp3", codec="mp3", sample_rate=frame.sample_rate,
+                        channels=frame.channels, duration=duration)
+
+
+def _build_mp3_seek_table(file: typing.BinaryIO) -> SeekTable | None:
+    audio_start, audio_end = _get_mp3_audio_range(file, os.fstat(file.fileno()).st_size)
+    file.seek(audio_start)
+    data = file.read(audio_end - audio_start)
+
+    position, frame = _find_mp3_frame(data)
+    if frame is None:
+        return None
+    # Кадр Xing/Info не содержит звука
+    if _read_xing_duration(data, position, frame) is not None or _read_vbri_duration(data, position, frame) is not None:
+        position += frame.length
+
+    sample_rate = frame.sample_rate
+    points_step = SEEK_TABLE_INTERVAL * sample_rate
+    offsets = array.array("q")
+    positions = array.array("q")
+    samples = 0
+    while position <= len(data) - 4:
+        frame = _parse_mp3_header(data[position:position + 4])
+        if frame is None:
+            # Мусор между кадрами: ищем следующий кадр
+            skipped, frame = _find_mp3_frame(data[position + 1:position + 1 + MP3_SYNC_SEARCH_SIZE])
+            if frame is None:
+                break
+            position += 1 + skipped
+            continue
+
+        while len(offsets) * points_step < samples + frame.samples_per_frame:
+            offsets.append(audio_start + position)
+            positions.append(samples)
+        samples += frame.samples_per_frame
+        position += frame.length
+
+    if len(offsets) == 0:
+        return None
+    return SeekTable(sample_rate=sample_rate, header_size=0, offsets=offsets, positions=positions)
+
+
+def _find_mp3_frame(data: bytes) -> typing.Tuple[int, _Mp3Frame | None]:
+    position = data.find(b"\xff")
+    while 0 <= position <= len(data) - 4:
+        frame = _parse_mp3_header(data[position:position + 4])
+        if frame is not None:
+            # Случайное совпадение с синхрословом отсекаем по заголовку следующего кадра
+            next_position = position + frame.length
+            if next_position + 4 > len(data) or _parse_mp3_header(data[next_position:next_position + 4]) is not None:
+                return position, frame
+        position = data.find(b"\xff", position + 1)
+    return -1, None
+
+
+def _parse_mp3_header(header: bytes) -> _Mp3Frame | None:
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    is_mpeg1 = version == 3
+    bitrate = MP3_BITRATES[(is_mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    channels = 1 if header[3] >> 6 == 3 else 2
+
+    if layer == 1:
+        samples_per_frame = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if layer == 2 or is_mpeg1 else 576
+        length = samples_per_frame // 8 * bitrate // sample_rate + padding
+    return _Mp3Frame(is_mpeg1, layer, bitrate, sample_rate, channels, samples_per_frame, length)
+
+
+def _read_xing_duration(data: bytes, position: int, frame: _Mp3Frame) -> float | None:
+    # Заголовок Xing (VBR) или Info (CBR) лежит сразу после side information первого кадра
+    if frame.is_mpeg1:
+        side_information = 17 if frame.channels == 1 else 32
+    else:
+        side_information = 9 if frame.channels == 1 else 17
+    offset = position + 4 + side_information
+    if data[offset:offset + 4] not in (b"Xing", b"Info") or len(data) < offset + 12:
+        return None
+
+    flags, = struct.unpack_from(">I", data, offset + 4)
+    if not flags & 0x01:
+        return None
+    number_of_frames, = struct.unpack_from(">I", data, offset + 8)
+    return number_of_frames * frame.samples_per_frame / frame.sample_rate
+
+
+def _read_vbri_duration(data: bytes, position: int, frame: _Mp3Frame) -> float | None:
+    offset = position + 4 + 32
+    if data[offset:offset + 4] != b"VBRI" or len(data) < offset + 18:
+        return None
+
+    number_of_frames, = struct.unpack_from(">I", data, offset + 14)
+    return number_of_frames * frame.samples_per_frame / frame.sample_rate
+
+
+def _read_ogg(file: typing.BinaryIO) -> ParsedStream | None:
+    page = file.read(27)
+    if len(page) < 27:
+        return None
+    serial, = struct.unpack_from("<I", page, 14)
+    number_of_segments = page[26]
+    segments = file.read(number_of_segments)
+    packet = file.read(sum(segments))
+
+    header = _parse_ogg_header(packet)
+    if header is None:
+        return None
+    codec, sample_rate, channels, pre_skip = header
+
+    granule_position = _read_last_granule_position(file, serial)
+    if granule_position is None or sample_rate == 0:
+        return None
+
+    return ParsedStream(format="ogg", codec=codec, sample_rate=sample_rate, channels=channels,
+                        duration=max(granule_position - pre_skip, 0) / sample_rate)
+
+
+def _parse_ogg_header(packet: bytes) -> typing.Tuple[str, int, int, int] | None:
+    """
+        Кодек, частота, число каналов и число сэмплов, которые декодер пропускает в начале
+    """
+    if packet.startswith(b"OpusHead") and len(packet) >= 19:
+        codec = "opus"
+        channels = packet[9]
+        pre_skip, = struct.unpack_from("<H", packet, 10)
+        # Позиции Opus всегда считаются в 48 кГц, независимо от исходной частоты
+        sample_rate = OPUS_SAMPLE_RATE
+    elif packet.startswith(b"\x01vorbis") and len(packet) >= 16:
+        codec = "vorbis"
+        channels = packet[11]
+        pre_skip = 0
+        sample_rate, = struct.unpack_from("<I", packet, 12)
+    else:
+        return None
+    return codec, sample_rate, channels, pre_skip
+
+
+def _build_ogg_seek_table(data: bytes) -> SeekTable | None:
+    if len(data) < 27:
+        return None
+    serial, = struct.unpack_from("<I", data, 14)
+    packet_start = 27 + data[26]
+    header = _parse_ogg_header(data[packet_start:packet_start + sum(data[27:packet_start])])
+    if header is None:
+        return None
+    _, sample_rate, _, pre_skip = header
+    if sample_rate == 0:
+        return None
+
+    points_step = SEEK_TABLE_INTERVAL * sample_rate
+    header_size = None
+    offsets = array.array("q")
+    positions = array.array("q")
+    # Позиция конца предыдущей страницы - начало текущей
+    previous_granule_position = 0
+    position = 0
+    while position <= len(data) - 27:
+        if data[position:position + 4] != b"OggS":
+            position = data.find(b"OggS", position + 1)
+            if position < 0:
+                break
+            continue
+
+        granule_position, page_serial = struct.unpack_from("<qI", data, position + 6)
+        number_of_segments = data[position + 26]
+        page_size = 27 + number_of_segments + sum(data[position + 27:position + 27 + number_of_segments])
+        if page_serial == serial and granule_position > 0:
+            # Страницы до первой звуковой - заголовки кодека
+            if header_size is None:
+                header_size = position
+            start = max(previous_granule_position - pre_skip, 0)
+            while len(offsets) * points_step < granule_position - pre_skip:
+                offsets.append(position)
+                positions.append(start)
+            previous_granule_position = granule_position
+        position += page_size
+
+    if header_size is None or len(offsets) == 0:
+        return None
+    return SeekTable(sample_rate=sample_rate, header_size=header_size, offsets=offsets, positions=positions)
+
+
+def _read_last_granule_position(file: typing.BinaryIO, serial: int) -> int | None:
+    file.seek(0, os.SEEK_END)
+    file_size = file.tell()
+    file.seek(max(file_size - OGG_TAIL_SIZE, 0))
+    data = file.read()
+
+    position = data.rfind(b"OggS")
+    while position >= 0:
+        if position + 27 <= len(data):
+            granule_position, page_serial = struct.unpack_from("<qI", data, position + 6)
+            # -1 - на странице не заканчивается ни один пакет
+            if page_serial == serial and granule_position != -1:
+                return granule_position
+        position = data.rfind(b"OggS", 0, position)
+    return None
@@ -30,3 +30,10 @@ class ThreadNotFoundError(commands.CommandError):
 
 class InsufficientPermissionsToExecuteCommand(commands.CommandError):
     pass
+
+
+class FFmpegProcessesLimitError(Exception):
+    """
+        Запущено ffmpeg_pool_max_processes процессов FFmpeg, новый трек не открывается
+    """
+    pass
@@ -6,6 +6,7 @@ from core.config import ConfigManager
 from database.clients import ThreadDataBase
 from requests_to_music_service.data import InfoAboutRequest
 from requests_to_music_service.executing_requests import ExecutingRequests
+from storage.spill import SpillSettings
 from storage.storage import Storage
 from yandex.cache import CacheTracks
 
@@ -26,8 +27,9 @@ class BotFactory:
         db_api = ThreadDataBase(self._bot.config, self._bot.database_api, guild.id)
         return UserThread(guild, db_api, self._bot.config, self._bot.factory, self._bot.message_manager, self._bot.slash_commands)
 
-    def create_player(self, timer: "Timer", view: "DiscordViewHelper",
+    def create_player(self, guild_id: int, timer: "Timer", view: "DiscordViewHelper",
                       on_add_request_action: typing.Callable[[InfoAboutRequest], None]) -> "PlayerFacade":
+        from core.player import PlaybackSettings
         from core.playerfacade import PlayerFacade
         from yandex.collector import TrackQueueManager
 
@@ -35,15 +37,44 @@ class BotFactory:
         delay_between_errors = self._config["delay_in_case_of_error_when_requesting_music_service"]
 
         executing = ExecutingRequests(number_attempts, delay_between_errors)
-        storage = Storage(executing)
+        spill_settings = SpillSettings(threshold=int(self._config["storage_spill_threshold"]),
+                                       page_size=int(self._config["storage_spill_page_size"]),
+                                       hot_pages=int(self._config["storage_spill_hot_pages"]))
+        storage = Storage(executing, self._bot.metadata_registry, spill_settings)
         cache_tracks = CacheTracks(storage, self._bot.yandex_music_api, self._config)
         queue_manager = TrackQueueManager(self._bot.config["max_tracks_in_list"], self._bot.task_manager,
                                           storage,
                                           cache_tracks)
-        player = PlayerFacade(timer, on_add_request_action, queue_manager, view, self._bot.task_manager, storage)
+        playback_settings = PlaybackSettings(max_played_tracks=int(self._config["max_played_tracks_in_history"]),
+                                             preroll=float(self._config["gapless_preroll"]),
+                                             crossfade=float(self._config["crossfade_duration"]))
+        track_index = self._bot.track_index
+        player = PlayerFacade(timer, on_add_request_action, queue_manager, view, self._bot.task_manager, storage,
+                              playback_settings, self._bot.ffmpeg_pool,
+                              on_track_played_action=lambda track: track_index.record_play(track.id, guild_id))
         return player
 
+    def create_broadcast_station(self, name: str,
+                                 on_finished: typing.Callable[["BroadcastStation"], None]) -> "BroadcastStation":
+        from core.broadcast import BroadcastStation
+        from yandex.collector import TrackQueueManager
+
+        executing = ExecutingRequests(self._config["number_of_attempts_when_requesting_music_service"],
+                                      self._config["delay_in_case_of_error_when_requesting_music_service"])
+        spill_settings = SpillSettings(threshold=int(self._config["storage_spill_threshold"]),
+                                       page_size=int(self._config["storage_spill_page_size"]),
+                                       hot_pages=int(self._config["storage_spill_hot_pages"]))
+        storage = Storage(executing, self._bot.metadata_registry, spill_settings)
+        cache_tracks = CacheTracks(storage, self._bot.yandex_music_api, self._config)
+        queue_manager = TrackQueueManager(self._config["max_tracks_in_list"], self._bot.task_manager,
+                                          storage, cache_tracks)
+        return BroadcastStation(name, queue_manager, storage, self._bot.ffmpeg_pool,
+                                preroll=float(self._config["gapless_preroll"]),
+                                crossfade=float(self._config["crossfade_duration"]),
+                                buffer_frames=int(self._config["broadcast_buffer_frames"]),
+                                on_finished=on_finished)
+
     def create_timer(self, waiting_time: int) -> "Timer":
         from core.timer import Timer
 
-        return Timer(waiting_time, self._bot.task_manager)
+        return Timer(waiting_time, self._bot.timer_wheel)
@@ -0,0 +1,331 @@
+"""
+    Пул заранее запущенных процессов FFmpeg
+    Процесс запускается с чтением из stdin и ждет данные. Когда нужен трек, берем готовый процесс
+    и передаем ему файл через stdin, поэтому запуск процесса (fork/exec, инициализация) не влияет на старт трека.
+    Аргументы входа зависят от профиля запуска файла, поэтому ждущие процессы хранятся отдельно для каждого профиля.
+    Если включены процессы подготовки звука (core.audio_workers), FFmpeg запускают они, а пул только готовит параметры
+"""
+import asyncio
+import collections
+import subprocess
+import sys
+import threading
+import time
+import typing
+
+from discord import AudioSource
+
+from core.audio import GainAudioSource
+from core.audio_worker import write_input
+from core.audio_workers import AudioWorkerPool
+from core.errors import FFmpegProcessesLimitError
+from core.launch_profiles import LaunchProfiles
+from core.log_utils import get_logger
+
+logger = get_logger(__name__)
+
+# 20 мс PCM: 48 кГц, 2 канала, 16 бит
+FRAME_SIZE = 3840
+# Те же параметры, что использует discord.FFmpegPCMAudio, но вход - stdin
+FFMPEG_ARGUMENTS = ("-hide_banner", "-loglevel", "warning")
+FFMPEG_INPUT = ("-i", "pipe:0")
+FFMPEG_OUTPUT = ("-f", "s16le", "-ar", "48000", "-ac", "2", "pipe:1")
+INPUT_CHUNK_SIZE = 64 * 1024
+# Байт PCM в секунде
+PCM_BYTES_PER_SECOND = 48000 * 4
+
+
+class PooledFFmpegAudio(AudioSource):
+    """
+        PCM из процесса FFmpeg. Файл передается процессу отдельным потоком
+        При перемотке процессу передаются header_size байт заголовков и файл со смещения offset,
+        а первые skip_bytes байт PCM (от начала кадра до нужного момента) пропускаются
+    """
+
+    def __init__(self, process: subprocess.Popen, filename: str,
+                 on_cleanup: typing.Callable[[], None],
+                 header_size: int = 0, offset: int = 0, skip_bytes: int = 0) -> None:
+        self._process: subprocess.Popen | None = process
+        self._stdout: typing.IO[bytes] = process.stdout
+        self._on_cleanup: typing.Callable[[], None] = on_cleanup
+        self._skip_bytes: int = skip_bytes
+        self._writer: threading.Thread = threading.Thread(target=write_input,
+                                                          args=(process, filename, header_size, offset),
+                                                          daemon=True, name=f"ffmpeg-input:{process.pid}")
+        self._writer.start()
+
+    def read(self) -> bytes:
+        while self._skip_bytes > 0:
+            skipped = self._stdout.read(min(self._skip_bytes, INPUT_CHUNK_SIZE))
+            if not skipped:
+                return b""
+            self._skip_bytes -= len(skipped)
+
+        data = self._stdout.read(FRAME_SIZE)
+        if len(data) != FRAME_SIZE:
+            return b""
+        return data
+
+    def is_opus(self) -> bool:
+        return False
+
+    def cleanup(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+
+        FFmpegProcessPool.kill(process)
+        self._on_cleanup()
+
+
+class FFmpegProcessPool:
+    """
+        Один пул на весь бот
+        idle_processes - сколько процессов ждут трек (для профиля последнего запущенного трека),
+        max_processes - ограничение на все процессы FFmpeg (ждущие и проигрывающие). Пул не пополняется сверх него,
+        а трек сверх него не открывается (FFmpegProcessesLimitError),
+        idle_lifetime - через сколько секунд ждущий процесс заменяется новым,
+        audio_workers - процессы, которые декодируют и кодируют треки в Opus. None - треки открываются в процессе бота
+    """
+
+    def __init__(self, idle_processes: int, max_processes: int, idle_lifetime: float,
+                 launch_profiles: LaunchProfiles, audio_workers: AudioWorkerPool | None = None,
+                 executable: str = "ffmpeg") -> None:
+        self._idle_processes: int = idle_processes
+        self._max_processes: int = max_processes
+        self._idle_lifetime: float = idle_lifetime
+        self._launch_profiles: LaunchProfiles = launch_profiles
+        self._audio_workers: AudioWorkerPool | None = audio_workers
+        self._executable: str = executable
+
+        # Аргументы входа -> (время запуска, процесс)
+        self._idle: typing.Dict[typing.Tuple[str, ...], typing.Deque[typing.Tuple[float, subprocess.Popen]]] = {}
+        # Профиль, для которого пополняем пул. Треки одной очереди обычно запускаются с одним профилем
+        self._warm_profile: typing.Tuple[str, ...] = ()
+        self._number_of_active_processes: int = 0
+        # Процессы, которые запускает пополнение пула
+        self._number_of_spawning_processes: int = 0
+        # Процессы освобождаются из потока проигрывания discord, а пул пополняется в отдельном потоке
+        self._lock: threading.Lock = threading.Lock()
+        self._warm_up_scheduled: bool = False
+        self._warm_up_task: asyncio.Future | None = None
+
+        # Статистика
+        self._number_of_started_processes: int = 0
+        self._number_of_hits: int = 0
+        self._number_of_misses: int = 0
+
+    @property
+    def number_of_idle_processes(self) -> int:
+        return sum(len(processes) for processes in self._idle.values())
+
+    @property
+    def number_of_active_processes(self) -> int:
+        return self._number_of_active_processes
+
+    def get_duration(self, filename: str, on_probed: typing.Callable[[float], None] | None = None) -> float:
+        """
+            Длительность файла из профилей запуска, 0 - неизвестна (см. LaunchProfiles.get_duration)
+        """
+        return self._launch_profiles.get_duration(filename, on_probed)
+
+    def open(self, filename: str, position: float = 0) -> AudioSource:
+        """
+            position - с какого момента (сек.) начинаем трек
+            FFmpegProcessesLimitError - уже запущено max_processes процессов
+        """
+        input_arguments = self._launch_profiles.get_input_arguments(filename)
+        self.__reserve_active_process()
+        if self._audio_workers is not None:
+            return self.__open_in_worker(filename, position, input_arguments)
+
+        self._warm_profile = input_arguments
+        process = self.__take_idle_process(input_arguments)
+        if process is None:
+            self._number_of_misses += 1
+            self.__kill_extra_idle_processes()
+            try:
+                process = self.__spawn(input_arguments)
+            except OSError:
+                self.__release()
+                raise
+        else:
+            self._number_of_hits += 1
+        self.__schedule_warm_up()
+
+        source = self.__create_source(process, filename, position)
+        # Громкость измерена заранее: нормализация - это умножение PCM на постоянный множитель
+        gain = self._launch_profiles.get_gain(filename)
+        if gain != 1:
+            return GainAudioSource(source, gain)
+        return source
+
+    def warm_up(self) -> None:
+        """
+            Пополняет пул до idle_processes процессов
+            Запуск процесса блокирует поток, поэтому из цикла событий вызывается через asyncio.to_thread
+        """
+        self._warm_up_scheduled = False
+        if self._audio_workers is not None:
+            # Треки запускают процессы подготовки звука, ждущие процессы не понадобятся
+            return
+
+        warm_profile = self._warm_profile
+        with self._lock:
+            self.__remove_unhealthy_processes()
+            number_of_processes = self.number_of_idle_processes + self._number_of_active_processes + \
+                self._number_of_spawning_processes
+            number_of_warm_processes = len(self._idle.get(warm_profile, ())) + self._number_of_spawning_processes
+            number_of_processes_to_spawn = max(min(self._idle_processes - number_of_warm_processes,
+                                                   self._max_processes - number_of_processes), 0)
+            self._number_of_spawning_processes += number_of_processes_to_spawn
+
+        for index in range(number_of_processes_to_spawn):
+            try:
+                process = self.__spawn(warm_profile)
+            except OSError as e:
+                logger.error(f"Failed to start FFmpeg: {e}")
+                with self._lock:
+                    self._number_of_spawning_processes -= number_of_processes_to_spawn - index
+                return
+            with self._lock:
+                self._idle.setdefault(warm_profile, collections.deque()).append((time.monotonic(), process))
+                self._number_of_spawning_processes -= 1
+
+    def close(self) -> None:
+        with self._lock:
+            for idle in self._idle.values():
+                while idle:
+                    _, process = idle.popleft()
+                    self.kill(process)
+            self._idle.clear()
+
+    def log_statistics(self) -> None:
+        self._launch_profiles.log_statistics()
+        if self._audio_workers is not None:
+            self._audio_workers.log_statistics()
+        logger.info(f"FFmpeg pool: idle: {self.number_of_idle_processes}; active: {self._number_of_active_processes}; "
+                    f"started: {self._number_of_started_processes}; "
+                    f"hits: {self._number_of_hits}; misses: {self._number_of_misses}.")
+
+    @staticmethod
+    def kill(process: subprocess.Popen) -> None:
+        """
+            Вызывается и из цикла событий, поэтому завершения процесса ждет отдельный поток
+        """
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        if process.poll() is None:
+            threading.Thread(target=process.wait, daemon=True, name=f"ffmpeg-reaper:{process.pid}").start()
+
+    def __create_source(self, process: subprocess.Popen, filename: str, position: float) -> PooledFFmpegAudio:
+        header_size, offset, skip_bytes = self.__get_start(filename, position)
+        return PooledFFmpegAudio(process, filename, self.__release, header_size, offset, skip_bytes)
+
+    def __open_in_worker(self, filename: str, position: float,
+                         input_arguments: typing.Tuple[str, ...]) -> AudioSource:
+        header_size, offset, skip_bytes = self.__get_start(filename, position)
+        return self._audio_workers.open(self.__get_command(input_arguments), filename,
+                                        header_size, offset, skip_bytes,
+                                        self._launch_profiles.get_gain(filename), self.__release)
+
+    def __get_start(self, filename: str, position: float) -> typing.Tuple[int, int, int]:
+        """
+            (header_size, offset, skip_bytes) для PooledFFmpegAudio
+        """
+        if position <= 0:
+            return 0, 0, 0
+
+        header_size, offset, start = 0, 0, 0.0
+        seek_table = self._launch_profiles.get_seek_table(filename)
+        if seek_table is not None:
+            offset, start = seek_table.find(position)
+            header_size = seek_table.header_size
+        else:
+            # Таблицы еще нет: FFmpeg декодирует трек с начала, лишнее пропускаем
+            logger.info(f"Seek table not found, decoding from the start: {filename}.")
+        # Пропускаем целое число сэмплов (4 байта на сэмпл)
+        skip_bytes = round((position - start) * PCM_BYTES_PER_SECOND / 4) * 4
+        return header_size, offset, skip_bytes
+
+    def __reserve_active_process(self) -> None:
+        with self._lock:
+            if self._number_of_active_processes >= self._max_processes:
+                raise FFmpegProcessesLimitError(f"FFmpeg processes limit reached: "
+                                                f"{self._number_of_active_processes} active.")
+            self._number_of_active_processes += 1
+
+    def __take_idle_process(self, input_arguments: typing.Tuple[str, ...]) -> subprocess.Popen | None:
+        with self._lock:
+            self.__remove_unhealthy_processes()
+            idle = self._idle.get(input_arguments)
+            if not idle:
+                return None
+            # Самый свежий процесс, старые уйдут по времени жизни
+            _, process = idle.pop()
+            return process
+
+    def __kill_extra_idle_processes(self) -> None:
+        """
+            Самые старые ждущие процессы (других профилей) уступают место новому, чтобы не превысить max_processes
+        """
+        with self._lock:
+            while self.number_of_idle_processes + self._number_of_active_processes > self._max_processes:
+                idle = min((idle for idle in self._idle.values() if idle), key=lambda idle: idle[0][0])
+                _, process = idle.popleft()
+                self.kill(process)
+
+    def __remove_unhealthy_processes(self) -> None:
+        """
+            Вызывается под self._lock
+        """
+        now = time.monotonic()
+        for input_arguments, idle in list(self._idle.items()):
+            healthy = collections.deque()
+            for started_at, process in idle:
+                if process.poll() is not None:
+                    logger.warning(f"Idle FFmpeg process {process.pid} exited with code {process.returncode}.")
+                    self.kill(process)
+                elif now - started_at > self._idle_lifetime:
+                    self.kill(process)
+                else:
+                    healthy.append((started_at, process))
+            if healthy:
+                self._idle[input_arguments] = healthy
+            else:
+                del self._idle[input_arguments]
+
+    def __spawn(self, input_arguments: typing.Tuple[str, ...]) -> subprocess.Popen:
+        creation_flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        process = subprocess.Popen(self.__get_command(input_arguments),
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   creationflags=creation_flags)
+        self._number_of_started_processes += 1
+        return process
+
+    def __get_command(self, input_arguments: typing.Tuple[str, ...]) -> typing.Tuple[str, ...]:
+        return self._executable, *FFMPEG_ARGUMENTS, *input_arguments, *FFMPEG_INPUT, *FFMPEG_OUTPUT
+
+    def __schedule_warm_up(self) -> None:
+        """
+            Пополняем пул после старта трека, чтобы запуск процесса не задерживал переход
+        """
+        if self._warm_up_scheduled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._warm_up_scheduled = True
+        self._warm_up_task = loop.create_task(asyncio.to_thread(self.warm_up))
+
+    def __release(self) -> None:
+        with self._lock:
+            self._number_of_active_processes = max(self._number_of_active_processes - 1, 0)
@@ -31,8 +31,15 @@ class CactusDiscordHelpCommand(commands.HelpCommand):
             "next": messages["next_command_description"],
             "loop": messages["loop_command_description"],
             "pause": messages["pause_command_description"],
+            "shuffle": messages["shuffle_command_description"],
             "stop": messages["stop_command_description"],
             "queue": messages["queue_command_description"],
+            "remove": messages["remove_command_description"],
+            "move": messages["move_command_description"],
+            "playnext": messages["playnext_command_description"],
+            "jump": messages["jump_command_description"],
+            "seek": messages["seek_command_description"],
+            "radio": messages["radio_command_description"],
             "play": messages["play_command_description"]
         }
 
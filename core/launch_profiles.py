@@ -0,0 +1,333 @@
+"""
+    Профили запуска FFmpeg для закэшированных треков
+    По умолчанию FFmpeg читает начало файла, чтобы определить формат и параметры потока (probing).
+    Для уже известного файла параметры берем из индекса и запускаем FFmpeg с явным форматом
+    и минимальными -probesize/-analyzeduration. Полное определение нужно только новому или измененному файлу.
+    Для перемотки здесь же хранятся таблицы смещений (в памяти, они строятся за одно чтение файла).
+    Громкость трека измеряется в фоне один раз и сохраняется вместе с параметрами потока.
+    Длительность трека тоже берется отсюда, если сервис ее не прислал
+"""
+import asyncio
+import collections
+import dataclasses
+import json
+import os
+import typing
+
+from core.duration import read_stream, build_seek_table, SeekTable
+from core.log_utils import get_logger
+from core.loudness import LoudnessSettings, Loudness, analyze_loudness, get_gain
+
+logger = get_logger(__name__)
+
+# Минимальные значения, которые принимает FFmpeg
+FAST_START_ARGUMENTS = ("-probesize", "32", "-analyzeduration", "0")
+# Форматы, для которых хватает заголовка первого кадра
+FAST_START_FORMATS = frozenset(("mp3", "ogg", "flac", "wav", "aac"))
+FULL_PROBE_ARGUMENTS: typing.Tuple[str, ...] = ()
+# Для скольких файлов держим таблицы перемотки
+MAX_SEEK_TABLES = 256
+
+
+@dataclasses.dataclass
+class StreamInfo:
+    format: str
+    codec: str
+    sample_rate: int
+    channels: int
+    duration: float
+    # По размеру и времени изменения понимаем, что файл не поменялся с момента определения
+    size: int
+    modified_at: int
+    # Громкость (LUFS) и пик (dBFS). None - еще не измерены
+    loudness: float | None = None
+    peak: float | None = None
+
+
+class LaunchProfiles:
+    """
+        Один индекс на весь бот
+        max_files - сколько файлов помним, самые давно проигранные вытесняются
+    """
+
+    def __init__(self, path: str, max_files: int, loudness_settings: LoudnessSettings,
+                 loudness_analysis_concurrency: int,
+                 ffprobe: str = "ffprobe", ffmpeg: str = "ffmpeg") -> None:
+        self._path: str = path
+        self._max_files: int = max_files
+        self._loudness_settings: LoudnessSettings = loudness_settings
+        self._ffprobe: str = ffprobe
+        self._ffmpeg: str = ffmpeg
+        self._streams: typing.OrderedDict[str, StreamInfo] = collections.OrderedDict()
+        self._seek_tables: typing.OrderedDict[str, SeekTable] = collections.OrderedDict()
+        # Файлы, которые определяются прямо сейчас. Повторный запрос ждет то же определение
+        self._probing: typing.Dict[str, asyncio.Task] = {}
+        # Файлы, для которых сейчас строится таблица перемотки
+        self._indexing: typing.Set[str] = set()
+        # Файлы, громкость которых измеряется или ждет измерения
+        self._analyzing: typing.Set[str] = set()
+        # Измерение декодирует трек целиком, поэтому одновременно измеряем не больше нескольких файлов
+        self._analysis_semaphore: asyncio.Semaphore = asyncio.Semaphore(loudness_analysis_concurrency)
+        # Изменения нумеруются, чтобы отметить сохраненным только то, что действительно записано
+        self._version: int = 0
+        self._saved_version: int = 0
+        self._snapshot_version: int = 0
+
+        # Статистика
+        self._number_of_fast_starts: int = 0
+        self._number_of_full_probes: int = 0
+
+    def get_stream_info(self, filename: str) -> StreamInfo | None:
+        """
+            None - файл не определялся или изменился
+        """
+        stream_info = self._streams.get(filename)
+        if stream_info is None:
+            return None
+
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        if stat.st_size != stream_info.size or stat.st_mtime_ns != stream_info.modified_at:
+            logger.info(f"Stream info mismatch, file changed: {filename}.")
+            del self._streams[filename]
+            self._seek_tables.pop(filename, None)
+            self._version += 1
+            return None
+
+        self._streams.move_to_end(filename)
+        return stream_info
+
+    def get_input_arguments(self, filename: str) -> typing.Tuple[str, ...]:
+        """
+            Аргументы FFmpeg перед -i. Неизвестный файл запускается с полным определением
+            и определяется в фоне, чтобы следующий запуск был быстрым
+        """
+        stream_info = self.get_stream_info(filename)
+        if stream_info is None or stream_info.format not in FAST_START_FORMATS:
+            self._number_of_full_probes += 1
+            if stream_info is None:
+                self.__schedule_probe(filename)
+            return FULL_PROBE_ARGUMENTS
+
+        self._number_of_fast_starts += 1
+        if filename not in self._seek_tables:
+            self.__schedule_seek_table(filename)
+        return "-f", stream_info.format, *FAST_START_ARGUMENTS
+
+    def get_gain(self, filename: str) -> float:
+        """
+            Множитель громкости трека. Пока громкость не измерена, трек играет без изменений
+        """
+        if not self._loudness_settings.enabled:
+            return 1
+
+        stream_info = self.get_stream_info(filename)
+        if stream_info is None:
+            return 1
+        if stream_info.loudness is None or stream_info.peak is None:
+            self.__schedule_analysis(filename)
+            return 1
+        return get_gain(Loudness(integrated=stream_info.loudness, peak=stream_info.peak), self._loudness_settings)
+
+    def get_duration(self, filename: str,
+                     on_probed: typing.Callable[[float], None] | None = None) -> float:
+        """
+            Длительность (сек.), 0 - неизвестна. Неизвестный файл определяется в фоне,
+            после определения длительность передается в on_probed
+        """
+        stream_info = self.get_stream_info(filename)
+        if stream_info is not None:
+            return stream_info.duration
+
+        task = self.__schedule_probe(filename)
+        if task is not None and on_probed is not None:
+            def on_done(_: asyncio.Task) -> None:
+                if task.cancelled() or task.exception() is not None or task.result() is None:
+                    return
+                on_probed(task.result().duration)
+
+            task.add_done_callback(on_done)
+        return 0
+
+    def get_seek_table(self, filename: str) -> SeekTable | None:
+        """
+            None - таблица еще не построена или файл изменился
+        """
+        if self.get_stream_info(filename) is None:
+            return None
+
+        seek_table = self._seek_tables.get(filename)
+        if seek_table is not None:
+            self._seek_tables.move_to_end(filename)
+        return seek_table
+
+    async def probe(self, filename: str) -> StreamInfo | None:
+        return await asyncio.shield(self.__schedule_probe(filename))
+
+    def load(self) -> None:
+        if not os.path.exists(self._path):
+            return
+
+        try:
+            with open(self._path, "r", encoding="utf-8") as file_read:
+                data = json.load(file_read)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load launch profiles: {e}.")
+            return
+
+        for filename, item in data.items():
+            self.__insert(filename, StreamInfo(**item))
+        self._saved_version = self._version
+        logger.info(f"Launch profiles loaded: {len(self._streams)} files.")
+
+    def get_snapshot(self) -> typing.Dict[str, dict] | None:
+        """
+            Снимок для сохранения. None - с последнего сохранения ничего не изменилось.
+            После успешной записи нужно вызвать mark_saved, иначе снимок будет сделан повторно
+        """
+        if self._version == self._saved_version:
+            return None
+
+        self._snapshot_version = self._version
+        return {filename: dataclasses.asdict(stream_info) for filename, stream_info in self._streams.items()}
+
+    def mark_saved(self) -> None:
+        """
+            Последний снимок записан. Изменения, сделанные во время записи, попадут в следующий снимок
+        """
+        self._saved_version = self._snapshot_version
+
+    def save_snapshot(self, snapshot: typing.Dict[str, dict]) -> None:
+        """
+            Может выполняться в отдельном потоке
+        """
+        temporary_path = f"{self._path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file_write:
+            json.dump(snapshot, file_write)
+        os.replace(temporary_path, self._path)
+
+    def log_statistics(self) -> None:
+        logger.info(f"Launch profiles: files: {len(self._streams)}; "
+                    f"fast starts: {self._number_of_fast_starts}; full probes: {self._number_of_full_probes}.")
+
+    def __insert(self, filename: str, stream_info: StreamInfo) -> None:
+        self._streams[filename] = stream_info
+        self._streams.move_to_end(filename)
+        self._version += 1
+        while len(self._streams) > self._max_files:
+            self._streams.popitem(last=False)
+
+    def __schedule_seek_table(self, filename: str) -> None:
+        if filename in self._indexing:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._indexing.add(filename)
+        loop.create_task(self.__build_seek_table(filename))
+
+    async def __build_seek_table(self, filename: str) -> None:
+        try:
+            seek_table = await asyncio.to_thread(build_seek_table, filename)
+        finally:
+            self._indexing.discard(filename)
+
+        # Пока таблица строилась, файл могли изменить
+        if seek_table is None or self.get_stream_info(filename) is None:
+            return
+        self._seek_tables[filename] = seek_table
+        while len(self._seek_tables) > MAX_SEEK_TABLES:
+            self._seek_tables.popitem(last=False)
+
+    def __schedule_analysis(self, filename: str) -> None:
+        if filename in self._analyzing:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._analyzing.add(filename)
+        loop.create_task(self.__analyze(filename))
+
+    async def __analyze(self, filename: str) -> None:
+        try:
+            async with self._analysis_semaphore:
+                loudness = await analyze_loudness(filename, self._ffmpeg)
+        finally:
+            self._analyzing.discard(filename)
+
+        # Пока громкость измерялась, файл могли изменить или вытеснить из индекса
+        stream_info = self.get_stream_info(filename)
+        if loudness is None or stream_info is None:
+            return
+        stream_info.loudness = loudness.integrated
+        stream_info.peak = loudness.peak
+        self._version += 1
+        logger.info(f"Loudness of {filename}: {loudness.integrated} LUFS, peak {loudness.peak} dBFS.")
+
+    def __schedule_probe(self, filename: str) -> asyncio.Task | None:
+        task = self._probing.get(filename)
+        if task is not None:
+            return task
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+        task = loop.create_task(self.__probe_and_insert(filename))
+        self._probing[filename] = task
+        task.add_done_callback(lambda _: self._probing.pop(filename, None))
+        return task
+
+    async def __probe_and_insert(self, filename: str) -> StreamInfo | None:
+        stream_info = await self.__probe(filename)
+        if stream_info is not None:
+            self.__insert(filename, stream_info)
+            self.__schedule_seek_table(filename)
+            if self._loudness_settings.enabled:
+                self.__schedule_analysis(filename)
+        return stream_info
+
+    async def __probe(self, filename: str) -> StreamInfo | None:
+        try:
+            stat = os.stat(filename)
+        except OSError as e:
+            logger.error(f"Failed to probe {filename}: {e}.")
+            return None
+
+        # MP3 и Ogg разбираем сами, ffprobe нужен только остальным форматам
+        stream = await asyncio.to_thread(read_stream, filename)
+        if stream is not None:
+            return StreamInfo(format=stream.format, codec=stream.codec, sample_rate=stream.sample_rate,
+                              channels=stream.channels, duration=stream.duration,
+                              size=stat.st_size, modified_at=stat.st_mtime_ns)
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self._ffprobe, "-v", "error", "-select_streams", "a:0",
+                "-show_entries", "format=format_name,duration:stream=codec_name,sample_rate,channels",
+                "-of", "json", filename,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+            output, _ = await process.communicate()
+        except OSError as e:
+            logger.error(f"Failed to probe {filename}: {e}.")
+            return None
+
+        try:
+            data = json.loads(output)
+            audio_stream = data["streams"][0]
+            return StreamInfo(
+                # ffprobe перечисляет подходящие демультиплексоры через запятую, для -f берем первый
+                format=data["format"]["format_name"].split(",")[0],
+                codec=audio_stream["codec_name"],
+                sample_rate=int(audio_stream["sample_rate"]),
+                channels=int(audio_stream["channels"]),
+                duration=float(data["format"].get("duration", 0)),
+                size=stat.st_size,
+                modified_at=stat.st_mtime_ns)
+        except (ValueError, KeyError, IndexError) as e:
+            logger.error(f"Failed to parse stream info of {filename}: {e}.")
+            return None
@@ -0,0 +1,68 @@
+"""
+    Нормализация громкости по заранее измеренной громкости трека
+    Громкость (EBU R128) и пиковый уровень измеряются один раз в фоне фильтром ebur128,
+    при проигрывании к PCM применяется постоянное усиление
+"""
+import asyncio
+import dataclasses
+import os
+import re
+import sys
+import typing
+
+from core.log_utils import get_logger
+
+logger = get_logger(__name__)
+
+INTEGRATED_LOUDNESS_PATTERN = re.compile(r"I:\s+(-?\d+(?:\.\d+)?) LUFS")
+PEAK_PATTERN = re.compile(r"Peak:\s+(-?\d+(?:\.\d+)?|-inf) dBFS")
+# Анализ не должен отнимать процессор у проигрываемых треков
+ANALYSIS_NICENESS = 10
+
+
+@dataclasses.dataclass
+class LoudnessSettings:
+    enabled: bool
+    target: float  # Целевая громкость (LUFS)
+    max_gain: float  # Максимальное усиление (дБ), чтобы тихие записи не превращались в шум
+    peak_limit: float  # Выше какого уровня (dBFS) не должен подниматься пик после усиления
+
+
+@dataclasses.dataclass
+class Loudness:
+    integrated: float  # LUFS
+    peak: float  # dBFS
+
+
+def get_gain(loudness: Loudness, settings: LoudnessSettings) -> float:
+    """
+        Множитель амплитуды
+    """
+    gain = min(settings.target - loudness.integrated, settings.max_gain, settings.peak_limit - loudness.peak)
+    return 10 ** (gain / 20)
+
+
+async def analyze_loudness(filename: str, executable: str = "ffmpeg") -> Loudness | None:
+    """
+        Декодирует трек целиком, поэтому вызывается только в фоне
+    """
+    preexec_fn = None if sys.platform == "win32" else lambda: os.nice(ANALYSIS_NICENESS)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            executable, "-nostats", "-hide_banner", "-i", filename,
+            "-map", "0:a:0", "-af", "ebur128=peak=true", "-f", "null", "-",
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+            preexec_fn=preexec_fn)
+        _, output = await process.communicate()
+    except OSError as e:
+        logger.error(f"Failed to analyze loudness of {filename}: {e}.")
+        return None
+
+    text = output.decode(errors="replace")
+    # Итоговые значения выводятся в конце, после промежуточных
+    integrated: typing.List[str] = INTEGRATED_LOUDNESS_PATTERN.findall(text)
+    peaks: typing.List[str] = PEAK_PATTERN.findall(text)
+    if process.returncode != 0 or not integrated or not peaks:
+        logger.error(f"Failed to analyze loudness of {filename}: code {process.returncode}.")
+        return None
+    return Loudness(integrated=float(integrated[-1]), peak=float(peaks[-1]))
@@ -38,11 +38,12 @@ class MessageManager:
                                         content: str | None = None,
                                         tts: bool = False,
                                         embed: discord.Embed | None = None,
-                                        embeds: typing.Sequence[discord.Embed] | None = None) -> None:
+                                        embeds: typing.Sequence[discord.Embed] | None = None,
+                                        view: discord.ui.View | None = None) -> None:
         text: str | None = self.__get_text_in_message(content, embed, embeds)
         delete_after: float = get_reading_time(text) if text is not None else self.__message_lifetime
         logger.debug(f"Text: {text}; Delete after: {delete_after}")
-        await text_channel.send(content=content, tts=tts, embed=embed, delete_after=delete_after)
+        await text_channel.send(content=content, tts=tts, embed=embed, delete_after=delete_after, view=view)
 
     @staticmethod
     async def delete(message: discord.Message) -> None:
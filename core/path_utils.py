@@ -27,6 +27,16 @@ def get_path_to_music(name_track: str) -> str:
     return os.path.join(path_to_folder, "{0}.mp3".format(name_track))
 
 
+def get_path_to_static_file(name: str) -> str:
+    """
+        Путь к служебному файлу бота (индексы, кэши), который должен переживать перезапуск
+    """
+    path_to_folder = os.path.join(get_project_root(), "static")
+    if not os.path.isdir(path_to_folder):
+        os.makedirs(path_to_folder)
+    return os.path.join(path_to_folder, name)
+
+
 def get_path_to_messages_json() -> str:
     path = os.path.join(get_project_root(), "messages.json")
     return path
@@ -2,24 +2,38 @@
     Содержит код для проигрывания треков
 """
 
+import asyncio
+import collections
+import dataclasses
 import typing
 
-from discord import FFmpegPCMAudio, VoiceClient
+from discord import AudioSource, VoiceClient
 
+from core.audio import GaplessAudioSource
+from core.errors import FFmpegProcessesLimitError
+from core.ffmpeg_pool import FFmpegProcessPool
 from core.log_utils import get_logger
-from core.timer import Timer
-from utils.taskmanager.protocols import TaskManagerProtocol
 from yandex.collector import TrackQueue
 from yandex.track import TrackWrapperBase
 
 logger = get_logger(__name__)
 
 
+@dataclasses.dataclass
+class PlaybackSettings:
+    max_played_tracks: int  # Сколько прослушанных треков помним для перехода к предыдущему
+    preroll: float  # За сколько секунд до конца трека открываем следующий
+    crossfade: float  # Длительность плавного перехода между треками (сек.), 0 - без перехода
+
+
 class Player:
-    def __init__(self, queue: TrackQueue, task_manager: TaskManagerProtocol) -> None:
+    def __init__(self, queue: TrackQueue, settings: PlaybackSettings, ffmpeg_pool: FFmpegProcessPool) -> None:
         self._voice_client: None | VoiceClient = None
         self._selected_track: TrackWrapperBase | None = None
-        self._played_tracks: typing.List[TrackWrapperBase] = []
+        # Храним только последние max_played_tracks треков, самые старые вытесняются
+        self._played_tracks: typing.Deque[TrackWrapperBase] = collections.deque(maxlen=settings.max_played_tracks)
+        self._settings: PlaybackSettings = settings
+        self._ffmpeg_pool: FFmpegProcessPool = ffmpeg_pool
         self._queue: TrackQueue = queue
         self._is_loop_tracks: bool = False
 
@@ -28,10 +42,13 @@ class Player:
         self._on_track_started_action: typing.Callable[[TrackWrapperBase], None] | None = None
         # Вызывается после завершения проигрывания трека
         self._on_track_completed_action: typing.Callable[[TrackWrapperBase], None] | None = None
-        self._task_manager: TaskManagerProtocol = task_manager
-        self._timer_for_turning_on_next_track: Timer | None = None
-        # Оставшиеся время трека, когда он находится на таймере
-        self._remaining_time_of_track_on_pause: int | None = None
+        # Номер текущего проигрывания. Завершение трека, который остановили вручную, не переключает очередь
+        self._playback_generation: int = 0
+        # Источник, который сейчас читает голосовое соединение, и трек, заранее открытый в нем
+        self._source: GaplessAudioSource | None = None
+        self._prepared_track: TrackWrapperBase | None = None
+        # Эфир общей станции, который сейчас звучит вместо очереди
+        self._broadcast: AudioSource | None = None
 
     @property
     def selected_track(self) -> TrackWrapperBase | None:
@@ -47,6 +64,10 @@ class Player:
             return False
         return self._voice_client.is_playing()
 
+    @property
+    def is_broadcasting(self) -> bool:
+        return self._broadcast is not None
+
     @property
     def is_loop_track(self) -> bool:
         return self._is_loop_tracks
@@ -61,6 +82,15 @@ class Player:
     def is_played_tracks_empty(self) -> bool:
         return len(self._played_tracks) == 0
 
+    @property
+    def position(self) -> float:
+        """
+            Позиция в текущем треке (сек.) с точностью до кадра (20 мс), см. GaplessAudioSource.position
+        """
+        if self._selected_track is None or self._source is None:
+            return 0
+        return self._source.position
+
     def update_voice_client(self, voice_client: VoiceClient) -> None:
         self._voice_client = voice_client
 
@@ -78,16 +108,19 @@ class Player:
             return
 
         if self._selected_track is not None:
-            self._played_tracks.insert(0, self._selected_track)
+            self._played_tracks.appendleft(self._selected_track)
 
         self._selected_track = self._queue.get_next_track()
 
-    def set_preview_track(self) -> None:
+    def set_preview_track(self, track: TrackWrapperBase | None = None) -> None:
+        """
+            track - предыдущий трек, если в истории его уже нет
+        """
         self.__try_stop_voice_client()
 
         if self._selected_track is not None:
             self._queue.add_track_first_to_queue(self._selected_track)
-        self._selected_track = self.__get_preview_track()
+        self._selected_track = track if track is not None else self.__get_preview_track()
 
     def pause(self) -> None:
         if not self.__check_voice_client_and_log_errors():
@@ -97,13 +130,6 @@ class Player:
             return
 
         if self._voice_client.is_playing():
-            if self._timer_for_turning_on_next_track is None:
-                logger.error("(Pause) Timer for turning on next track is None.")
-            else:
-                self._remaining_time_of_track_on_pause = self._timer_for_turning_on_next_track.remaining_time
-                self._timer_for_turning_on_next_track.stop()
-                self._timer_for_turning_on_next_track = None
-
             logger.info(f"Track {self._selected_track.title} on pause.")
             self._voice_client.pause()
 
@@ -115,17 +141,73 @@ class Player:
             return
 
         if self._voice_client.is_paused():
-            if self._remaining_time_of_track_on_pause is None:
-                logger.error("Remaining time of track on pause is None.")
-            elif self._timer_for_turning_on_next_track is not None:
-                logger.error("Timer for turning on next track is not None.")
-            else:
-                self._timer_for_turning_on_next_track = self.__create_timer(self._remaining_time_of_track_on_pause)
-                self._timer_for_turning_on_next_track.start()
-
             logger.info(f"Track {self._selected_track.title} restored from a pause.")
             self._voice_client.resume()
 
+    def seek(self, position: float) -> bool:
+        """
+            Перематывает текущий трек. Пауза сохраняется
+        """
+        if not self.__check_voice_client_and_log_errors():
+            return False
+
+        if self._selected_track is None or self._source is None:
+            return False
+
+        filename = self._selected_track.get_filename()
+        if filename is None or position < 0:
+            return False
+        # Пока длительность неизвестна, принимаем любую позицию: за концом файла трек просто закончится
+        duration = self.__get_duration(self._selected_track, filename)
+        if 0 < duration <= position:
+            return False
+
+        logger.info(f"Seek track {self._selected_track.title} to {position:.3f}.")
+        # Заранее открытый следующий трек закрывается, он откроется снова ближе к концу
+        self._prepared_track = None
+        source = self._ffmpeg_pool.open(filename, position)
+        self._source.seek(source, position, self.__get_duration(self._selected_track, filename, source))
+        return True
+
+    def play_broadcast(self, source: AudioSource) -> None:
+        """
+            Эфир общей станции. Любой трек из очереди останавливает эфир
+        """
+        if not self.__check_voice_client_and_log_errors():
+            source.cleanup()
+            return
+
+        self.__try_stop_voice_client()
+        loop = asyncio.get_event_loop()
+
+        def after(error: Exception | None) -> None:
+            loop.call_soon_threadsafe(self.__on_broadcast_finished, source, error)
+
+        self._broadcast = source
+        self._voice_client.play(source=source, after=after)
+
+    def resume_on_voice_client(self, voice_client: VoiceClient) -> None:
+        """
+            Продолжает текущий трек с той же позиции в новом голосовом соединении
+        """
+        if self._broadcast is not None:
+            # Эфир идет в реальном времени, голосовое соединение продолжает его само
+            self._voice_client = voice_client
+            return
+
+        position = self.position
+        is_paused = self.is_paused
+        self.__try_stop_voice_client()
+        self._voice_client = voice_client
+
+        if self._selected_track is None or not self.__check_voice_client_and_log_errors():
+            return
+
+        logger.info(f"Resume track {self._selected_track.title} from {position:.3f}.")
+        self.__play_from_hard_drive(self._selected_track, position)
+        if is_paused:
+            self._voice_client.pause()
+
     def stop(self, safely: bool = True) -> None:
         if safely and not self.__check_voice_client_and_log_errors():
             return
@@ -134,9 +216,6 @@ class Player:
         self._selected_track = None
         self._played_tracks.clear()
         self._is_loop_tracks = False
-        if self._timer_for_turning_on_next_track is not None:
-            self._timer_for_turning_on_next_track.stop()
-            self._timer_for_turning_on_next_track = None
 
     def set_track_started_action(self, action: typing.Callable[[TrackWrapperBase], None]) -> None:
         if self._on_track_started_action is not None:
@@ -205,50 +284,136 @@ class Player:
         if self._on_track_started_action is not None:
             self._on_track_started_action(self._selected_track)
 
-    def __play_from_hard_drive(self, track: TrackWrapperBase) -> None:
+    def __play_from_hard_drive(self, track: TrackWrapperBase, position: float = 0) -> None:
         filename = track.get_filename()
         if filename is None:
             logger.error("Filename is None.")
             return
 
-        if self._timer_for_turning_on_next_track is not None:
-            self._timer_for_turning_on_next_track.stop()
-            self._timer_for_turning_on_next_track = None
+        self._playback_generation += 1
+        generation = self._playback_generation
+        loop = asyncio.get_event_loop()
+
+        # Все колбэки вызываются из потока проигрывания discord, поэтому возвращаемся в цикл событий
+        def after(error: Exception | None) -> None:
+            loop.call_soon_threadsafe(self.__on_playback_finished, generation, error)
+
+        source = self._ffmpeg_pool.open(filename, position)
+        self._source = GaplessAudioSource(
+            source, self.__get_duration(track, filename, source),
+            preroll=self._settings.preroll,
+            crossfade=self._settings.crossfade,
+            on_next_source_needed=lambda: loop.call_soon_threadsafe(self.__prepare_next_source, generation),
+            on_source_switched=lambda: loop.call_soon_threadsafe(self.__on_source_switched, generation),
+            position=position)
+        self._prepared_track = None
+        self._voice_client.play(source=self._source, after=after)
+
+    def __prepare_next_source(self, generation: int) -> None:
+        """
+            Открываем следующий трек, пока текущий еще играет
+        """
+        if generation != self._playback_generation or self._source is None:
+            return
+
+        track = self._selected_track if self._is_loop_tracks else self._queue.peek_next_track()
+        # Следующий трек еще не загружен: переход пройдет после окончания текущего
+        if track is None:
+            return
+
+        filename = track.get_filename()
+        if filename is None:
+            return
+
+        try:
+            source = self._ffmpeg_pool.open(filename)
+        except FFmpegProcessesLimitError as e:
+            # Переход пройдет после окончания текущего трека, когда его процесс освободится
+            logger.warning(f"Next track is not prepared: {e}")
+            return
+        self._prepared_track = track
+        self._source.set_next_source(source, self.__get_duration(track, filename, source))
 
+    def __get_duration(self, track: TrackWrapperBase, filename: str, source: AudioSource | None = None) -> float:
+        """
+            Длительность из ответа сервиса, иначе из профилей запуска. 0 - неизвестна:
+            файл определяется в фоне, и открытый source получит длительность, когда она станет известна
+        """
         duration = track.duration()
-        self._timer_for_turning_on_next_track = self.__create_timer(duration)
+        if duration > 0:
+            return duration
 
-        ffmpeg = FFmpegPCMAudio(source=filename)
-        self._voice_client.play(source=ffmpeg)
-        self._timer_for_turning_on_next_track.start()
+        def on_probed(probed_duration: float) -> None:
+            if self._source is not None:
+                self._source.set_duration(source, probed_duration)
 
-    def __play_next_track_automatic(self) -> None:
-        if self._timer_for_turning_on_next_track is None:
-            logger.error("timer is none.")
-        else:
-            self._timer_for_turning_on_next_track.stop()
-            self._timer_for_turning_on_next_track = None
+        return self._ffmpeg_pool.get_duration(filename, on_probed if source is not None else None)
+
+    def __on_source_switched(self, generation: int) -> None:
+        """
+            Заранее открытый трек уже звучит, переводим очередь на него
+        """
+        if generation != self._playback_generation:
+            return
+
+        prepared_track = self._prepared_track
+        self._prepared_track = None
+        if self._on_track_completed_action is not None:
+            self._on_track_completed_action(self._selected_track)
+
+        if not self._is_loop_tracks:
+            if self._selected_track is not None:
+                self._played_tracks.appendleft(self._selected_track)
+            self._selected_track = self._queue.get_next_track()
+
+        # Очередь или зацикливание изменились после того, как трек был открыт
+        if self._selected_track is None or self._selected_track is not prepared_track:
+            self.__try_stop_voice_client()
+            self.__try_play_current_track()
+            return
+
+        logger.info(f"Start playing track. Title: {self._selected_track.title}; Duration: {self._selected_track.duration()}.")
+        self._queue.update_queue(None)
+        if self._on_track_started_action is not None:
+            self._on_track_started_action(self._selected_track)
+
+    def __on_playback_finished(self, generation: int, error: Exception | None) -> None:
+        if error is not None:
+            logger.error(f"Playback error: {error}")
+
+        # Трек остановили вручную или уже запустили другой
+        if generation != self._playback_generation or self._selected_track is None:
+            return
 
+        self.__play_next_track_automatic()
+
+    def __play_next_track_automatic(self) -> None:
         if self._on_track_completed_action is not None:
             self._on_track_completed_action(self._selected_track)
 
         self.set_next_track(automatic_transition=True)
         self.play_current_track()
 
+    def __on_broadcast_finished(self, source: AudioSource, error: Exception | None) -> None:
+        if error is not None:
+            logger.error(f"Broadcast error: {error}")
+        if self._broadcast is source:
+            self._broadcast = None
+
     def __try_stop_voice_client(self) -> None:
+        self._broadcast = None
         if not self.__check_voice_client_and_log_errors():
             return
 
-        if self._voice_client.is_playing():
+        if self._voice_client.is_playing() or self._voice_client.is_paused():
+            # Завершение остановленного трека не должно переключать очередь
+            self._playback_generation += 1
             self._voice_client.stop()
+            self._source = None
+            self._prepared_track = None
 
     def __get_preview_track(self) -> TrackWrapperBase | None:
         if len(self._played_tracks) > 0:
-            first = self._played_tracks.pop(0)
+            first = self._played_tracks.popleft()
             return first
         return None
-
-    def __create_timer(self, waiting_time: int | float) -> Timer:
-        timer = Timer(waiting_time, self._task_manager)
-        timer.set_invoke(self.__play_next_track_automatic)
-        return timer
@@ -5,11 +5,12 @@
 """
 import typing
 
-from discord import VoiceClient
+from discord import AudioSource, VoiceClient
 
 from core.blocker import Blocker
 from core.errors import PlayerCriticalError
-from core.player import Player
+from core.ffmpeg_pool import FFmpegProcessPool
+from core.player import Player, PlaybackSettings
 from core.protocol import PlayerProtocol
 from core.timer import Timer
 from core.log_utils import get_logger
@@ -31,7 +32,10 @@ class PlayerFacade(PlayerProtocol):
                  queue_manager: TrackQueueManager,
                  view: DiscordViewHelper,
                  task_manager: TaskManagerProtocol,
-                 storage: TracksStorageProtocol) -> None:
+                 storage: TracksStorageProtocol,
+                 playback_settings: PlaybackSettings,
+                 ffmpeg_pool: FFmpegProcessPool,
+                 on_track_played_action: typing.Callable[[TrackWrapperBase], None] | None = None) -> None:
 
         self._disconnection_time: Timer = disconnection_time
         self._on_add_request_action: typing.Callable[[InfoAboutRequest], None] = on_add_request_action
@@ -39,10 +43,12 @@ class PlayerFacade(PlayerProtocol):
         self._view: DiscordViewHelper = view
         self._task_manager: TaskManagerProtocol = task_manager
         self._storage = storage
+        # Учитываем прослушивание трека (например, для сортировки подсказок)
+        self._on_track_played_action: typing.Callable[[TrackWrapperBase], None] | None = on_track_played_action
         # Не очень нравиться, так как создает кучу проверок в каждом методе
         self._blocker: Blocker = Blocker()
 
-        self._player: Player = Player(queue_manager, task_manager)
+        self._player: Player = Player(queue_manager, playback_settings, ffmpeg_pool)
         self._player.set_track_started_action(self.__track_started)
         self._player.set_track_completed_action(self.__track_completed)
 
@@ -52,8 +58,11 @@ class PlayerFacade(PlayerProtocol):
     def is_loop(self) -> bool:
         return self._player.is_loop_track
 
+    def is_shuffle(self) -> bool:
+        return self._queue_manager.is_shuffle
+
     def is_running(self) -> bool:
-        return self._player.is_running
+        return self._player.is_running or self._player.is_broadcasting
 
     def is_paused(self) -> bool:
         return self._player.is_paused
@@ -62,16 +71,22 @@ class PlayerFacade(PlayerProtocol):
         if self._blocker.is_blocked():
             return
 
+        previous_track = None
         if self._player.is_played_tracks_empty:
-            await self._view.send_message_not_tracks_in_previous()
-            return
+            # История закончилась: при перемешивании предыдущий трек восстанавливается по перестановке
+            selected_track = self._player.selected_track
+            if selected_track is not None:
+                previous_track = await self._queue_manager.get_previous_shuffled_track(selected_track)
+            if previous_track is None:
+                await self._view.send_message_not_tracks_in_previous()
+                return
 
         # Блокируем
         self._blocker.block()
         try:
             self._disconnection_time.stop()
 
-            self._player.set_preview_track()
+            self._player.set_preview_track(previous_track)
             self._player.play_current_track()
 
         except Exception as e:
@@ -161,9 +176,112 @@ class PlayerFacade(PlayerProtocol):
             # Разблокируем
             self._blocker.unlock()
 
+    async def remove_track(self, number: int) -> bool:
+        """
+            Номера треков в очереди начинаются с 1, как при отображении очереди
+        """
+        return self._queue_manager.remove_track(number - 1)
+
+    async def move_track(self, from_number: int, to_number: int) -> bool:
+        return self._queue_manager.move_track(from_number - 1, to_number - 1)
+
+    async def play_track_next(self, number: int) -> bool:
+        return self._queue_manager.move_track(number - 1, 0)
+
+    async def jump_to_track(self, number: int) -> bool:
+        if self._blocker.is_blocked():
+            return False
+
+        if not self._queue_manager.jump_to_track(number - 1):
+            return False
+
+        # Блокируем
+        self._blocker.block()
+        try:
+            self._disconnection_time.stop()
+
+            self._player.set_next_track()
+            self._player.play_current_track()
+        except Exception as e:
+            logger.error(f"Jump to track: Player exception: {e};", exc_info=True)
+            await self.__stop_during_critical_error()
+            raise PlayerCriticalError("Jump to track: exception occurred.")
+        finally:
+            # Разблокируем
+            self._blocker.unlock()
+        return True
+
+    async def seek_track(self, position: float) -> bool:
+        """
+            position - время от начала трека в секундах
+        """
+        if self._blocker.is_blocked():
+            return False
+
+        # Блокируем
+        self._blocker.block()
+        try:
+            return self._player.seek(position)
+        except Exception as e:
+            logger.error(f"Seek track: Player exception: {e};", exc_info=True)
+            await self.__stop_during_critical_error()
+            raise PlayerCriticalError("Seek track: exception occurred.")
+        finally:
+            # Разблокируем
+            self._blocker.unlock()
+
+    async def rewind_track(self, offset: float) -> bool:
+        """
+            Перематывает на offset секунд вперед (или назад, если offset < 0) от текущей позиции
+        """
+        return await self.seek_track(max(self._player.position + offset, 0))
+
+    async def play_broadcast(self, source: AudioSource | None) -> None:
+        """
+            Вместо очереди включает эфир общей станции. Очередь очищается
+            None - станцию не удалось запустить
+        """
+        if source is None:
+            await self._view.send_message_not_tracks_in_queue()
+            return
+
+        # Отключение по таймеру не нужно: эфир продолжается, пока его слушают
+        await self.stop_track(disconnect=True)
+        if self._blocker.is_blocked():
+            source.cleanup()
+            return
+
+        # Блокируем
+        self._blocker.block()
+        try:
+            self._player.play_broadcast(source)
+        except Exception as e:
+            logger.error(f"Play broadcast: Player exception: {e};", exc_info=True)
+            await self.__stop_during_critical_error()
+            raise PlayerCriticalError("Play broadcast: exception occurred.")
+        finally:
+            # Разблокируем
+            self._blocker.unlock()
+
+    async def resume_on_voice_client(self, voice_client: VoiceClient) -> None:
+        if self._blocker.is_blocked():
+            return
+
+        # Блокируем
+        self._blocker.block()
+        try:
+            self._player.resume_on_voice_client(voice_client)
+        except Exception as e:
+            logger.error(f"Resume on voice client: Player exception: {e};", exc_info=True)
+            await self.__stop_during_critical_error()
+            raise PlayerCriticalError("Resume on voice client: exception occurred.")
+        finally:
+            # Разблокируем
+            self._blocker.unlock()
+
     async def show_track_queue(self) -> None:
-        next_tracks = self._queue_manager.get_all_next_tracks()
-        await self._view.show_track_queue(next_tracks)
+        # Страницы запрашиваются по мере листания
+        await self._view.show_track_queue(self._queue_manager.get_next_tracks_page)
 
     async def change_loop(self, show_message: bool = True) -> None:
         self._player.change_loop()
@@ -176,6 +294,9 @@ class PlayerFacade(PlayerProtocol):
         else:
             await self._view.show_disable_loop()
 
+    async def change_shuffle(self) -> None:
+        self._queue_manager.change_shuffle()
+
     def update_voice_client(self, voice_client: VoiceClient) -> None:
         self._player.update_voice_client(voice_client)
 
@@ -195,6 +316,9 @@ class PlayerFacade(PlayerProtocol):
             self._on_add_request_action(info_about_request)
 
     def __track_started(self, track: TrackWrapperBase) -> None:
+        if self._on_track_played_action is not None:
+            self._on_track_played_action(track)
+
         if self._track_started_task is not None:
             self._track_started_task.cancel()
             self._track_started_task = None
@@ -10,6 +10,9 @@ class PlayerProtocol(Protocol):
     def is_loop(self) -> bool:
         raise NotImplemented
 
+    def is_shuffle(self) -> bool:
+        raise NotImplemented
+
     def is_running(self) -> bool:
         raise NotImplemented
 
@@ -28,6 +31,24 @@ class PlayerProtocol(Protocol):
     async def stop_track(self, disconnect: bool, safely: bool = False) -> None:
         raise NotImplemented
 
+    async def remove_track(self, number: int) -> bool:
+        raise NotImplemented
+
+    async def move_track(self, from_number: int, to_number: int) -> bool:
+        raise NotImplemented
+
+    async def play_track_next(self, number: int) -> bool:
+        raise NotImplemented
+
+    async def jump_to_track(self, number: int) -> bool:
+        raise NotImplemented
+
+    async def seek_track(self, position: float) -> bool:
+        raise NotImplemented
+
+    async def rewind_track(self, offset: float) -> bool:
+        raise NotImplemented
+
     async def show_track_queue(self) -> None:
         raise NotImplemented
 
@@ -39,3 +60,6 @@ class PlayerProtocol(Protocol):
 
     async def change_loop(self, show_message: bool = True) -> None:
         raise NotImplemented
+
+    async def change_shuffle(self) -> None:
+        raise NotImplemented
@@ -1,6 +1,32 @@
 import re
 
 
+def parse_time(text: str) -> float | None:
+    """
+        Время в формате 83, 1:23 или 1:02:03 (можно с долями секунды: 1:23.5) в секундах
+    """
+    parts = text.strip().split(":")
+    if len(parts) > 3:
+        return None
+
+    try:
+        seconds = float(parts[-1])
+        minutes_and_hours = [int(part) for part in parts[:-1]]
+    except ValueError:
+        return None
+
+    if seconds < 0 or any(value < 0 for value in minutes_and_hours):
+        return None
+    # Секунды и минуты после двоеточия не больше 59
+    if len(parts) > 1 and seconds >= 60 or len(parts) > 2 and minutes_and_hours[-1] >= 60:
+        return None
+
+    minutes = 0
+    for value in minutes_and_hours:
+        minutes = minutes * 60 + value
+    return minutes * 60 + seconds
+
+
 def check_yandex_url(url: str) -> bool:
     pattern = re.compile("^https://music.yandex.ru/album/[1-9][0-9]*/track/[1-9][0-9]*")
     match = pattern.match(url)
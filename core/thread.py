@@ -40,7 +40,7 @@ class UserThread:
         self._factory: BotFactory = factory
 
         self._view: DiscordViewHelper = self.__create_discord_view()
-        self._player_facade: PlayerFacade = factory.create_player(self._disconnection_timer, self._view, self.__add_request_to_database)
+        self._player_facade: PlayerFacade = factory.create_player(guild.id, self._disconnection_timer, self._view, self.__add_request_to_database)
         self._message_manager: MessageManager = message_manager
         self._slash_commands = slash_commands
 
@@ -165,8 +165,12 @@ class UserThread:
             что в этом случае мы уже подкючены, но это сделал пользователь.
         """
         self._current_voice_client = voice_channel
-        await self._player_facade.stop_track(disconnect=False, safely=False)
-        self._player_facade.update_voice_client(self._current_voice_client)
+        if self._player_facade.is_running():
+            # Трек продолжается с того же места, очередь сохраняется
+            await self._player_facade.resume_on_voice_client(self._current_voice_client)
+        else:
+            await self._player_facade.stop_track(disconnect=False, safely=False)
+            self._player_facade.update_voice_client(self._current_voice_client)
         logger.info("Voice client has been updated.")
 
     async def unsafe_disconnection_from_voice_channel(self) -> None:
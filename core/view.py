@@ -2,6 +2,7 @@
     Отвечает за отображение данных
     Очень страшно
 """
+import math
 import typing
 
 import discord
@@ -15,11 +16,15 @@ from core.protocol import PlayerProtocol
 from core.recentrequest import OldRecentRequest
 from permissions.discord_view_helper import check_permissions_view
 from utils.blocker import BlockerSupported, Blocker, check_lock
+from yandex.collector import QueuePage
 from yandex.track import TrackWrapperBase
 from core._color_data import DISCORD_COLORS
 
 logger = get_logger(__name__)
 
+# На сколько секунд перематывают кнопки
+REWIND_STEP = 10
+
 
 class CoverTrackView(View):
     def __init__(self, player: PlayerProtocol) -> None:
@@ -52,6 +57,16 @@ class CoverTrackView(View):
         await interaction.response.defer()
         await self._player.stop_track(disconnect=False)
 
+    @discord.ui.button(style=discord.ButtonStyle.gray, emoji="⏪", row=1)
+    async def __rewind_backward_button(self, interaction: Interaction, button: discord.ui.Button) -> None:
+        await interaction.response.defer()
+        await self._player.rewind_track(-REWIND_STEP)
+
+    @discord.ui.button(style=discord.ButtonStyle.gray, emoji="⏩", row=1)
+    async def __rewind_forward_button(self, interaction: Interaction, button: discord.ui.Button) -> None:
+        await interaction.response.defer()
+        await self._player.rewind_track(REWIND_STEP)
+
     @discord.ui.button(style=discord.ButtonStyle.grey, label="Очередь треков", emoji="📋", row=2)
     async def __show_track_queue(self, interaction: Interaction, button: discord.ui.Button) -> None:
         await interaction.response.defer()
@@ -81,6 +96,62 @@ class CoverTrackView(View):
         await interaction.response.edit_message(view=self)
 
 
+class TrackQueueView(View):
+    """
+        Очередь треков по страницам. Каждая страница запрашивается только при листании
+    """
+
+    def __init__(self, get_page: typing.Callable[[int, int], QueuePage], page_size: int, messages: dict) -> None:
+        super().__init__(timeout=None)
+        self._get_page: typing.Callable[[int, int], QueuePage] = get_page
+        self._page_size: int = page_size
+        self._messages: dict = messages
+        self._page: QueuePage = get_page(0, page_size)
+
+        self._previous_button: Button = Button(style=discord.ButtonStyle.gray, emoji="⬅️")
+        self._previous_button.callback = self.__show_previous_page
+        self._next_button: Button = Button(style=discord.ButtonStyle.gray, emoji="➡️")
+        self._next_button.callback = self.__show_next_page
+        self.add_item(self._previous_button)
+        self.add_item(self._next_button)
+        self.__update_buttons()
+
+    def create_embed(self) -> discord.Embed:
+        number_of_pages = max(math.ceil(self._page.total_number_of_tracks / self._page_size), 1)
+        current_page = self._page.offset // self._page_size + 1
+        description = self._messages["track_queue_description"].format(self._page.total_number_of_tracks)
+        if self._page.is_shuffle:
+            description += "\n" + self._messages["track_queue_shuffle"]
+        embed = discord.Embed(title=self._messages["track_queue_title"],
+                              description=description,
+                              color=DISCORD_COLORS["orange"])
+
+        for row in self._page.rows:
+            minutes, seconds = divmod((row.duration_in_milliseconds or 0) // 1000, 60)
+            embed.add_field(name=f"{row.number}) {row.title} - {row.artists}",
+                            value=f"{self._messages['duration']}: {minutes:02d}:{seconds:02d}",
+                            inline=False)
+
+        embed.set_footer(text=self._messages["track_queue_page"].format(current_page, number_of_pages))
+        return embed
+
+    async def __show_previous_page(self, interaction: Interaction) -> None:
+        await self.__show_page(interaction, self._page.offset - self._page_size)
+
+    async def __show_next_page(self, interaction: Interaction) -> None:
+        await self.__show_page(interaction, self._page.offset + self._page_size)
+
+    async def __show_page(self, interaction: Interaction, offset: int) -> None:
+        # Очередь могла измениться, поэтому страницу всегда запрашиваем заново
+        self._page = self._get_page(max(offset, 0), self._page_size)
+        self.__update_buttons()
+        await interaction.response.edit_message(embed=self.create_embed(), view=self)
+
+    def __update_buttons(self) -> None:
+        self._previous_button.disabled = self._page.offset == 0
+        self._next_button.disabled = self._page.offset + self._page_size >= self._page.total_number_of_tracks
+
+
 class RecentlyListenedTracksView:
     def __init__(self, try_search_and_complet_command: typing.Callable[[str, str, discord.Message], typing.Awaitable[None]]) -> None:
         self._recently_requests: typing.List[OldRecentRequest] = []
@@ -247,34 +318,16 @@ class DiscordViewHelper(BlockerSupported):
         await self.__update_cover(builder, view=buttons)
 
     @check_lock
-    async def show_track_queue(self, next_tracks: typing.Tuple[TrackWrapperBase, ...]) -> None:
+    async def show_track_queue(self, get_page: typing.Callable[[int, int], QueuePage]) -> None:
         messages = self._thread.config["messages"]
-        max_tracks_count = self._thread.config["maximum_display_of_tracks_in_queue"]
-
-        limited_quantity_tracks = next_tracks[:max_tracks_count]
-
-        description = messages["track_queue_description"].format(len(next_tracks))
-        embed = discord.Embed(title=messages["track_queue_title"],
-                              description=description,
-                              color=DISCORD_COLORS["orange"])
-
-        number = 1
-        if len(limited_quantity_tracks) != 0:
-            for track in limited_quantity_tracks:
-                if number == 25:
-                    break
-
-                info_about_track = track.info(add_urls=False)
-                title = info_about_track["title"]
-                artists = info_about_track["artists"]
-
-                embed.add_field(name=f"{number}) {title} - {artists}",
-                                value=f"{messages['duration']}: {track.duration_str()}",
-                                inline=False)
-                number += 1
+        # Embed вмещает не более 25 полей
+        page_size = min(int(self._thread.config["maximum_display_of_tracks_in_queue"]), 25)
 
+        view = TrackQueueView(get_page, page_size, messages)
         text_channel: discord.TextChannel = await self._text_channel
-        await self._thread.message_manager.send_message_text_channel(text_channel=text_channel, embed=embed)
+        await self._thread.message_manager.send_message_text_channel(text_channel=text_channel,
+                                                                     embed=view.create_embed(),
+                                                                     view=view)
 
     @check_lock
     async def show_enable_loop(self) -> None:
@@ -1,4 +1,6 @@
+import asyncio
 import os.path
+import tempfile
 import typing
 
 from core.builders import YandexBuilderUrl
@@ -9,13 +11,20 @@ from yandex_music import Album, Playlist, Artist, Track, ArtistTracks
 import requests_to_music_service.data as iar
 from requests_to_music_service.data import InfoAboutRequest
 from requests_to_music_service.protocol import RequestToServiceProtocol, RequestToInstallTrack
+from storage.interning import DataInterner
+from storage.registry import MetadataRegistry
+from storage.trackindex import TrackSearchIndex
 from storage.data import AnswerFromMusicService, AlbumData, TrackData, ShortArtistData, PlaylistData, ShortAlbumData, \
     ArtistData
 from yandex.errors import YandexMusicDataCouldNotBeFound
+from utils.coalescer import RequestCoalescer
 from yandex.requests import RequestToYandexMusicBase
 
 logger = get_logger(__name__)
 
+# Через сколько преобразованных треков отдаем управление event loop
+CONVERSION_CHUNK_SIZE = 200
+
 
 class RequestToYandexMusicService(RequestToServiceProtocol):
     """
@@ -26,9 +35,18 @@ class RequestToYandexMusicService(RequestToServiceProtocol):
     def is_loaded(self) -> bool:
         return self._loaded_data is not None
 
-    def __init__(self, yandex_request: RequestToYandexMusicBase) -> None:
+    def __init__(self, yandex_request: RequestToYandexMusicBase,
+                 coalescer: RequestCoalescer | None = None,
+                 track_index: TrackSearchIndex | None = None,
+                 registry: MetadataRegistry | None = None) -> None:
         self._yandex_request: RequestToYandexMusicBase = yandex_request
         self._loaded_data: AnswerFromMusicService | None = None
+        # Одинаковые одновременные запросы выполняются один раз
+        self._coalescer: RequestCoalescer | None = coalescer
+        # Все полученные треки попадают в локальный поисковый индекс
+        self._track_index: TrackSearchIndex | None = track_index
+        # Общие для всех гильдий записи треков и альбомов
+        self._registry: MetadataRegistry | None = registry
 
     def try_get_info_about_request(self) -> InfoAboutRequest | None:
         if not self.is_loaded:
@@ -64,47 +82,68 @@ class RequestToYandexMusicService(RequestToServiceProtocol):
         return self._loaded_data
 
     async def perform(self) -> bool:
+        key = self._yandex_request.key
+        if self._coalescer is None or key is None:
+            state, data = await self.__load()
+        else:
+            state, data = await self._coalescer.run(key, self.__load)
+
+        if data is not None:
+            self._loaded_data = data
+        return state
+
+    async def __load(self) -> typing.Tuple[bool, AnswerFromMusicService | None]:
+        """
+            Выполняет запрос и преобразует ответ
+            Возвращает состояние выполнения и преобразованные данные
+        """
         try:
             data = await self._yandex_request.get_data()
 
             if data is None:
                 logger.error("perform: data is None.")
-                return False
+                return False, None
 
-            loaded_albums: typing.List[ShortAlbumData] = []
+            # id альбома -> альбом
+            loaded_albums: typing.Dict[int, ShortAlbumData] = {}
+            # Исполнители, обложки и альбомы в ответе повторяются, храним по одному экземпляру
+            interner = DataInterner(self._registry)
             album: AlbumData | None = None
             playlist: PlaylistData | None = None
             artist: ArtistData | None = None
 
             if data.artist is not None:
                 artist_tracks: ArtistTracks = await data.artist.get_tracks_async(page_size=100)
-                artist = self.__get_artist_data(data.artist, artist_tracks, loaded_albums)
+                artist = await self.__get_artist_data(data.artist, artist_tracks, loaded_albums, interner)
             if data.album is not None:
-                album = self.__get_album(data.album, loaded_albums)
+                album = await self.__get_album(data.album, loaded_albums, interner)
             if data.playlist is not None:
-                playlist = self.__get_playlist(data.playlist, loaded_albums)
+                playlist = await self.__get_playlist(data.playlist, loaded_albums, interner)
             if data.track is not None:
-                album = self.__wrap_track_in_album(data.track, loaded_albums)
+                album = self.__wrap_track_in_album(data.track, loaded_albums, interner)
             if data.search_tracks is not None:
-                album = self.__wrap_track_in_album(data.search_tracks, loaded_albums)
+                album = self.__wrap_track_in_album(data.search_tracks, loaded_albums, interner)
 
             if album is None and playlist is None and artist is None:
                 logger.error("perform: album and playlist and artist is none.")
-                return False
-
-            self._loaded_data = AnswerFromMusicService(playlist=playlist,
-                                                       album=album,
-                                                       artist=artist,
-                                                       loaded_albums=tuple(loaded_albums))
-            return True
+                return False, None
+
+            loaded_data = AnswerFromMusicService(playlist=playlist,
+                                                 album=album,
+                                                 artist=artist,
+                                                 loaded_albums=tuple(loaded_albums.values()))
+            if self._track_index is not None:
+                await self._track_index.add_answer(loaded_data)
+            return True, loaded_data
         except YandexMusicDataCouldNotBeFound:
             # данные не найдены, смысла загружать нет, поэтому сделаем вид, что загрузили
-            return True
+            return True, None
         except Exception as e:
             logger.error(f"perform: error during execution: {e}")
-            return False
+            return False, None
 
-    def __get_playlist(self, playlist: Playlist, all_albums: typing.List[ShortAlbumData]) -> PlaylistData:
+    async def __get_playlist(self, playlist: Playlist, all_albums: typing.Dict[int, ShortAlbumData],
+                             interner: DataInterner) -> PlaylistData:
         owner_id = playlist.uid
         playlist_id = playlist.kind
         user_login = playlist.owner.login
@@ -112,7 +151,7 @@ class RequestToYandexMusicService(RequestToServiceProtocol):
         title = playlist.title
         available = playlist.available
         cover_uri: str | None = playlist.cover.uri if playlist.cover is not None else None
-        tracks: typing.List[TrackData] = [self.__get_track(short.track, all_albums) for short in playlist.tracks]
+        tracks = await self.__get_tracks((short.track for short in playlist.tracks), all_albums, interner)
 
         return PlaylistData(owner_id=owner_id,
                             user_login=user_login,
@@ -121,20 +160,20 @@ class RequestToYandexMusicService(RequestToServiceProtocol):
                             title=title,
                             available=available,
                             cover_uri=cover_uri,
-                            tracks=tuple(tracks))
+                            tracks=tracks)
 
-    def __get_album(self, album: Album, all_albums: typing.List[ShortAlbumData]) -> AlbumData:
+    async def __get_album(self, album: Album, all_albums: typing.Dict[int, ShortAlbumData],
+                          interner: DataInterner) -> AlbumData:
         album_id = album.id
         title = album.title
-        artists = tuple(self.__get_artist(artist) for artist in album.artists)
+        artists = self.__get_artists(album.artists, interner)
         available = album.available
-        cover_uri = album.cover_uri
+        cover_uri = interner.get_string(album.cover_uri)
         volumes = album.volumes
-        tracks: typing.List[TrackData] = []
+        tracks: typing.Tuple[TrackData, ...] = tuple()
 
         if volumes is not None:
-            for volume in volumes:
-                tracks.extend([self.__get_track(track, all_albums) for track in volume])
+            tracks = await self.__get_tracks((track for volume in volumes for track in volume), all_albums, interner)
 
         return AlbumData(id=album_id,
                          title=title,
@@ -142,43 +181,55 @@ class RequestToYandexMusicService(RequestToServiceProtocol):
                          available=available,
                          cover_uri=cover_uri,
                          track_count=len(tracks),
-                         tracks=tuple(tracks))
-
-    def __get_track(self, track: Track, all_albums: typing.List[ShortAlbumData]) -> TrackData:
+                         tracks=tracks)
+
+    async def __get_tracks(self, tracks: typing.Iterable[Track], all_albums: typing.Dict[int, ShortAlbumData],
+                           interner: DataInterner) -> typing.Tuple[TrackData, ...]:
+        """
+            Большие плейлисты преобразуем частями, чтобы не блокировать остальные гильдии
+        """
+        result: typing.List[TrackData] = []
+        for track in tracks:
+            result.append(self.__get_track(track, all_albums, interner))
+            if len(result) % CONVERSION_CHUNK_SIZE == 0:
+                await asyncio.sleep(0)
+        return tuple(result)
+
+    def __get_track(self, track: Track, all_albums: typing.Dict[int, ShortAlbumData], interner: DataInterner) -> TrackData:
         track_id = track.id
-        title = track.title
-        artists = tuple(self.__get_artist(artist) for artist in track.artists)
+        title = interner.get_string(track.title)
+        artists = self.__get_artists(track.artists, interner)
         available = track.available
         duration = track.duration_ms
-        album_ids = tuple(album.id for album in track.albums)
+        album_ids = interner.get_album_ids(album.id for album in track.albums)
 
         for album in track.albums:
-            short_album = self.__get_short_album_data(album)
-            if short_album in all_albums:
+            if album.id in all_albums:
                 continue
-            all_albums.append(short_album)
+            all_albums[album.id] = self.__get_short_album_data(album, interner)
 
-        cover_uri = track.cover_uri
+        cover_uri = interner.get_string(track.cover_uri)
 
-        return TrackData(id=track_id,
-                         title=title,
-                         duration_in_milliseconds=duration,
-                         available=available,
-                         artists=artists,
-                         cover_uri=cover_uri,
-                         album_ids=album_ids)
+        return interner.get_track(TrackData(id=track_id,
+                                            title=title,
+                                            duration_in_milliseconds=duration,
+                                            available=available,
+                                            artists=artists,
+                                            cover_uri=cover_uri,
+                                            album_ids=album_ids))
 
-    def __wrap_track_in_album(self, track: Track | typing.Tuple[Track], all_albums: typing.List[ShortAlbumData]) -> AlbumData | None:
+    def __wrap_track_in_album(self, track: Track | typing.Tuple[Track], all_albums: typing.Dict[int, ShortAlbumData],
+                              interner: DataInterner) -> AlbumData | None:
         album = track.albums[0] if isinstance(track, Track) else track[0].albums[0]
         album_id = album.id
         title = album.title
         available = album.available
-        cover_uri = album.cover_uri
+        cover_uri = interner.get_string(album.cover_uri)
         if isinstance(track, Track):
-            track_data = (self.__get_track(track, all_albums),)
+            track_data = (self.__get_track(track, all_albums, interner),)
         else:
-            track_data = tuple([self.__get_track(t, all_albums) for t in track])
-        artists = tuple(self.__get_artist(artist) for artist in album.artists)
+            track_data = tuple([self.__get_track(t, all_albums, interner) for t in track])
+        artists = self.__get_artists(album.artists, interner)
         return AlbumData(id=album_id,
                          title=title,
                          available=available,
@@ -187,34 +238,32 @@ class RequestToYandexMusicService(RequestToServiceProtocol):
                          tracks=track_data,
                          artists=artists)
 
-    def __get_artist_data(self, artist: Artist, artist_tracks: ArtistTracks, all_albums: typing.List[ShortAlbumData]) \
-            -> ArtistData:
+    async def __get_artist_data(self, artist: Artist, artist_tracks: ArtistTracks,
+                                all_albums: typing.Dict[int, ShortAlbumData], interner: DataInterner) -> ArtistData:
         artist_id = artist.id
         artist_name = artist.name
         artist_available = artist.available
         artist_cover_uri = artist.cover if artist.cover is not None else None
-        tracks = tuple(self.__get_track(track, all_albums) for track in artist_tracks.tracks)
+        tracks = await self.__get_tracks(artist_tracks.tracks, all_albums, interner)
 
         return ArtistData(id=artist_id, cover_uri=artist_cover_uri, name=artist_name, available=artist_available, tracks=tracks)
 
-    def __get_short_album_data(self, data: Album) -> ShortAlbumData:
+    def __get_short_album_data(self, data: Album, interner: DataInterner) -> ShortAlbumData:
         album_id = data.id
-        title = data.title
+        title = interner.get_string(data.title)
         available = data.available
-        cover_uri = data.cover_uri
-        artists = tuple(self.__get_artist(artist) for artist in data.artists)
+        cover_uri = interner.get_string(data.cover_uri)
+        artists = self.__get_artists(data.artists, interner)
 
-        return ShortAlbumData(id=album_id, title=title,
-                              available=available,
-                              cover_uri=cover_uri,
-                              artists=artists,
-                              track_count=data.track_count)
+        return interner.get_album(ShortAlbumData(id=album_id, title=title,
+                                                 available=available,
+                                                 cover_uri=cover_uri,
+                                                 artists=artists,
+                                                 track_count=data.track_count))
 
     @staticmethod
-    def __get_artist(artist: Artist) -> ShortArtistData:
-        artist_id = artist.id
-        name = artist.name.lower()
-        return ShortArtistData(id=artist_id, name=name)
+    def __get_artists(artists: typing.List[Artist], interner: DataInterner) -> typing.Tuple[ShortArtistData, ...]:
+        return interner.get_artists((artist.id, artist.name.lower()) for artist in artists)
 
     def __get_request_url(self) -> str | None:
         if not self.is_loaded:
@@ -286,9 +335,29 @@ class RequestToInstallYandexTrack(RequestToInstallTrack):
             if self._path is None:
                 logger.error("ram is turned off but the path is not found")
                 return False
-            await self._track.download_async(self._path)
+            # Пишем во временный файл: прерванная загрузка (например, отмененная упреждающая)
+            # не должна выглядеть как загруженный трек. Файл у каждой загрузки свой:
+            # один трек могут одновременно качать /play и упреждающая загрузка
+            directory, filename = os.path.split(self._path)
+            descriptor, temporary_path = tempfile.mkstemp(suffix=".part", prefix=f"{filename}.", dir=directory or None)
+            os.close(descriptor)
+            try:
+                await self._track.download_async(temporary_path)
+                os.replace(temporary_path, self._path)
+            finally:
+                # Загрузка удаляет только свой файл и только если он не стал треком
+                self.__remove_file(temporary_path)
         return True
 
+    @staticmethod
+    def __remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to remove {path}: {e}.")
+
 
 
 
@@ -4,12 +4,18 @@ import typing
 
 @dataclasses.dataclass
 class ShortArtistData:
+    __slots__ = ("id", "name", "__weakref__")
+
     id: int
     name: str
 
 
 @dataclasses.dataclass
 class TrackData:
+    # __weakref__ нужен для общего реестра (storage.registry)
+    __slots__ = ("id", "title", "available", "duration_in_milliseconds", "cover_uri", "artists", "album_ids",
+                 "__weakref__")
+
     id: int
     title: str
     available: bool
@@ -21,6 +27,8 @@ class TrackData:
 
 @dataclasses.dataclass
 class AlbumData:
+    __slots__ = ("id", "title", "available", "cover_uri", "track_count", "artists", "tracks")
+
     id: int
     title: str
     available: bool
@@ -32,6 +40,8 @@ class AlbumData:
 
 @dataclasses.dataclass
 class ArtistData:
+    __slots__ = ("id", "name", "cover_uri", "available", "tracks")
+
     id: int
     name: str
     cover_uri: str | None
@@ -41,6 +51,8 @@ class ArtistData:
 
 @dataclasses.dataclass
 class ShortAlbumData:
+    __slots__ = ("id", "title", "available", "cover_uri", "track_count", "artists", "__weakref__")
+
     id: int
     title: str
     available: bool
@@ -51,6 +63,8 @@ class ShortAlbumData:
 
 @dataclasses.dataclass
 class PlaylistData:
+    __slots__ = ("owner_id", "user_login", "user_name", "playlist_id", "title", "available", "cover_uri", "tracks")
+
     owner_id: int
     user_login: str
     user_name: str
@@ -63,6 +77,8 @@ class PlaylistData:
 
 @dataclasses.dataclass
 class AnswerFromMusicService:
+    __slots__ = ("playlist", "album", "artist", "loaded_albums")
+
     playlist: PlaylistData | None
     album: AlbumData | None
     artist: ArtistData | None
@@ -76,9 +92,11 @@ class PlaylistEntry:
         Отличается от обычного плейлиста, в том
         что playlistEntry может состаять из альбома или плейлиста
     """
+    __slots__ = ("id", "data_id", "title", "number_tracks", "tracks", "artists")
+
     id: int
     data_id: int
     title: str                             # Название альбома или плейлиста
     number_tracks: int                     # Кол-во всех треков
-    tracks: typing.Tuple[TrackData, ...]   # Все треки
-    artists: typing.Tuple[ShortArtistData, ...]  # Все артисыт
\ No newline at end of file
+    tracks: typing.Sequence[TrackData]    # Все треки (для больших плейлистов могут храниться на диске)
+    artists: typing.Tuple[ShortArtistData, ...]  # Все артисыт
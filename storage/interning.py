@@ -0,0 +1,62 @@
+"""
+    Общие объекты для повторяющихся данных
+    В больших плейлистах одни и те же исполнители, обложки и альбомы повторяются у тысяч треков,
+    поэтому храним по одному экземпляру каждого значения
+"""
+import sys
+import typing
+
+from storage.data import ShortArtistData, TrackData, ShortAlbumData
+from storage.registry import MetadataRegistry
+
+
+class DataInterner:
+    def __init__(self, registry: MetadataRegistry | None = None) -> None:
+        # Общий для всех гильдий реестр: одинаковые записи из разных ответов тоже хранятся один раз
+        self._registry: MetadataRegistry | None = registry
+        # id исполнителя -> общий объект
+        self._artists: typing.Dict[int, ShortArtistData] = {}
+        # Одинаковые наборы исполнителей и альбомов у разных треков
+        self._artist_groups: typing.Dict[typing.Tuple[int, ...], typing.Tuple[ShortArtistData, ...]] = {}
+        self._album_ids: typing.Dict[typing.Tuple[int, ...], typing.Tuple[int, ...]] = {}
+
+    @staticmethod
+    def get_string(value: str | None) -> str | None:
+        if value is None:
+            return None
+        return sys.intern(value)
+
+    def get_artist(self, artist_id: int, name: str) -> ShortArtistData:
+        artist = self._artists.get(artist_id)
+        if artist is None:
+            artist = ShortArtistData(id=artist_id, name=sys.intern(name))
+            if self._registry is not None:
+                artist = self._registry.get_artist(artist)
+            self._artists[artist_id] = artist
+        return artist
+
+    def get_artists(self, artists: typing.Iterable[typing.Tuple[int, str]]) -> typing.Tuple[ShortArtistData, ...]:
+        """
+            :param artists: пары (id, имя)
+        """
+        artists = tuple(artists)
+        key = tuple(artist_id for artist_id, _ in artists)
+        group = self._artist_groups.get(key)
+        if group is None:
+            group = tuple(self.get_artist(artist_id, name) for artist_id, name in artists)
+            self._artist_groups[key] = group
+        return group
+
+    def get_track(self, track: TrackData) -> TrackData:
+        if self._registry is None:
+            return track
+        return self._registry.get_track(track)
+
+    def get_album(self, album: ShortAlbumData) -> ShortAlbumData:
+        if self._registry is None:
+            return album
+        return self._registry.get_album(album)
+
+    def get_album_ids(self, album_ids: typing.Iterable[int]) -> typing.Tuple[int, ...]:
+        album_ids = tuple(album_ids)
+        return self._album_ids.setdefault(album_ids, album_ids)
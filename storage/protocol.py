@@ -17,6 +17,13 @@ class TracksStorageProtocol(Protocol):
         """
         raise NotImplemented
 
+    @property
+    def total_number_of_playable_tracks(self) -> int:
+        """
+            Возвращает количество доступных для прослушивания треков
+        """
+        raise NotImplemented
+
     async def add(self, request: RequestToServiceProtocol) -> bool:
         raise NotImplemented
 
@@ -35,6 +42,12 @@ class TracksStorageProtocol(Protocol):
         """
         raise NotImplemented
 
+    def get_playable_tracks_range(self, min_value: int, max_value: int) -> typing.Tuple[TrackData, ...]:
+        """
+            Возвращает доступные треки в промежутке. Номера считаются только по доступным трекам
+        """
+        raise NotImplemented
+
     def clear(self) -> None:
         """
             Очистка загруженны данных
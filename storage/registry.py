@@ -0,0 +1,65 @@
+"""
+    Общий для всех гильдий реестр треков, альбомов и исполнителей
+    Популярные треки загружаются многими гильдиями, а храниться должны в одном экземпляре.
+    Реестр держит слабые ссылки: запись живет, пока на нее ссылается хотя бы одно хранилище
+"""
+import typing
+import weakref
+
+from core.log_utils import get_logger
+from storage.data import TrackData, ShortAlbumData, ShortArtistData
+
+logger = get_logger(__name__)
+
+Record = typing.TypeVar("Record", TrackData, ShortAlbumData, ShortArtistData)
+
+
+class MetadataRegistry:
+    def __init__(self) -> None:
+        self._tracks: weakref.WeakValueDictionary[int, TrackData] = weakref.WeakValueDictionary()
+        self._albums: weakref.WeakValueDictionary[int, ShortAlbumData] = weakref.WeakValueDictionary()
+        self._artists: weakref.WeakValueDictionary[int, ShortArtistData] = weakref.WeakValueDictionary()
+
+    @property
+    def number_of_tracks(self) -> int:
+        return len(self._tracks)
+
+    @property
+    def number_of_albums(self) -> int:
+        return len(self._albums)
+
+    @property
+    def number_of_artists(self) -> int:
+        return len(self._artists)
+
+    def get_track(self, track: TrackData) -> TrackData:
+        """
+            Возвращает уже известную запись, если она совпадает с переданной, иначе регистрирует переданную
+        """
+        return self.__get_record(self._tracks, track)
+
+    def get_album(self, album: ShortAlbumData) -> ShortAlbumData:
+        return self.__get_record(self._albums, album)
+
+    def get_artist(self, artist: ShortArtistData) -> ShortArtistData:
+        return self.__get_record(self._artists, artist)
+
+    def try_get_track_by_id(self, track_id: int) -> TrackData | None:
+        return self._tracks.get(track_id)
+
+    def try_get_album_by_id(self, album_id: int) -> ShortAlbumData | None:
+        return self._albums.get(album_id)
+
+    def log_statistics(self) -> None:
+        logger.info(f"Metadata registry: tracks: {self.number_of_tracks}; albums: {self.number_of_albums}; "
+                    f"artists: {self.number_of_artists}.")
+
+    @staticmethod
+    def __get_record(records: weakref.WeakValueDictionary[int, Record], record: Record) -> Record:
+        known_record = records.get(record.id)
+        if known_record is not None and known_record == record:
+            return known_record
+
+        # Новая запись или данные изменились (например, трек стал недоступен)
+        records[record.id] = record
+        return record
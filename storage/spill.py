@@ -0,0 +1,182 @@
+"""
+    Треки большого плейлиста, выгруженные на диск
+    Записи кодируются компактно (struct) во временный файл, читаются через mmap.
+    В памяти остаются только смещения записей и несколько последних прочитанных страниц
+"""
+import array
+import collections
+import collections.abc
+import dataclasses
+import mmap
+import struct
+import tempfile
+import typing
+
+from storage.data import TrackData
+from storage.interning import DataInterner
+from storage.registry import MetadataRegistry
+
+# id трека и исполнителя в Я.Музыке бывает и числом, и строкой, поэтому хранится строкой: число ли это, длина
+ID_HEADER = struct.Struct("<?B")
+# доступность, длительность, длина названия, длина обложки, кол-во исполнителей, кол-во альбомов
+TRACK_HEADER = struct.Struct("<?iHHHH")
+# длина имени исполнителя
+ARTIST_HEADER = struct.Struct("<H")
+ALBUM_ID = struct.Struct("<q")
+# Длина строки, обозначающая None
+NONE_LENGTH = 0xFFFF
+
+
+def encode_track(track: TrackData) -> bytes:
+    title = __encode_string(track.title)
+    cover_uri = __encode_string(track.cover_uri)
+    duration = track.duration_in_milliseconds if track.duration_in_milliseconds is not None else -1
+    parts = [__encode_id(track.id),
+             TRACK_HEADER.pack(track.available, duration,
+                               __get_length(title), __get_length(cover_uri),
+                               len(track.artists), len(track.album_ids)),
+             title or b"", cover_uri or b""]
+    for artist in track.artists:
+        name = artist.name.encode("utf-8")
+        parts.append(__encode_id(artist.id))
+        parts.append(ARTIST_HEADER.pack(len(name)))
+        parts.append(name)
+    for album_id in track.album_ids:
+        parts.append(ALBUM_ID.pack(album_id))
+    return b"".join(parts)
+
+
+def decode_track(buffer: typing.ByteString, position: int, interner: DataInterner) -> TrackData:
+    track_id, position = __decode_id(buffer, position)
+    available, duration, title_length, cover_length, number_of_artists, number_of_albums = \
+        TRACK_HEADER.unpack_from(buffer, position)
+    position += TRACK_HEADER.size
+
+    title, position = __decode_string(buffer, position, title_length)
+    cover_uri, position = __decode_string(buffer, position, cover_length)
+
+    artists = []
+    for _ in range(number_of_artists):
+        artist_id, position = __decode_id(buffer, position)
+        name_length, = ARTIST_HEADER.unpack_from(buffer, position)
+        position += ARTIST_HEADER.size
+        name, position = __decode_string(buffer, position, name_length)
+        artists.append((artist_id, name))
+
+    album_ids = []
+    for _ in range(number_of_albums):
+        album_ids.append(ALBUM_ID.unpack_from(buffer, position)[0])
+        position += ALBUM_ID.size
+
+    return interner.get_track(TrackData(id=track_id,
+                                        title=interner.get_string(title),
+                                        available=available,
+                                        duration_in_milliseconds=duration if duration >= 0 else None,
+                                        cover_uri=interner.get_string(cover_uri),
+                                        artists=interner.get_artists(artists),
+                                        album_ids=interner.get_album_ids(album_ids)))
+
+
+def __encode_id(value: int | str) -> bytes:
+    data = str(value).encode("utf-8")
+    return ID_HEADER.pack(isinstance(value, int), len(data)) + data
+
+
+def __decode_id(buffer: typing.ByteString, position: int) -> typing.Tuple[int | str, int]:
+    is_int, length = ID_HEADER.unpack_from(buffer, position)
+    position += ID_HEADER.size
+    value = bytes(buffer[position:position + length]).decode("utf-8")
+    return int(value) if is_int else value, position + length
+
+
+def __encode_string(value: str | None) -> bytes | None:
+    if value is None:
+        return None
+    # Длина хранится в двух байтах, длиннее названий не бывает
+    return value.encode("utf-8")[:NONE_LENGTH - 1]
+
+
+def __get_length(value: bytes | None) -> int:
+    return NONE_LENGTH if value is None else len(value)
+
+
+def __decode_string(buffer: typing.ByteString, position: int, length: int) -> typing.Tuple[str | None, int]:
+    if length == NONE_LENGTH:
+        return None, position
+    value = bytes(buffer[position:position + length]).decode("utf-8", errors="ignore")
+    return value, position + length
+
+
+@dataclasses.dataclass
+class SpillSettings:
+    threshold: int  # Сколько треков гильдия держит в памяти, остальные плейлисты выгружаются на диск
+    page_size: int  # Сколько треков читаем с диска за раз
+    hot_pages: int  # Сколько прочитанных страниц держим в памяти
+
+
+class SpilledTracks(collections.abc.Sequence):
+    """
+        Ведет себя как кортеж треков, поэтому Storage и все, кто читают PlaylistEntry.tracks, разницы не видят
+    """
+
+    def __init__(self, tracks: typing.Sequence[TrackData], page_size: int, hot_pages: int,
+                 registry: MetadataRegistry | None = None) -> None:
+        self._page_size: int = page_size
+        self._hot_pages: int = hot_pages
+        self._registry: MetadataRegistry | None = registry
+
+        # Смещение каждой записи в файле и конец последней записи
+        self._offsets: array.array = array.array("Q")
+        self._file = tempfile.TemporaryFile(prefix="cactus_queue_")
+        position = 0
+        for track in tracks:
+            data = encode_track(track)
+            self._offsets.append(position)
+            self._file.write(data)
+            position += len(data)
+        self._offsets.append(position)
+        self._file.flush()
+        self._buffer: mmap.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Номер страницы -> треки страницы (в порядке последнего использования)
+        self._pages: collections.OrderedDict[int, typing.Tuple[TrackData, ...]] = collections.OrderedDict()
+
+    @property
+    def size_in_bytes(self) -> int:
+        return self._offsets[-1]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int | slice) -> TrackData | typing.Tuple[TrackData, ...]:
+        if isinstance(index, slice):
+            return tuple(self.__get_track(position) for position in range(*index.indices(len(self))))
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("spilled tracks index out of range")
+        return self.__get_track(index)
+
+    def close(self) -> None:
+        self._pages.clear()
+        self._buffer.close()
+        self._file.close()
+
+    def __get_track(self, index: int) -> TrackData:
+        page_number, position_on_page = divmod(index, self._page_size)
+        page = self._pages.get(page_number)
+        if page is None:
+            page = self.__load_page(page_number)
+            self._pages[page_number] = page
+            while len(self._pages) > self._hot_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_number)
+        return page[position_on_page]
+
+    def __load_page(self, page_number: int) -> typing.Tuple[TrackData, ...]:
+        interner = DataInterner(self._registry)
+        first = page_number * self._page_size
+        last = min(first + self._page_size, len(self))
+        return tuple(decode_track(self._buffer, self._offsets[index], interner) for index in range(first, last))
@@ -1,9 +1,13 @@
+import array
+import bisect
 import typing
 
 from core.log_utils import get_logger
 from storage.data import AnswerFromMusicService, PlaylistEntry, TrackData, AlbumData, PlaylistData, ShortAlbumData, \
     ShortArtistData
 from storage.protocol import TracksStorageProtocol
+from storage.registry import MetadataRegistry
+from storage.spill import SpillSettings, SpilledTracks
 from requests_to_music_service.protocol import RequestToServiceProtocol
 from requests_to_music_service.protocol import ExecutingRequestsProtocol
 
@@ -11,17 +15,43 @@ logger = get_logger(__name__)
 
 
 class Storage(TracksStorageProtocol):
-    def __init__(self, executing: ExecutingRequestsProtocol) -> None:
+    def __init__(self, executing: ExecutingRequestsProtocol, registry: MetadataRegistry | None = None,
+                 spill_settings: SpillSettings | None = None) -> None:
         self._executing = executing
+        # None - все треки всегда в памяти
+        self._spill_settings: SpillSettings | None = spill_settings
+        self._number_of_tracks_in_memory: int = 0
+        # Общий реестр хранит записи по слабым ссылкам, само хранилище держит на них сильные ссылки
+        self._registry: MetadataRegistry | None = registry
         self._data: typing.List[PlaylistEntry] = []
+        # Номер первого трека каждой записи в общей очереди (возрастает, поэтому ищем запись бинарным поиском)
+        self._offsets: typing.List[int] = []
+        self._total_number_of_tracks: int = 0
+        # Индекс доступных для прослушивания треков, строится при добавлении записи:
+        # позиции доступных треков внутри каждой записи (None - доступны все)
+        # и кол-во доступных треков перед каждой записью
+        self._playable_positions: typing.List[array.array | None] = []
+        self._playable_offsets: typing.List[int] = []
+        self._total_number_of_playable_tracks: int = 0
         self._last_id: int = 0
 
         self._uploaded_albums: typing.Dict[int, ShortAlbumData] = {}
 
+    @property
+    def total_number_of_tracks(self) -> int:
+        return self._total_number_of_tracks
+
+    @property
+    def total_number_of_playable_tracks(self) -> int:
+        return self._total_number_of_playable_tracks
+
     def get_loaded_playlists(self) -> typing.Tuple[PlaylistEntry, ...]:
         return tuple(self._data)
 
     def try_get_album_by_id(self, album_id: int) -> ShortAlbumData | None:
+        if self._registry is not None:
+            return self._registry.try_get_album_by_id(album_id)
+
         if len(self._uploaded_albums) == 0:
             return None
 
@@ -50,8 +80,7 @@ class Storage(TracksStorageProtocol):
 
             entry = PlaylistEntry(self._last_id, data_id, data_title, data_available, tracks, artists)
 
-            self._data.append(entry)
-            self._last_id += 1
+            self.__append_entry(entry)
 
         if data.playlist is not None:
             playlist = data.playlist
@@ -64,8 +93,7 @@ class Storage(TracksStorageProtocol):
 
             entry = PlaylistEntry(self._last_id, data_id, data_title, data_available, tracks, tuple(artists))
 
-            self._data.append(entry)
-            self._last_id += 1
+            self.__append_entry(entry)
 
         if data.artist is not None:
             artist = data.artist
@@ -77,8 +105,7 @@ class Storage(TracksStorageProtocol):
 
             entry = PlaylistEntry(self._last_id, data_id, data_title, data_available, tracks, tuple(artists))
 
-            self._data.append(entry)
-            self._last_id += 1
+            self.__append_entry(entry)
 
         for album in data.loaded_albums:
             if album.id in self._uploaded_albums:
@@ -88,28 +115,92 @@ class Storage(TracksStorageProtocol):
         return True
 
     def get_tracks_range(self, min_value: int, max_value: int) -> typing.Tuple[TrackData]:
-        tracks: typing.List[TrackData] = []
-
-        for entry in self._data:
-            tracks.extend(entry.tracks)
-
-        if len(tracks) == 0:
+        """
+            O(log n + k): находим первую запись бинарным поиском и берем срезы только нужных записей
+        """
+        min_value = max(min_value, 0)
+        max_value = min(max_value, self._total_number_of_tracks)
+        if min_value >= max_value:
             return tuple()
 
-        if len(tracks) < max_value:
-            max_value = len(tracks)
-
-        if min_value < 0:
-            min_value = 0
-
-        if min_value == max_value:
+        tracks: typing.List[TrackData] = []
+        entry_index = bisect.bisect_right(self._offsets, min_value) - 1
+        position = min_value
+        while position < max_value:
+            entry = self._data[entry_index]
+            offset = self._offsets[entry_index]
+            tracks.extend(entry.tracks[position - offset:max_value - offset])
+            position = offset + len(entry.tracks)
+            entry_index += 1
+
+        return tuple(tracks)
+
+    def get_playable_tracks_range(self, min_value: int, max_value: int) -> typing.Tuple[TrackData, ...]:
+        """
+            Номера считаются только по доступным трекам. O(log n + k)
+        """
+        min_value = max(min_value, 0)
+        max_value = min(max_value, self._total_number_of_playable_tracks)
+        if min_value >= max_value:
             return tuple()
 
-        group = tracks[min_value:max_value]
-        return tuple(group)
+        tracks: typing.List[TrackData] = []
+        entry_index = bisect.bisect_right(self._playable_offsets, min_value) - 1
+        position = min_value
+        while position < max_value:
+            entry = self._data[entry_index]
+            offset = self._playable_offsets[entry_index]
+            playable_positions = self._playable_positions[entry_index]
+            if playable_positions is None:
+                tracks.extend(entry.tracks[position - offset:max_value - offset])
+                position = offset + len(entry.tracks)
+            else:
+                tracks.extend(entry.tracks[index] for index in playable_positions[position - offset:max_value - offset])
+                position = offset + len(playable_positions)
+            entry_index += 1
+
+        return tuple(tracks)
+
+    def __append_entry(self, entry: PlaylistEntry) -> None:
+        playable_positions = array.array("I", (index for index, track in enumerate(entry.tracks) if track.available))
+        number_of_playable_tracks = len(playable_positions)
+        self._playable_positions.append(playable_positions if number_of_playable_tracks != len(entry.tracks) else None)
+        self._playable_offsets.append(self._total_number_of_playable_tracks)
+        self._total_number_of_playable_tracks += number_of_playable_tracks
+
+        self.__try_spill(entry)
+        self._data.append(entry)
+        self._offsets.append(self._total_number_of_tracks)
+        self._total_number_of_tracks += len(entry.tracks)
+        self._last_id += 1
+
+    def __try_spill(self, entry: PlaylistEntry) -> None:
+        """
+            Если гильдия набрала слишком много треков, большие плейлисты храним на диске
+        """
+        settings = self._spill_settings
+        number_of_tracks = len(entry.tracks)
+        if settings is None or number_of_tracks <= settings.page_size or \
+                self._number_of_tracks_in_memory + number_of_tracks <= settings.threshold:
+            self._number_of_tracks_in_memory += number_of_tracks
+            return
+
+        spilled_tracks = SpilledTracks(entry.tracks, settings.page_size, settings.hot_pages, self._registry)
+        logger.info(f"Playlist {entry.title} ({number_of_tracks} tracks, "
+                    f"{spilled_tracks.size_in_bytes} bytes) is spilled to disk.")
+        entry.tracks = spilled_tracks
 
     def clear(self) -> None:
+        for entry in self._data:
+            if isinstance(entry.tracks, SpilledTracks):
+                entry.tracks.close()
+        self._number_of_tracks_in_memory = 0
         self._data.clear()
+        self._offsets.clear()
+        self._total_number_of_tracks = 0
+        self._playable_positions.clear()
+        self._playable_offsets.clear()
+        self._total_number_of_playable_tracks = 0
         self._uploaded_albums.clear()
 
 
@@ -0,0 +1,219 @@
+"""
+    Локальный поисковый индекс по всем трекам, которые бот когда-либо получал от сервиса
+    Нужен, чтобы отвечать на подсказки /play без запроса к Я.Музыке
+"""
+import asyncio
+import collections
+import dataclasses
+import gzip
+import json
+import os
+import typing
+
+from core.log_utils import get_logger
+from storage.data import AnswerFromMusicService, TrackData, ShortAlbumData
+
+logger = get_logger(__name__)
+
+# Через сколько проиндексированных треков отдаем управление event loop
+INDEXING_CHUNK_SIZE = 200
+
+
+@dataclasses.dataclass
+class IndexedTrack:
+    id: int
+    album_id: int | None
+    title: str
+    artists: str
+    album: str
+    duration_in_milliseconds: int
+    plays: int = 0
+    guild_plays: typing.Dict[int, int] = dataclasses.field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        """
+            Текст, по которому ищем трек
+        """
+        return f"{self.title} {self.artists} {self.album}"
+
+
+@dataclasses.dataclass
+class FoundTrack:
+    track: IndexedTrack
+    score: float
+
+
+def normalize_text(text: str) -> str:
+    return ' '.join(text.split()).casefold()
+
+
+def get_trigrams(text: str) -> typing.Set[str]:
+    """
+        Каждое слово дополняем двумя пробелами в начале,
+        поэтому начало недописанного слова тоже дает триграммы ("ab" -> "  a", " ab")
+    """
+    trigrams = set()
+    for word in normalize_text(text).split(' '):
+        if word == "":
+            continue
+        padded = f"  {word}"
+        for index in range(len(padded) - 2):
+            trigrams.add(padded[index:index + 3])
+    return trigrams
+
+
+class TrackSearchIndex:
+    def __init__(self, path: str, max_tracks: int, guild_play_weight: float) -> None:
+        self._path: str = path
+        self._max_tracks: int = max_tracks
+        # Насколько прослушивания в текущей гильдии важнее прослушиваний во всех остальных
+        self._guild_play_weight: float = guild_play_weight
+
+        # Треки в порядке последнего использования (для вытеснения)
+        self._tracks: collections.OrderedDict[int, IndexedTrack] = collections.OrderedDict()
+        # Триграмма -> id треков
+        self._postings: typing.Dict[str, typing.Set[int]] = collections.defaultdict(set)
+        # Изменения нумеруются, чтобы отметить сохраненным только то, что действительно записано
+        self._version: int = 0
+        self._saved_version: int = 0
+        self._snapshot_version: int = 0
+
+    @property
+    def number_of_tracks(self) -> int:
+        return len(self._tracks)
+
+    async def add_answer(self, answer: AnswerFromMusicService) -> None:
+        """
+            Большие плейлисты индексируем частями, чтобы не блокировать остальные гильдии
+        """
+        albums: typing.Dict[int, ShortAlbumData] = {album.id: album for album in answer.loaded_albums}
+
+        number_of_tracks = 0
+        for source in (answer.album, answer.playlist, answer.artist):
+            if source is None:
+                continue
+            for track in source.tracks:
+                self.add_track(track, albums)
+                number_of_tracks += 1
+                if number_of_tracks % INDEXING_CHUNK_SIZE == 0:
+                    await asyncio.sleep(0)
+
+    def add_track(self, track: TrackData, albums: typing.Dict[int, ShortAlbumData]) -> None:
+        if track.id in self._tracks:
+            self._tracks.move_to_end(track.id)
+            return
+
+        album_id = track.album_ids[0] if len(track.album_ids) > 0 else None
+        album = albums.get(album_id) if album_id is not None else None
+        indexed_track = IndexedTrack(id=track.id,
+                                     album_id=album_id,
+                                     title=track.title,
+                                     artists=', '.join(artist.name for artist in track.artists),
+                                     album=album.title if album is not None else "",
+                                     duration_in_milliseconds=track.duration_in_milliseconds or 0)
+        self.__insert(indexed_track)
+
+    def record_play(self, track_id: int, guild_id: int) -> None:
+        indexed_track = self._tracks.get(track_id)
+        if indexed_track is None:
+            return
+
+        indexed_track.plays += 1
+        indexed_track.guild_plays[guild_id] = indexed_track.guild_plays.get(guild_id, 0) + 1
+        self._tracks.move_to_end(track_id)
+        self._version += 1
+
+    def search(self, text: str, guild_id: int | None, limit: int) -> typing.List[FoundTrack]:
+        query_trigrams = get_trigrams(text)
+        if len(query_trigrams) == 0:
+            return []
+
+        # Пересекаем, начиная с самых редких триграмм
+        postings = sorted((self._postings.get(trigram, set()) for trigram in query_trigrams), key=len)
+        if len(postings[0]) == 0:
+            return []
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if len(candidates) == 0:
+                return []
+
+        query = normalize_text(text)
+        found = [FoundTrack(track=self._tracks[track_id], score=self.__get_score(self._tracks[track_id], query, guild_id))
+                 for track_id in candidates]
+        # При равной оценке (например, у непрослушанных треков) порядок определяется названием и id,
+        # а не порядком обхода множества
+        found.sort(key=lambda item: (-item.score, normalize_text(item.track.title), item.track.id))
+        return found[:limit]
+
+    def load(self) -> None:
+        if not os.path.exists(self._path):
+            return
+
+        try:
+            with gzip.open(self._path, "rt", encoding="utf-8") as file_read:
+                data = json.load(file_read)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load the track index: {e}.")
+            return
+
+        for item in data:
+            item["guild_plays"] = {int(guild_id): plays for guild_id, plays in item["guild_plays"].items()}
+            self.__insert(IndexedTrack(**item))
+        self._saved_version = self._version
+        logger.info(f"Track index loaded: {len(self._tracks)} tracks.")
+
+    def get_snapshot(self) -> typing.List[dict] | None:
+        """
+            Снимок для сохранения. None - с последнего сохранения ничего не изменилось.
+            После успешной записи нужно вызвать mark_saved, иначе снимок будет сделан повторно
+        """
+        if self._version == self._saved_version:
+            return None
+
+        self._snapshot_version = self._version
+        return [dataclasses.asdict(track) for track in self._tracks.values()]
+
+    def mark_saved(self) -> None:
+        """
+            Последний снимок записан. Изменения, сделанные во время записи, попадут в следующий снимок
+        """
+        self._saved_version = self._snapshot_version
+
+    def save_snapshot(self, snapshot: typing.List[dict]) -> None:
+        """
+            Может выполняться в отдельном потоке
+        """
+        temporary_path = f"{self._path}.tmp"
+        with gzip.open(temporary_path, "wt", encoding="utf-8") as file_write:
+            json.dump(snapshot, file_write, ensure_ascii=False)
+        os.replace(temporary_path, self._path)
+
+    def __insert(self, indexed_track: IndexedTrack) -> None:
+        self._tracks[indexed_track.id] = indexed_track
+        for trigram in get_trigrams(indexed_track.text):
+            self._postings[trigram].add(indexed_track.id)
+        self._version += 1
+
+        while len(self._tracks) > self._max_tracks:
+            _, evicted_track = self._tracks.popitem(last=False)
+            self.__remove_postings(evicted_track)
+
+    def __remove_postings(self, indexed_track: IndexedTrack) -> None:
+        for trigram in get_trigrams(indexed_track.text):
+            posting = self._postings.get(trigram)
+            if posting is None:
+                continue
+            posting.discard(indexed_track.id)
+            if len(posting) == 0:
+                del self._postings[trigram]
+
+    def __get_score(self, indexed_track: IndexedTrack, query: str, guild_id: int | None) -> float:
+        guild_plays = indexed_track.guild_plays.get(guild_id, 0) if guild_id is not None else 0
+        score = indexed_track.plays + guild_plays * self._guild_play_weight
+        # Совпадение с началом названия важнее совпадения в середине
+        if normalize_text(indexed_track.title).startswith(query):
+            score += 1
+        return score
@@ -0,0 +1,94 @@
+"""
+    Замер задержки цикла событий при одновременном проигрывании многих треков
+    Запуск: python -m tests.audio_workers_benchmark [файл трека] [кол-во треков] [кол-во процессов подготовки звука] [сек.]
+
+    0 процессов - треки декодируются и кодируются в процессе бота, как без настройки audio_workers.
+    Потоки проигрывания повторяют discord.player.AudioPlayer: раз в 20 мс читают кадр и, если это PCM, кодируют его в Opus.
+    Отправка пакетов в сеть не моделируется. Трек должен быть не короче замера
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from discord import AudioSource
+from discord.opus import Encoder
+
+from core.audio_workers import AudioWorkerPool
+from core.ffmpeg_pool import FFmpegProcessPool
+from core.launch_profiles import LaunchProfiles
+from core.loudness import LoudnessSettings
+from utils.looplag import EventLoopLagMonitor
+
+FRAME_DURATION = 0.02
+SAMPLES_PER_FRAME = 960
+BUFFER_FRAMES = 25
+# Замер задержки раз в 10 мс, чтобы за короткий прогон набралось достаточно значений
+LAG_INTERVAL = 0.01
+
+
+def play(source: AudioSource, stopped: threading.Event) -> None:
+    encoder = None if source.is_opus() else Encoder()
+    next_time = time.perf_counter()
+    while not stopped.is_set():
+        data = source.read()
+        if not data:
+            break
+        if encoder is not None:
+            encoder.encode(data, SAMPLES_PER_FRAME)
+
+        next_time += FRAME_DURATION
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    source.cleanup()
+
+
+async def measure(filename: str, number_of_tracks: int, number_of_workers: int, duration: float) -> None:
+    audio_workers = None
+    if number_of_workers > 0:
+        audio_workers = AudioWorkerPool(number_of_workers, BUFFER_FRAMES)
+        audio_workers.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        launch_profiles = LaunchProfiles(os.path.join(directory, "launch_profiles.json"), 1,
+                                         LoudnessSettings(enabled=False, target=-14, max_gain=12, peak_limit=-1), 1)
+        await launch_profiles.probe(filename)
+        ffmpeg_pool = FFmpegProcessPool(0, number_of_tracks, 600, launch_profiles, audio_workers)
+
+        monitor = EventLoopLagMonitor(interval=LAG_INTERVAL)
+        monitor.start()
+        stopped = threading.Event()
+        threads = [threading.Thread(target=play, args=(ffmpeg_pool.open(filename), stopped), daemon=True)
+                   for _ in range(number_of_tracks)]
+        for thread in threads:
+            thread.start()
+
+        await asyncio.sleep(duration)
+        statistics = monitor.get_statistics()
+        stopped.set()
+        for thread in threads:
+            thread.join()
+        monitor.stop()
+        ffmpeg_pool.close()
+
+    if audio_workers is not None:
+        audio_workers.close()
+
+    print(f"Tracks: {number_of_tracks}; audio workers: {number_of_workers}; samples: {statistics.number_of_samples}")
+    print(f"Event loop lag: average {statistics.average * 1000:.2f} ms; p99 {statistics.p99 * 1000:.2f} ms; "
+          f"max {statistics.max * 1000:.2f} ms")
+
+
+def main() -> None:
+    filename = sys.argv[1]
+    number_of_tracks = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    number_of_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    duration = float(sys.argv[4]) if len(sys.argv) > 4 else 30
+    asyncio.run(measure(filename, number_of_tracks, number_of_workers, duration))
+
+
+if __name__ == "__main__":
+    main()
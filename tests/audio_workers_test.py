@@ -0,0 +1,175 @@
+"""
+    Протокол процессов подготовки звука (core.audio_worker) и перезапуск упавшего процесса
+    Вместо FFmpeg запускается Python, который копирует stdin в stdout: файл трека уже содержит PCM
+"""
+import random
+import signal
+import sys
+import time
+import typing
+
+import pytest
+
+from core.audio import FRAME_SIZE, OPUS_SILENCE
+from core.audio_worker import PACKET_LENGTH
+from core.audio_workers import AudioWorkerPool, AudioWorkerProcess, WorkerAudioSource, CREDIT_BATCH
+
+COPY_COMMAND = (sys.executable, "-c", "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)")
+BUFFER_FRAMES = 10
+# Сколько секунд ждем ответа процесса
+TIMEOUT = 10
+
+
+@pytest.fixture
+def track(tmp_path) -> str:
+    """
+        100 кадров PCM и неполный кадр в конце. Шум, чтобы ни один пакет Opus не совпал с кадром тишины
+    """
+    path = tmp_path / "track.pcm"
+    path.write_bytes(random.Random(0).randbytes(100 * FRAME_SIZE + FRAME_SIZE // 2))
+    return str(path)
+
+
+@pytest.fixture
+def pool() -> typing.Iterator[AudioWorkerPool]:
+    pool = AudioWorkerPool(1, BUFFER_FRAMES)
+    pool.start()
+    yield pool
+    pool.close()
+
+
+def open_track(pool: AudioWorkerPool, track: str, skip_bytes: int = 0,
+               on_cleanup: typing.Callable[[], None] = lambda: None) -> WorkerAudioSource:
+    return pool.open(COPY_COMMAND, track, header_size=0, offset=0, skip_bytes=skip_bytes, gain=1,
+                     on_cleanup=on_cleanup)
+
+
+def read_packets(source: WorkerAudioSource, number_of_packets: int | None = None) -> typing.List[bytes]:
+    """
+        Пакеты до конца трека (или первые number_of_packets). Пока процесс не подготовил кадр, read отдает тишину
+    """
+    packets = []
+    deadline = time.monotonic() + TIMEOUT
+    while number_of_packets is None or len(packets) < number_of_packets:
+        assert time.monotonic() < deadline, "Audio worker did not answer"
+        packet = source.read()
+        if not packet:
+            break
+        if packet == OPUS_SILENCE:
+            time.sleep(0.001)
+            continue
+        packets.append(packet)
+    return packets
+
+
+def wait_for(condition: typing.Callable[[], bool]) -> None:
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline, "Condition was not met"
+        time.sleep(0.01)
+
+
+def test_split_packets() -> None:
+    split_packets = AudioWorkerProcess._AudioWorkerProcess__split_packets
+    data = PACKET_LENGTH.pack(3) + b"abc" + PACKET_LENGTH.pack(0) + PACKET_LENGTH.pack(2) + b"de"
+
+    assert split_packets(data) == [b"abc", b"", b"de"]
+    assert split_packets(b"") == []
+
+
+def test_track_is_played_to_the_end(pool: AudioWorkerPool, track: str) -> None:
+    """
+        OPEN и CREDIT: приходят все полные кадры, неполный кадр в конце отбрасывается, затем END
+    """
+    source = open_track(pool, track)
+
+    assert len(read_packets(source)) == 100
+    # Конец трека не пропадает при повторном чтении
+    assert source.read() == b""
+    source.cleanup()
+
+
+def test_skip_bytes(pool: AudioWorkerPool, track: str) -> None:
+    source = open_track(pool, track, skip_bytes=40 * FRAME_SIZE)
+
+    assert len(read_packets(source)) == 60
+    source.cleanup()
+
+
+def test_worker_waits_for_credits(pool: AudioWorkerPool, track: str) -> None:
+    """
+        Процесс готовит не больше buffer_frames кадров, пока бот не вернет прочитанные
+    """
+    source = open_track(pool, track)
+    wait_for(lambda: len(source._packets) == BUFFER_FRAMES)
+    time.sleep(0.2)
+    assert len(source._packets) == BUFFER_FRAMES
+
+    # Кадры возвращаются пачками по CREDIT_BATCH
+    assert len(read_packets(source, CREDIT_BATCH)) == CREDIT_BATCH
+    wait_for(lambda: len(source._packets) == BUFFER_FRAMES)
+    source.cleanup()
+
+
+def test_close_stream(pool: AudioWorkerPool, track: str) -> None:
+    """
+        CLOSE останавливает трек, процесс продолжает работать с другими треками
+    """
+    cleanups = []
+    source = open_track(pool, track, on_cleanup=lambda: cleanups.append(True))
+    read_packets(source, CREDIT_BATCH)
+    worker = pool._workers[0]
+    assert worker.number_of_streams == 1
+
+    source.cleanup()
+    source.cleanup()
+    assert cleanups == [True]
+    assert worker.number_of_streams == 0
+
+    other_source = open_track(pool, track)
+    assert len(read_packets(other_source)) == 100
+    assert worker.is_alive
+    other_source.cleanup()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGSTOP is not available")
+def test_send_does_not_block(pool: AudioWorkerPool, track: str) -> None:
+    """
+        Процесс не читает команды: канал заполняется, но команды только встают в очередь
+    """
+    source = open_track(pool, track)
+    worker = pool._workers[0]
+    worker._process.send_signal(signal.SIGSTOP)
+    try:
+        started_at = time.monotonic()
+        # Намного больше буфера канала
+        for _ in range(100000):
+            worker.add_credits(0, 1)
+        assert time.monotonic() - started_at < 1
+    finally:
+        worker._process.send_signal(signal.SIGCONT)
+
+    assert len(read_packets(source)) == 100
+    source.cleanup()
+
+
+def test_dead_worker_is_restarted(pool: AudioWorkerPool, track: str) -> None:
+    """
+        Треки упавшего процесса заканчиваются, следующий трек открывается в новом процессе
+    """
+    source = open_track(pool, track)
+    read_packets(source, CREDIT_BATCH)
+    dead_worker = pool._workers[0]
+    dead_worker._process.kill()
+
+    wait_for(lambda: not dead_worker.is_alive)
+    # Уже подготовленные кадры дочитываются, затем трек заканчивается
+    read_packets(source)
+    assert source.read() == b""
+    source.cleanup()
+
+    other_source = open_track(pool, track)
+    assert pool._number_of_restarts == 1
+    assert pool._workers[0] is not dead_worker
+    assert len(read_packets(other_source)) == 100
+    other_source.cleanup()
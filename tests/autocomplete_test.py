@@ -0,0 +1,49 @@
+"""
+    Подсказки /play (yandex.autocomplete): поиск в Я.Музыке заменен корутиной теста
+"""
+import asyncio
+import gc
+import typing
+
+from yandex.autocomplete import AutocompleteEngine
+
+CONFIG = {
+    "autocomplete_local_min_results": 1,
+    "autocomplete_max_choices": 5,
+    "autocomplete_deadline": 0.01,
+    "autocomplete_debounce": 0,
+    "autocomplete_cache_size": 10,
+    "autocomplete_cache_ttl": 60,
+}
+
+
+class TrackIndex:
+    def search(self, query: str, guild_id: int | None, limit: int) -> list:
+        return []
+
+
+def test_search_failed_after_deadline_is_retrieved() -> None:
+    """
+        Ответ уже отдан по дедлайну, а поиск потом упал: asyncio не должен сообщать о непрочитанной ошибке
+    """
+    async def run() -> typing.List[dict]:
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda _, context: errors.append(context))
+        engine = AutocompleteEngine(None, TrackIndex(), CONFIG)
+
+        async def search_tracks(query: str) -> None:
+            await asyncio.sleep(0.05)
+            raise RuntimeError("service failed")
+
+        engine._AutocompleteEngine__search_tracks = search_tracks
+        assert await engine.search(1, None, "rock") == []
+        _, task = engine._searches_by_user[1]
+        await asyncio.wait({task})
+        await asyncio.sleep(0)
+        assert engine._searches_by_user == {}
+
+        del task
+        gc.collect()
+        return errors
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,270 @@
+"""
+    Общий эфир (core.broadcast): станция раздает одни и те же кадры всем слушателям.
+    Вместо FFmpeg станция читает источник с пронумерованными пакетами Opus, очередь и хранилище - простые объекты
+"""
+import asyncio
+import threading
+import time
+import typing
+
+import pytest
+
+from core.audio import OPUS_SILENCE
+from core.broadcast import BroadcastStation, BroadcastHub, BroadcastListener
+
+
+class PacketSource:
+    """
+        Пакет номер n - строка b"n", после последнего пакета - пустой пакет (конец трека)
+    """
+
+    def __init__(self, number_of_packets: int) -> None:
+        self._number_of_packets: int = number_of_packets
+        self._number: int = 0
+        self.is_closed: bool = False
+
+    def read(self) -> bytes:
+        if self._number >= self._number_of_packets:
+            return b""
+        self._number += 1
+        return str(self._number).encode()
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        self.is_closed = True
+
+
+class Track:
+    title: str = "track"
+
+    def get_filename(self) -> str:
+        return "track"
+
+    def duration(self) -> float:
+        return 0
+
+
+class Queue:
+    def __init__(self, number_of_tracks: int) -> None:
+        self._tracks: typing.List[Track] = [Track() for _ in range(number_of_tracks)]
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._tracks
+
+    async def upload_queue_async(self) -> None:
+        pass
+
+    def get_next_track(self) -> Track | None:
+        return self._tracks.pop(0) if self._tracks else None
+
+    def peek_next_track(self) -> Track | None:
+        return self._tracks[0] if self._tracks else None
+
+    def update_queue(self, callback: typing.Callable[[], None] | None) -> None:
+        pass
+
+
+class Storage:
+    def __init__(self) -> None:
+        # Запрос добавляется, когда тест разрешит
+        self.is_added: asyncio.Event = asyncio.Event()
+        self.is_added.set()
+        self.result: bool = True
+
+    async def add(self, request) -> bool:
+        await self.is_added.wait()
+        return self.result
+
+
+class FFmpegPool:
+    def __init__(self, number_of_packets: int) -> None:
+        self._number_of_packets: int = number_of_packets
+        self.sources: typing.List[PacketSource] = []
+
+    def open(self, filename: str) -> PacketSource:
+        source = PacketSource(self._number_of_packets)
+        self.sources.append(source)
+        return source
+
+    def get_duration(self, filename: str, on_probed: typing.Callable[[float], None]) -> float:
+        return 0
+
+
+def create_station(name: str, on_finished: typing.Callable[[BroadcastStation], None],
+                   storage: Storage | None = None, number_of_tracks: int = 1,
+                   number_of_packets: int = 100000, buffer_frames: int = 1000) -> BroadcastStation:
+    return BroadcastStation(name, Queue(number_of_tracks), storage or Storage(), FFmpegPool(number_of_packets),
+                            preroll=0, crossfade=0, buffer_frames=buffer_frames, on_finished=on_finished)
+
+
+def read_all(listener: BroadcastListener) -> typing.List[int]:
+    """
+        Номера пакетов до конца эфира. Тишина означает, что кадров в буфере больше нет
+    """
+    numbers = []
+    while True:
+        frame = listener.read()
+        assert frame != OPUS_SILENCE, "Broadcast is not finished"
+        if frame == b"":
+            return numbers
+        numbers.append(int(frame))
+
+
+async def wait_for_frames(listener: BroadcastListener, number_of_frames: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(listener._frames) < number_of_frames:
+        assert time.monotonic() < deadline, "Station does not play"
+        await asyncio.sleep(0.01)
+
+
+def stop(station: BroadcastStation) -> None:
+    station.stop()
+    station._thread.join(5)
+    assert not station._thread.is_alive()
+
+
+def test_listener_joins_mid_stream() -> None:
+    async def run() -> None:
+        station = create_station("rock", lambda _: None)
+        first = station.subscribe()
+        assert await station.start(None)
+        await wait_for_frames(first, 5)
+
+        second = station.subscribe()
+        await wait_for_frames(second, 5)
+        stop(station)
+
+        first_numbers, second_numbers = read_all(first), read_all(second)
+        assert first_numbers == list(range(1, len(first_numbers) + 1))
+        # Новый слушатель получает кадры с текущего места, те же, что и остальные
+        assert second_numbers[0] > 1
+        assert second_numbers == first_numbers[second_numbers[0] - 1:]
+
+    asyncio.run(run())
+
+
+def test_slow_listener_drops_old_frames() -> None:
+    async def run() -> None:
+        station = create_station("rock", lambda _: None, buffer_frames=5)
+        slow = station.subscribe()
+        assert await station.start(None)
+        # Слушатель не читает: станция не ждет его и продолжает эфир
+        await asyncio.sleep(0.3)
+        stop(station)
+
+        numbers = read_all(slow)
+        assert len(numbers) == 4
+        assert numbers[0] > 1
+        assert numbers == list(range(numbers[0], numbers[0] + 4))
+        assert slow.read() == OPUS_SILENCE
+
+    asyncio.run(run())
+
+
+def test_listener_without_frames_sends_silence() -> None:
+    station = create_station("rock", lambda _: None, buffer_frames=2)
+    listener = station.subscribe()
+    for frame in (b"1", b"2", b"3"):
+        listener.push(frame)
+
+    assert [listener.read() for _ in range(3)] == [b"2", b"3", OPUS_SILENCE]
+
+
+def test_last_unsubscribe_stops_station() -> None:
+    async def run() -> None:
+        stations = []
+
+        def create(name: str, on_finished: typing.Callable[[BroadcastStation], None]) -> BroadcastStation:
+            stations.append(create_station(name, on_finished))
+            return stations[-1]
+
+        hub = BroadcastHub(create)
+        first = await hub.subscribe("Rock", lambda: None)
+        second = await hub.subscribe(" rock ", lambda: None)
+        assert len(stations) == 1
+        assert first.station is second.station
+        assert hub.number_of_stations == 1
+
+        first.cleanup()
+        await asyncio.sleep(0.05)
+        assert hub.number_of_stations == 1
+        assert stations[0].number_of_listeners == 1
+
+        # Повторное закрытие ничего не меняет
+        second.cleanup()
+        second.cleanup()
+        await asyncio.sleep(0.05)
+        assert hub.number_of_stations == 0
+        stations[0]._thread.join(5)
+        assert not stations[0]._thread.is_alive()
+        assert stations[0]._ffmpeg_pool.sources[0].is_closed
+
+        # Следующий слушатель запускает новую станцию
+        third = await hub.subscribe("rock", lambda: None)
+        assert len(stations) == 2
+        assert third.station is stations[1]
+        hub.close()
+        stations[1]._thread.join(5)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("reason", ["request", "queue"])
+def test_failed_start_ends_pending_listeners(reason: str) -> None:
+    """
+        Гильдии, подключившиеся во время загрузки, получают конец эфира, если станция не запустилась
+    """
+    async def run() -> None:
+        storage = Storage()
+        storage.is_added.clear()
+        if reason == "request":
+            storage.result = False
+        stations = []
+
+        def create(name: str, on_finished: typing.Callable[[BroadcastStation], None]) -> BroadcastStation:
+            stations.append(create_station(name, on_finished, storage=storage,
+                                           number_of_tracks=0 if reason == "queue" else 1))
+            return stations[-1]
+
+        hub = BroadcastHub(create)
+        first = asyncio.create_task(hub.subscribe("rock", lambda: None))
+        await asyncio.sleep(0)
+        pending = [await hub.subscribe("rock", lambda: None) for _ in range(2)]
+        assert len(stations) == 1
+        assert all(listener.read() == OPUS_SILENCE for listener in pending)
+
+        storage.is_added.set()
+        assert await first is None
+        assert hub.number_of_stations == 0
+        assert stations[0]._thread is None
+        for listener in pending:
+            assert listener.read() == b""
+
+    asyncio.run(run())
+
+
+def test_track_end_after_loop_is_closed() -> None:
+    """
+        Бот завершается: цикл событий закрыт, а трек закончился. Поток станции останавливается без ошибок
+    """
+    loop = asyncio.new_event_loop()
+    loop.close()
+    station = create_station("rock", lambda _: None)
+    listener = station.subscribe()
+    source = PacketSource(0)
+    station._loop = loop
+    station._source = source
+
+    thread = threading.Thread(target=station._BroadcastStation__run)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert source.is_closed
+    # Кадр, на котором закончился трек, - тишина, за ним конец эфира
+    assert [listener.read() for _ in range(2)] == [OPUS_SILENCE, b""]
+
+    # Последний слушатель уходит после закрытия цикла
+    listener.cleanup()
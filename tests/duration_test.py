@@ -0,0 +1,201 @@
+"""
+    Разбор MP3 и Ogg без ffprobe (core.duration) на синтетических файлах
+    MP3: кадры MPEG1 Layer III 128 кбит/с 44.1 кГц (417 байт, 1152 сэмпла), Ogg: страницы без контрольных сумм
+"""
+import struct
+import typing
+
+import pytest
+
+from core.duration import read_stream, build_seek_table, SEEK_TABLE_INTERVAL, _get_mp3_audio_range
+
+# MPEG1 Layer III, без CRC, 128 кбит/с, 44100 Гц, без дополнения
+STEREO_HEADER = b"\xff\xfb\x90\x00"
+MONO_HEADER = b"\xff\xfb\x90\xc0"
+FRAME_LENGTH = 417
+FRAME_DURATION = 1152 / 44100
+# Side information первого кадра MPEG1
+STEREO_SIDE_INFORMATION = 32
+MONO_SIDE_INFORMATION = 17
+
+
+def mp3_frame(header: bytes = STEREO_HEADER, payload: bytes = b"") -> bytes:
+    return (header + payload).ljust(FRAME_LENGTH, b"\x00")
+
+
+def xing_frame(tag: bytes, number_of_frames: int, header: bytes = STEREO_HEADER,
+               side_information: int = STEREO_SIDE_INFORMATION) -> bytes:
+    return mp3_frame(header, bytes(side_information) + tag + struct.pack(">II", 0x01, number_of_frames))
+
+
+def vbri_frame(number_of_frames: int) -> bytes:
+    # Версия, задержка, качество, размер в байтах, затем число кадров
+    return mp3_frame(STEREO_HEADER, bytes(32) + b"VBRI" + bytes(10) + struct.pack(">I", number_of_frames))
+
+
+def id3v2_tag(size: int, has_footer: bool) -> bytes:
+    """
+        Размер записывается 7-битными байтами и не включает заголовок и футер
+    """
+    synchsafe_size = bytes((size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    flags = 0x10 if has_footer else 0
+    tag = b"ID3\x04\x00" + bytes((flags,)) + synchsafe_size + bytes(size)
+    if has_footer:
+        tag += b"3DI\x04\x00" + bytes((flags,)) + synchsafe_size
+    return tag
+
+
+def ogg_page(packet: bytes, granule_position: int, serial: int = 1, sequence: int = 0) -> bytes:
+    segments = [255] * (len(packet) // 255) + [len(packet) % 255]
+    return b"OggS" + struct.pack("<BBqIIIB", 0, 0, granule_position, serial, sequence, 0, len(segments)) + \
+        bytes(segments) + packet
+
+
+def opus_head(channels: int = 2, pre_skip: int = 312) -> bytes:
+    return b"OpusHead" + struct.pack("<BBHIhB", 1, channels, pre_skip, 44100, 0, 0)
+
+
+def vorbis_head(channels: int = 2, sample_rate: int = 44100) -> bytes:
+    return (b"\x01vorbis" + struct.pack("<IBI", 0, channels, sample_rate)).ljust(30, b"\x00")
+
+
+@pytest.fixture
+def write(tmp_path) -> typing.Callable[[bytes], str]:
+    def write(data: bytes) -> str:
+        path = tmp_path / "track"
+        path.write_bytes(data)
+        return str(path)
+    return write
+
+
+@pytest.mark.parametrize("tag", [b"Xing", b"Info"])
+def test_mp3_xing_header(write, tag: bytes) -> None:
+    # Число кадров из заголовка, а не из размера файла
+    stream = read_stream(write(xing_frame(tag, 1000) + mp3_frame() * 5))
+
+    assert stream.format == "mp3"
+    assert stream.sample_rate == 44100
+    assert stream.channels == 2
+    assert stream.duration == pytest.approx(1000 * FRAME_DURATION)
+
+
+def test_mp3_xing_header_mono(write) -> None:
+    stream = read_stream(write(xing_frame(b"Xing", 200, MONO_HEADER, MONO_SIDE_INFORMATION) +
+                               mp3_frame(MONO_HEADER) * 2))
+
+    assert stream.channels == 1
+    assert stream.duration == pytest.approx(200 * FRAME_DURATION)
+
+
+def test_mp3_xing_header_without_frames_field(write) -> None:
+    """
+        Флаг числа кадров не установлен: длительность считается как у CBR
+    """
+    frame = mp3_frame(STEREO_HEADER, bytes(STEREO_SIDE_INFORMATION) + b"Xing" + struct.pack(">II", 0, 1000))
+    stream = read_stream(write(frame + mp3_frame() * 4))
+
+    assert stream.duration == pytest.approx(5 * FRAME_LENGTH * 8 / 128000)
+
+
+def test_mp3_vbri_header(write) -> None:
+    stream = read_stream(write(vbri_frame(700) + mp3_frame() * 3))
+
+    assert stream.duration == pytest.approx(700 * FRAME_DURATION)
+
+
+def test_mp3_cbr_without_header(write) -> None:
+    # Мусор перед первым кадром и тег ID3v1 в конце не считаются звуком
+    data = b"\x00\xff\x00" + mp3_frame() * 20 + b"TAG".ljust(128, b"\x00")
+    stream = read_stream(write(data))
+
+    assert stream.duration == pytest.approx(20 * FRAME_LENGTH * 8 / 128000)
+
+
+@pytest.mark.parametrize("has_footer", [False, True])
+def test_mp3_id3v2_tag(write, has_footer: bool) -> None:
+    tag = id3v2_tag(300, has_footer)
+    path = write(tag + mp3_frame() * 10)
+
+    with open(path, "rb") as file:
+        audio_start, audio_end = _get_mp3_audio_range(file, len(tag) + 10 * FRAME_LENGTH)
+    # Футер - еще 10 байт после тега
+    assert audio_start == len(tag) == 10 + 300 + (10 if has_footer else 0)
+    assert audio_end == len(tag) + 10 * FRAME_LENGTH
+    assert read_stream(path).duration == pytest.approx(10 * FRAME_LENGTH * 8 / 128000)
+
+
+def test_mp3_seek_table(write) -> None:
+    tag = id3v2_tag(100, has_footer=True)
+    number_of_frames = 200
+    seek_table = build_seek_table(write(tag + xing_frame(b"Xing", number_of_frames) +
+                                        mp3_frame() * number_of_frames))
+
+    assert seek_table.header_size == 0
+    # Первая точка - первый кадр со звуком, после тега и кадра Xing
+    assert seek_table.offsets[0] == len(tag) + FRAME_LENGTH
+    assert len(seek_table.offsets) == int(number_of_frames * FRAME_DURATION / SEEK_TABLE_INTERVAL) + 1
+    for position in (0, 0.3, 1.0, 2.49, 4.9):
+        offset, start = seek_table.find(position)
+        frame_index = (offset - len(tag) - FRAME_LENGTH) // FRAME_LENGTH
+        # Найденный кадр звучит в момент ближайшей точки таблицы, не позже position
+        point = position // SEEK_TABLE_INTERVAL * SEEK_TABLE_INTERVAL
+        assert start == pytest.approx(frame_index * FRAME_DURATION)
+        assert start <= point < start + FRAME_DURATION
+
+
+def test_ogg_opus(write) -> None:
+    pre_skip = 312
+    pages = [ogg_page(opus_head(channels=1, pre_skip=pre_skip), 0),
+             ogg_page(b"OpusTags" + bytes(8), 0, sequence=1)]
+    pages += [ogg_page(bytes(400), 48000 * index, sequence=index + 1) for index in range(1, 6)]
+    # Страница, на которой не заканчивается ни один пакет, и страница другого потока
+    pages += [ogg_page(bytes(300), -1, sequence=7), ogg_page(bytes(10), 10 ** 9, serial=2)]
+    stream = read_stream(write(b"".join(pages)))
+
+    assert stream.format == "ogg"
+    assert stream.codec == "opus"
+    # Позиции Opus считаются в 48 кГц
+    assert stream.sample_rate == 48000
+    assert stream.channels == 1
+    assert stream.duration == pytest.approx((5 * 48000 - pre_skip) / 48000)
+
+
+def test_ogg_vorbis(write) -> None:
+    pages = [ogg_page(vorbis_head(sample_rate=44100), 0)]
+    pages += [ogg_page(bytes(1000), 44100 * index // 2, sequence=index) for index in range(1, 8)]
+    stream = read_stream(write(b"".join(pages)))
+
+    assert stream.codec == "vorbis"
+    assert stream.sample_rate == 44100
+    assert stream.channels == 2
+    assert stream.duration == pytest.approx(3.5)
+
+
+def test_ogg_seek_table(write) -> None:
+    pre_skip = 312
+    header_pages = ogg_page(opus_head(pre_skip=pre_skip), 0) + ogg_page(b"OpusTags" + bytes(600), 0, sequence=1)
+    # Страницы по 0.2 с
+    granule_positions = [9600 * index + pre_skip for index in range(1, 26)]
+    audio_pages = [ogg_page(bytes(100 + index), granule_position, sequence=index + 2)
+                   for index, granule_position in enumerate(granule_positions)]
+    seek_table = build_seek_table(write(header_pages + b"".join(audio_pages)))
+
+    assert seek_table.sample_rate == 48000
+    # Декодеру сначала передаются страницы заголовков
+    assert seek_table.header_size == len(header_pages)
+    page_offsets = [len(header_pages) + sum(len(page) for page in audio_pages[:index])
+                    for index in range(len(audio_pages))]
+    for position in (0, 0.1, 0.5, 1.99, 4.9):
+        offset, start = seek_table.find(position)
+        index = page_offsets.index(offset)
+        end = (granule_positions[index] - pre_skip) / 48000
+        point = position // SEEK_TABLE_INTERVAL * SEEK_TABLE_INTERVAL
+        assert start == pytest.approx(index * 0.2)
+        assert start <= point < end
+
+
+def test_unsupported_data(write) -> None:
+    assert read_stream(write(b"RIFF" + bytes(1000))) is None
+    assert read_stream(write(b"OggS" + bytes(10))) is None
+    assert read_stream(write(ogg_page(b"FLAC" + bytes(30), 0))) is None
+    assert build_seek_table(write(bytes(100))) is None
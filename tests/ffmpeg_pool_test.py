@@ -0,0 +1,109 @@
+"""
+    Ограничение числа процессов FFmpeg и пополнение пула (core.ffmpeg_pool)
+    Вместо FFmpeg запускается скрипт, который не смотрит на аргументы и копирует stdin в stdout
+"""
+import asyncio
+import sys
+import threading
+import typing
+
+import pytest
+
+from core.errors import FFmpegProcessesLimitError
+from core.ffmpeg_pool import FFmpegProcessPool
+from core.launch_profiles import LaunchProfiles
+from core.loudness import LoudnessSettings
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Fake FFmpeg is a shell script")
+
+
+@pytest.fixture
+def track(tmp_path) -> str:
+    path = tmp_path / "track.pcm"
+    path.write_bytes(bytes(3840 * 10))
+    return str(path)
+
+
+@pytest.fixture
+def create_pool(tmp_path) -> typing.Iterator[typing.Callable[[int, int], FFmpegProcessPool]]:
+    executable = tmp_path / "ffmpeg"
+    executable.write_text(f"#!{sys.executable}\n"
+                          f"import shutil, sys\n"
+                          f"shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)\n")
+    executable.chmod(0o755)
+    pools = []
+
+    def create_pool(idle_processes: int, max_processes: int) -> FFmpegProcessPool:
+        launch_profiles = LaunchProfiles(str(tmp_path / "launch_profiles.json"), 10,
+                                         LoudnessSettings(enabled=False, target=-14, max_gain=12, peak_limit=-1), 1)
+        pool = FFmpegProcessPool(idle_processes, max_processes, 600, launch_profiles, executable=str(executable))
+        pools.append(pool)
+        return pool
+
+    yield create_pool
+    for pool in pools:
+        pool.close()
+
+
+def test_open_over_limit_is_rejected(create_pool, track: str) -> None:
+    pool = create_pool(0, 2)
+    sources = [pool.open(track), pool.open(track)]
+    with pytest.raises(FFmpegProcessesLimitError):
+        pool.open(track)
+    assert pool.number_of_active_processes == 2
+
+    # Закрытый трек освобождает место
+    sources.pop().cleanup()
+    sources.append(pool.open(track))
+    assert pool.number_of_active_processes == 2
+    for source in sources:
+        source.cleanup()
+    assert pool.number_of_active_processes == 0
+
+
+def test_warm_up_respects_limit(create_pool, track: str) -> None:
+    pool = create_pool(3, 2)
+    pool.warm_up()
+    assert pool.number_of_idle_processes == 2
+
+    # Ждущий процесс становится проигрывающим, сверх ограничения новые не запускаются
+    source = pool.open(track)
+    pool.warm_up()
+    assert pool.number_of_active_processes == 1
+    assert pool.number_of_idle_processes == 1
+    source.cleanup()
+
+
+def test_new_process_replaces_idle_process_of_other_profile(create_pool, track: str) -> None:
+    pool = create_pool(2, 2)
+    pool._warm_profile = ("-f", "mp3")
+    pool.warm_up()
+    assert pool.number_of_idle_processes == 2
+
+    # Профиль трека другой: ждущий процесс не подходит и уступает место новому
+    source = pool.open(track)
+    assert pool.number_of_active_processes == 1
+    assert pool.number_of_idle_processes == 1
+    source.cleanup()
+
+
+def test_warm_up_runs_outside_event_loop(create_pool, track: str) -> None:
+    pool = create_pool(2, 4)
+    warm_up = pool.warm_up
+    threads = []
+
+    def record_thread() -> None:
+        threads.append(threading.current_thread())
+        warm_up()
+
+    pool.warm_up = record_thread
+
+    async def run() -> None:
+        source = pool.open(track)
+        await pool._warm_up_task
+        source.cleanup()
+
+    asyncio.run(run())
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+    assert pool.number_of_idle_processes == 2
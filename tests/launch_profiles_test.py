@@ -0,0 +1,48 @@
+"""
+    Определение файлов в фоне (core.launch_profiles): одновременные запросы ждут одно определение
+"""
+import asyncio
+import typing
+
+import core.launch_profiles
+from core.duration import ParsedStream
+from core.launch_profiles import LaunchProfiles, FULL_PROBE_ARGUMENTS
+from core.loudness import LoudnessSettings
+
+
+def test_repeated_requests_start_one_probe(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "track.mp3"
+    path.write_bytes(bytes(1000))
+    filename = str(path)
+    calls: typing.List[str] = []
+
+    def read_stream(name: str) -> ParsedStream:
+        calls.append(name)
+        return ParsedStream(format="mp3", codec="mp3", sample_rate=44100, channels=2, duration=180)
+
+    monkeypatch.setattr(core.launch_profiles, "read_stream", read_stream)
+    launch_profiles = LaunchProfiles(str(tmp_path / "launch_profiles.json"), 10,
+                                     LoudnessSettings(enabled=False, target=-14, max_gain=12, peak_limit=-1), 1)
+
+    async def run() -> None:
+        durations: typing.List[float] = []
+        assert launch_profiles.get_duration(filename, durations.append) == 0
+        assert launch_profiles.get_duration(filename, durations.append) == 0
+        assert launch_profiles.get_input_arguments(filename) == FULL_PROBE_ARGUMENTS
+        assert len(launch_profiles._probing) == 1
+        task = launch_profiles._probing[filename]
+
+        stream_info = await launch_profiles.probe(filename)
+        await asyncio.sleep(0)
+        assert task.done()
+        assert calls == [filename]
+        assert stream_info.duration == 180
+        assert durations == [180, 180]
+        assert launch_profiles._probing == {}
+
+        # Определенный файл больше не определяется
+        assert launch_profiles.get_duration(filename, durations.append) == 180
+        assert launch_profiles._probing == {}
+        assert calls == [filename]
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+"""
+    Перемешанный порядок без хранения перестановки (utils.shuffle)
+"""
+import random
+
+import pytest
+
+from utils.shuffle import RandomPermutation, ShuffledPositions
+
+
+def to_positions(runs) -> list:
+    return [position for start, end in runs for position in range(start, end)]
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 5, 16, 17, 100, 1000, 4097])
+def test_permutation_is_bijection(size: int) -> None:
+    permutation = RandomPermutation(size, seed=size)
+
+    assert sorted(permutation.get(index) for index in range(size)) == list(range(size))
+    with pytest.raises(IndexError):
+        permutation.get(size)
+
+
+def test_permutation_depends_on_seed() -> None:
+    first = [RandomPermutation(100, seed=1).get(index) for index in range(100)]
+
+    assert first == [RandomPermutation(100, seed=1).get(index) for index in range(100)]
+    assert first != [RandomPermutation(100, seed=2).get(index) for index in range(100)]
+    assert first != list(range(100))
+
+
+def test_next_and_previous() -> None:
+    shuffled = ShuffledPositions(seed=0)
+    shuffled.append_range(0, 50)
+    order = to_positions(shuffled.get_runs(0, 50))
+    assert sorted(order) == list(range(50))
+
+    assert to_positions(shuffled.pop_front(10)) == order[:10]
+    assert [shuffled.get_drawn(draw) for draw in range(10)] == order[:10]
+    assert len(shuffled) == 40
+
+    # Отмененные выборы снова становятся следующими
+    shuffled.rewind(3)
+    assert shuffled.number_of_drawn == 7
+    assert to_positions(shuffled.pop_front(5)) == order[7:12]
+
+    shuffled.skip(8)
+    assert to_positions(shuffled.get_runs(0, 100)) == order[20:]
+    assert to_positions(shuffled.get_remaining_runs()) == sorted(order[20:])
+
+
+def test_segments_match_list() -> None:
+    """
+        Номера, добавленные позже, идут после уже перемешанных. Сравнение с обычным списком
+    """
+    rng = random.Random(0)
+    shuffled = ShuffledPositions(seed=0)
+    drawn, remaining = [], []
+    number_of_positions = 0
+    for _ in range(500):
+        action = rng.randrange(4)
+        count = rng.randrange(8)
+        if action == 0:
+            shuffled.append_range(number_of_positions, number_of_positions + count)
+            remaining.extend(to_positions(shuffled.get_runs(len(remaining), len(remaining) + count)))
+            assert sorted(remaining[len(remaining) - count:]) == \
+                list(range(number_of_positions, number_of_positions + count))
+            number_of_positions += count
+        elif action == 1:
+            assert to_positions(shuffled.pop_front(count)) == remaining[:count]
+            drawn.extend(remaining[:count])
+            del remaining[:count]
+        elif action == 2:
+            shuffled.skip(count)
+            drawn.extend(remaining[:count])
+            del remaining[:count]
+        else:
+            count = min(count, len(drawn))
+            shuffled.rewind(count)
+            remaining[:0] = drawn[len(drawn) - count:]
+            del drawn[len(drawn) - count:]
+
+        assert len(shuffled) == len(remaining)
+        assert shuffled.number_of_drawn == len(drawn)
+        assert to_positions(shuffled.get_runs(0, len(remaining))) == remaining
+        assert [shuffled.get_drawn(draw) for draw in range(len(drawn))] == drawn
+        assert to_positions(shuffled.get_remaining_runs()) == sorted(remaining)
+
+    shuffled.clear()
+    assert len(shuffled) == 0
+    assert shuffled.pop_front(10) == []
@@ -0,0 +1,78 @@
+"""
+    Треки, выгруженные на диск (storage.spill)
+"""
+import dataclasses
+
+import pytest
+
+from storage.data import TrackData, ShortArtistData
+from storage.interning import DataInterner
+from storage.registry import MetadataRegistry
+from storage.spill import SpilledTracks
+
+
+def create_track(interner: DataInterner, track_id: int | str) -> TrackData:
+    return TrackData(id=track_id,
+                     title=interner.get_string(f"track {track_id}"),
+                     available=True,
+                     duration_in_milliseconds=180_000,
+                     cover_uri=interner.get_string("avatars.yandex.net/get-music-content/1/cover/%%"),
+                     artists=interner.get_artists([(1, "artist 1"), (2, "artist 2")]),
+                     album_ids=interner.get_album_ids([10, 11]))
+
+
+def test_spilled_tracks_round_trip() -> None:
+    tracks = [create_track(DataInterner(), track_id) for track_id in range(10)]
+    # Необязательные поля, не ASCII и пустые списки
+    tracks[3] = TrackData(id=3, title="Цветы 🌸", available=False, duration_in_milliseconds=None, cover_uri=None,
+                          artists=(ShortArtistData(id=5, name="Исполнитель"),), album_ids=())
+    tracks[4] = dataclasses.replace(tracks[4], artists=(), album_ids=(1, 2, 3))
+
+    spilled = SpilledTracks(tracks, page_size=3, hot_pages=2)
+    try:
+        assert len(spilled) == len(tracks)
+        assert list(spilled) == tracks
+        assert spilled[-1] == tracks[-1]
+        assert spilled[2:7] == tuple(tracks[2:7])
+        assert spilled[::4] == tuple(tracks[::4])
+        with pytest.raises(IndexError):
+            _ = spilled[len(tracks)]
+        # В памяти только последние прочитанные страницы
+        assert len(spilled._pages) == 2
+        # Треки одной страницы делят повторяющиеся данные
+        assert spilled[0].artists is spilled[1].artists
+    finally:
+        spilled.close()
+
+
+def test_spilled_tracks_keep_string_ids() -> None:
+    """
+        Id загруженных пользователем треков в Я.Музыке - строки
+    """
+    tracks = [create_track(DataInterner(), 1),
+              create_track(DataInterner(), "3d9a7f2c-5e1b-4c8e-9f0a-2b6d4e8c1a3f"),
+              dataclasses.replace(create_track(DataInterner(), "42"),
+                                  artists=(ShortArtistData(id="artist", name="Исполнитель"),))]
+
+    spilled = SpilledTracks(tracks, page_size=2, hot_pages=1)
+    try:
+        assert list(spilled) == tracks
+        assert [type(track.id) for track in spilled] == [int, str, str]
+        assert spilled[2].artists[0].id == "artist"
+    finally:
+        spilled.close()
+
+
+def test_spilled_tracks_use_registry() -> None:
+    """
+        Трек, прочитанный с диска, - тот же объект, что уже загружен другой гильдией
+    """
+    registry = MetadataRegistry()
+    interner = DataInterner(registry)
+    tracks = [interner.get_track(create_track(interner, track_id)) for track_id in range(5)]
+
+    spilled = SpilledTracks(tracks, page_size=2, hot_pages=1, registry=registry)
+    try:
+        assert all(spilled[index] is track for index, track in enumerate(tracks))
+    finally:
+        spilled.close()
@@ -0,0 +1,103 @@
+"""
+    Замер памяти, которую занимают треки в очереди
+    Запуск: python -m tests.storage_memory_benchmark [кол-во треков] [кол-во гильдий]
+
+    Ответ сервиса моделируется синтетически: у каждого трека новые строки и объекты исполнителей,
+    как их создает библиотека yandex_music при разборе json
+"""
+import random
+import sys
+import tracemalloc
+import typing
+
+from storage.data import TrackData, ShortArtistData
+from storage.interning import DataInterner
+from storage.registry import MetadataRegistry
+
+NUMBER_OF_ARTISTS = 300
+NUMBER_OF_ALBUMS = 500
+
+
+def copy_string(value: str) -> str:
+    """
+        Новый объект строки, как после разбора json
+    """
+    return "".join(list(value))
+
+
+def generate_raw_tracks(number_of_tracks: int) -> typing.List[dict]:
+    generator = random.Random(0)
+    raw_tracks = []
+    for track_id in range(number_of_tracks):
+        artist_ids = generator.sample(range(NUMBER_OF_ARTISTS), generator.randint(1, 2))
+        album_id = generator.randrange(NUMBER_OF_ALBUMS)
+        raw_tracks.append({
+            "id": track_id,
+            "title": f"track {track_id}",
+            "duration_ms": generator.randint(120_000, 300_000),
+            "cover_uri": f"avatars.yandex.net/get-music-content/{album_id}/cover/%%",
+            "artists": [(artist_id, f"artist {artist_id}") for artist_id in artist_ids],
+            "album_ids": [album_id]
+        })
+    return raw_tracks
+
+
+def convert_plain(raw_tracks: typing.List[dict]) -> typing.Tuple[TrackData, ...]:
+    return tuple(TrackData(id=raw["id"],
+                           title=copy_string(raw["title"]),
+                           available=True,
+                           duration_in_milliseconds=raw["duration_ms"],
+                           cover_uri=copy_string(raw["cover_uri"]),
+                           artists=tuple(ShortArtistData(id=artist_id, name=copy_string(name))
+                                         for artist_id, name in raw["artists"]),
+                           album_ids=tuple(raw["album_ids"]))
+                 for raw in raw_tracks)
+
+
+def convert_interned(raw_tracks: typing.List[dict],
+                     registry: MetadataRegistry | None = None) -> typing.Tuple[TrackData, ...]:
+    interner = DataInterner(registry)
+    return tuple(interner.get_track(TrackData(id=raw["id"],
+                                              title=interner.get_string(copy_string(raw["title"])),
+                                              available=True,
+                                              duration_in_milliseconds=raw["duration_ms"],
+                                              cover_uri=interner.get_string(copy_string(raw["cover_uri"])),
+                                              artists=interner.get_artists((artist_id, copy_string(name))
+                                                                           for artist_id, name in raw["artists"]),
+                                              album_ids=interner.get_album_ids(raw["album_ids"])))
+                 for raw in raw_tracks)
+
+
+def create_convert_shared() -> typing.Callable[[typing.List[dict]], typing.Tuple[TrackData, ...]]:
+    """
+        Все гильдии используют один реестр
+    """
+    registry = MetadataRegistry()
+    return lambda raw_tracks: convert_interned(raw_tracks, registry)
+
+
+def measure(convert: typing.Callable[[typing.List[dict]], typing.Tuple[TrackData, ...]],
+            raw_tracks: typing.List[dict], number_of_guilds: int) -> int:
+    tracemalloc.start()
+    queues = [convert(raw_tracks) for _ in range(number_of_guilds)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queues
+    return size
+
+
+def main() -> None:
+    number_of_tracks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    number_of_guilds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    raw_tracks = generate_raw_tracks(number_of_tracks)
+    total_tracks = number_of_tracks * number_of_guilds
+
+    for name, convert in (("plain", convert_plain), ("interned", convert_interned),
+                          ("shared", create_convert_shared())):
+        size = measure(convert, raw_tracks, number_of_guilds)
+        print(f"{name:>8}: {size / 1024 / 1024:8.2f} MB, {size / total_tracks:6.0f} bytes per track "
+              f"({number_of_guilds} guilds x {number_of_tracks} tracks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+    Общие объекты для повторяющихся данных треков (storage.interning, storage.registry)
+"""
+import dataclasses
+import gc
+
+from storage.data import TrackData
+from storage.interning import DataInterner
+from storage.registry import MetadataRegistry
+
+
+def copy_string(value: str) -> str:
+    """
+        Новый объект строки, как после разбора json
+    """
+    return "".join(list(value))
+
+
+def create_track(interner: DataInterner, track_id: int) -> TrackData:
+    return TrackData(id=track_id,
+                     title=interner.get_string(copy_string(f"track {track_id}")),
+                     available=True,
+                     duration_in_milliseconds=180_000,
+                     cover_uri=interner.get_string(copy_string("avatars.yandex.net/get-music-content/1/cover/%%")),
+                     artists=interner.get_artists([(1, copy_string("artist 1")), (2, copy_string("artist 2"))]),
+                     album_ids=interner.get_album_ids([10, 11]))
+
+
+def test_strings_are_interned() -> None:
+    first = DataInterner.get_string(copy_string("cover"))
+    second = DataInterner.get_string(copy_string("cover"))
+
+    assert first == "cover"
+    assert first is second
+    assert DataInterner.get_string(None) is None
+
+
+def test_artists_are_shared() -> None:
+    interner = DataInterner()
+    group = interner.get_artists([(1, copy_string("artist 1")), (2, copy_string("artist 2"))])
+
+    assert [(artist.id, artist.name) for artist in group] == [(1, "artist 1"), (2, "artist 2")]
+    # Тот же набор исполнителей в другом треке - тот же кортеж
+    assert interner.get_artists([(1, copy_string("artist 1")), (2, copy_string("artist 2"))]) is group
+    # Исполнитель в другом наборе - тот же объект
+    other_group = interner.get_artists([(2, copy_string("artist 2")), (3, copy_string("artist 3"))])
+    assert other_group[0] is group[1]
+    assert interner.get_artist(1, copy_string("artist 1")) is group[0]
+
+
+def test_album_ids_are_shared() -> None:
+    interner = DataInterner()
+    album_ids = interner.get_album_ids([10, 11])
+
+    assert album_ids == (10, 11)
+    assert interner.get_album_ids(iter([10, 11])) is album_ids
+    assert interner.get_album_ids([11, 10]) is not album_ids
+
+
+def test_tracks_share_fields() -> None:
+    interner = DataInterner()
+    first = create_track(interner, 1)
+    second = create_track(interner, 2)
+
+    assert first.cover_uri is second.cover_uri
+    assert first.artists is second.artists
+    assert first.album_ids is second.album_ids
+    # Без общего реестра трек не подменяется
+    assert interner.get_track(first) is first
+
+
+def test_registry_shares_tracks_between_guilds() -> None:
+    registry = MetadataRegistry()
+    first = create_track(DataInterner(registry), 1)
+    second = create_track(DataInterner(registry), 1)
+
+    assert first is not second
+    assert DataInterner(registry).get_track(first) is first
+    assert DataInterner(registry).get_track(second) is first
+    assert registry.try_get_track_by_id(1) is first
+
+
+def test_registry_replaces_changed_track() -> None:
+    registry = MetadataRegistry()
+    track = registry.get_track(create_track(DataInterner(), 1))
+    unavailable_track = dataclasses.replace(track, available=False)
+
+    assert registry.get_track(unavailable_track) is unavailable_track
+    assert registry.try_get_track_by_id(1) is unavailable_track
+
+
+def test_registry_forgets_unused_records() -> None:
+    """
+        Реестр не держит записи: когда их не использует ни одно хранилище, они удаляются
+    """
+    registry = MetadataRegistry()
+    interner = DataInterner(registry)
+    track = interner.get_track(create_track(interner, 1))
+    assert registry.number_of_tracks == 1
+    assert registry.number_of_artists == 2
+
+    del track, interner
+    gc.collect()
+    assert registry.number_of_tracks == 0
+    assert registry.number_of_artists == 0
+    assert registry.try_get_track_by_id(1) is None
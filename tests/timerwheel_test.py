@@ -0,0 +1,249 @@
+"""
+    Колесо таймеров (utils.timerwheel) на цикле событий с ручными часами
+    Тест сам двигает время и вызывает то, что колесо поставило через call_at
+"""
+import random
+import typing
+
+import pytest
+
+import utils.timerwheel
+from utils.timerwheel import TimerWheel, TICK, NUMBER_OF_SLOTS
+
+# Погрешность вычислений с плавающей точкой
+EPSILON = 1e-9
+
+
+class Handle:
+    def __init__(self, when: float, callback: typing.Callable[[], None]) -> None:
+        self.when: float = when
+        self.callback: typing.Callable[[], None] = callback
+        self.cancelled: bool = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class ManualLoop:
+    """
+        early - насколько раньше срока цикл вызывает callback (настоящий цикл так делает в пределах разрешения часов)
+    """
+
+    def __init__(self, early: float = 0) -> None:
+        self.now: float = 1000.0
+        self.early: float = early
+        self.handles: typing.List[Handle] = []
+
+    def time(self) -> float:
+        return self.now
+
+    def call_at(self, when: float, callback: typing.Callable[[], None]) -> Handle:
+        handle = Handle(when, callback)
+        self.handles.append(handle)
+        return handle
+
+    def advance(self, seconds: float) -> None:
+        target = self.now + seconds
+        while True:
+            due = [handle for handle in self.handles if not handle.cancelled and handle.when - self.early <= target]
+            if not due:
+                break
+            handle = min(due, key=lambda item: item.when)
+            self.handles.remove(handle)
+            self.now = max(self.now, handle.when - self.early)
+            handle.callback()
+        self.now = target
+
+    @property
+    def number_of_handles(self) -> int:
+        return sum(not handle.cancelled for handle in self.handles)
+
+
+def create_wheel(loop: ManualLoop) -> TimerWheel:
+    wheel = TimerWheel()
+    wheel._loop = loop
+    wheel._origin = loop.time()
+    return wheel
+
+
+@pytest.fixture
+def loop() -> ManualLoop:
+    return ManualLoop()
+
+
+def test_timer_fires_after_delay(loop: ManualLoop) -> None:
+    wheel = create_wheel(loop)
+    fired = []
+    timer = wheel.schedule(0.5, lambda: fired.append(loop.now))
+    assert timer.is_pending
+    assert wheel.number_of_pending_timers == 1
+    assert timer.remaining_time == pytest.approx(0.5)
+
+    loop.advance(0.499)
+    assert fired == []
+    loop.advance(0.001)
+    assert fired == [pytest.approx(1000.5)]
+    assert not timer.is_pending
+    assert wheel.number_of_pending_timers == 0
+
+
+@pytest.mark.parametrize("early", [0, TICK / 2])
+def test_timers_never_fire_early(early: float, monkeypatch) -> None:
+    """
+        Случайные задержки на всех уровнях колеса и случайные шаги времени.
+        early - цикл будит раньше срока, как при грубых часах (в Windows разрешение - 15.6 мс)
+    """
+    monkeypatch.setattr(utils.timerwheel, "CLOCK_RESOLUTION", early)
+    rng = random.Random(0)
+    loop = ManualLoop(early=early)
+    wheel = create_wheel(loop)
+    fired: typing.Dict[int, float] = {}
+    deadlines: typing.Dict[int, float] = {}
+
+    def schedule(number: int) -> None:
+        delay = rng.choice((0, TICK / 3, rng.uniform(0, 0.1), rng.uniform(0, 5), rng.uniform(0, 300)))
+        deadlines[number] = loop.now + delay
+        wheel.schedule(delay, lambda: fired.setdefault(number, loop.now))
+
+    for number in range(300):
+        schedule(number)
+    for number in range(300, 600):
+        loop.advance(rng.uniform(0, 1))
+        schedule(number)
+    loop.advance(400)
+
+    assert sorted(fired) == list(range(600))
+    assert wheel.number_of_pending_timers == 0
+    for number, fired_at in fired.items():
+        assert fired_at >= deadlines[number] - EPSILON
+        # Срабатывает в ближайшем шаге колеса после срока
+        assert fired_at < deadlines[number] + 2 * TICK
+
+
+def test_timers_cascade_between_levels(loop: ManualLoop) -> None:
+    wheel = create_wheel(loop)
+    fired = []
+    delays = [0.01, 0.1, 5, 300, 20000]
+    timers = [wheel.schedule(delay, lambda delay=delay: fired.append(delay)) for delay in delays]
+    # Дальние таймеры лежат на верхних уровнях и по мере приближения спускаются вниз
+    assert [timer._position[0] for timer in timers] == [0, 1, 2, 3, 4]
+
+    started_at = loop.now
+    for delay in delays:
+        loop.advance(started_at + delay - TICK - loop.now)
+        assert fired[-1:] != [delay]
+        loop.advance(started_at + delay + TICK - loop.now)
+        assert fired[-1] == delay
+    assert fired == delays
+
+
+def test_wheel_wakes_only_for_occupied_slots(loop: ManualLoop) -> None:
+    """
+        Цикл событий будит колесо один раз на ячейку, а не каждый шаг
+    """
+    wheel = create_wheel(loop)
+    fired = []
+    for _ in range(100):
+        wheel.schedule(0.03, lambda: fired.append(True))
+    assert loop.number_of_handles == 1
+
+    loop.advance(0.03)
+    assert len(fired) == 100
+    assert loop.number_of_handles == 0
+
+
+def test_cancel(loop: ManualLoop) -> None:
+    wheel = create_wheel(loop)
+    fired = []
+    timers = [wheel.schedule(delay, lambda delay=delay: fired.append(delay)) for delay in (0.01, 0.2, 10)]
+    timers[1].cancel()
+    timers[2].cancel()
+    # Повторная отмена ничего не ломает
+    timers[2].cancel()
+    assert wheel.number_of_pending_timers == 1
+    assert not timers[1].is_pending
+    assert timers[1].remaining_time == 0
+
+    loop.advance(20)
+    assert fired == [0.01]
+    assert wheel.number_of_pending_timers == 0
+
+
+def test_callback_cancels_timer_in_same_slot(loop: ManualLoop) -> None:
+    wheel = create_wheel(loop)
+    fired = []
+    timers = []
+
+    def cancel_others() -> None:
+        fired.append(True)
+        for timer in timers:
+            timer.cancel()
+
+    timers.extend(wheel.schedule(0.005, cancel_others) for _ in range(2))
+    loop.advance(1)
+    assert fired == [True]
+    assert wheel.number_of_pending_timers == 0
+
+
+def test_timer_scheduled_from_callback_waits_next_tick(loop: ManualLoop) -> None:
+    wheel = create_wheel(loop)
+    fired = []
+
+    def reschedule() -> None:
+        fired.append(loop.now)
+        if len(fired) < 3:
+            wheel.schedule(0, reschedule)
+
+    wheel.schedule(0, reschedule)
+    loop.advance(0)
+    assert len(fired) <= 1
+    loop.advance(0.01)
+    assert len(fired) == 3
+    assert fired[1] > fired[0] and fired[2] > fired[1]
+
+
+def test_pause_and_resume(loop: ManualLoop) -> None:
+    wheel = create_wheel(loop)
+    fired = []
+    timer = wheel.schedule(1, lambda: fired.append(loop.now))
+
+    loop.advance(0.4)
+    timer.pause()
+    assert timer.is_paused
+    assert not timer.is_pending
+    # Оставшееся время считается в целых шагах колеса, меньше настоящего оно не бывает
+    assert 0.6 - EPSILON <= timer.remaining_time <= 0.6 + TICK + EPSILON
+    assert wheel.number_of_pending_timers == 0
+
+    # На паузе таймер не срабатывает и оставшееся время не уменьшается
+    remaining_time = timer.remaining_time
+    loop.advance(10)
+    assert fired == []
+    assert timer.remaining_time == remaining_time
+
+    timer.resume()
+    assert not timer.is_paused
+    assert timer.is_pending
+    resumed_at = loop.now
+    loop.advance(remaining_time - TICK)
+    assert fired == []
+    loop.advance(2 * TICK)
+    assert len(fired) == 1
+    assert fired[0] >= resumed_at + remaining_time - EPSILON
+
+
+def test_long_wait_after_many_rotations(loop: ManualLoop) -> None:
+    """
+        Время ушло далеко вперед без таймеров: новый таймер все равно ложится в правильную ячейку
+    """
+    wheel = create_wheel(loop)
+    fired = []
+    wheel.schedule(0.001, lambda: fired.append(True))
+    loop.advance(NUMBER_OF_SLOTS ** 3 * TICK * 7.5)
+    assert fired == [True]
+
+    scheduled_at = loop.now
+    wheel.schedule(0.07, lambda: fired.append(loop.now))
+    loop.advance(1)
+    assert len(fired) == 2
+    assert scheduled_at + 0.07 - EPSILON <= fired[1] < scheduled_at + 0.07 + 2 * TICK
@@ -0,0 +1,280 @@
+"""
+    Очередь треков (yandex.collector): удаление, перемещение и переход к треку сравниваются с обычным списком.
+    Очередь показывает треки в том порядке, в котором они прозвучат, поэтому модель - список со страницы очереди.
+    Хранилище и кэш заменены простыми объектами: загрузка трека ждет, пока тест ее не разрешит
+"""
+import asyncio
+import random
+import typing
+
+import pytest
+
+from storage.data import TrackData
+from utils.positions import PositionSequence
+from yandex.collector import TrackQueueManager
+
+MAX_TRACKS_IN_LIST = 3
+
+
+class Storage:
+    def __init__(self, number_of_tracks: int) -> None:
+        self.total_number_of_playable_tracks: int = number_of_tracks
+
+    def try_get_album_by_id(self, album_id: int) -> None:
+        return None
+
+
+class Cache:
+    """
+        Трек с номером position имеет id = position. Загрузка ждет события is_loaded
+    """
+
+    def __init__(self, storage: Storage) -> None:
+        self._storage: Storage = storage
+        self.is_loaded: asyncio.Event = asyncio.Event()
+        self.is_loaded.set()
+        self.failed_ids: typing.Set[int] = set()
+
+    def get_any_tracks_in_range(self, min_value: int, max_value: int) -> typing.List[TrackData]:
+        max_value = min(max_value, self._storage.total_number_of_playable_tracks)
+        return [TrackData(id=position, title=str(position), available=True, duration_in_milliseconds=1000,
+                          cover_uri=None, artists=(), album_ids=(1,)) for position in range(min_value, max_value)]
+
+    async def get_downloaded_tracks_in_range(self, min_value: int, max_value: int) -> typing.List[TrackData]:
+        await self.is_loaded.wait()
+        return [track for track in self.get_any_tracks_in_range(min_value, max_value)
+                if track.id not in self.failed_ids]
+
+
+class TaskManager:
+    def __init__(self) -> None:
+        self.tasks: typing.List[asyncio.Task] = []
+
+    def add_task(self, wrapper, name: str) -> asyncio.Task:
+        task = asyncio.create_task(wrapper.task(), name=name)
+        self.tasks.append(task)
+        return task
+
+
+def create_queue(number_of_tracks: int) -> typing.Tuple[TrackQueueManager, Storage, Cache]:
+    storage = Storage(number_of_tracks)
+    cache = Cache(storage)
+    return TrackQueueManager(MAX_TRACKS_IN_LIST, TaskManager(), storage, cache), storage, cache
+
+
+def get_order(queue: TrackQueueManager) -> typing.List[int]:
+    page = queue.get_next_tracks_page(0, queue.number_of_tracks + 1)
+    assert page.total_number_of_tracks == len(page.rows)
+    assert [row.number for row in page.rows] == list(range(1, len(page.rows) + 1))
+    return [int(row.title) for row in page.rows]
+
+
+async def wait_for_upload(queue: TrackQueueManager) -> None:
+    for _ in range(100):
+        if not queue.is_loading:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("Queue was not uploaded")
+
+
+async def play_all(queue: TrackQueueManager) -> typing.List[int]:
+    """
+        Как плеер: берет загруженные треки и догружает очередь, когда она кончилась
+    """
+    played = []
+    while not queue.is_empty:
+        if queue.is_queue_tracks_empty:
+            queue.update_queue(None)
+            await wait_for_upload(queue)
+        track = queue.get_next_track()
+        if track is not None:
+            played.append(track.id)
+    return played
+
+
+def edit(queue: TrackQueueManager, model: typing.List[int], rng: random.Random) -> None:
+    """
+        Случайное изменение очереди и того же списка
+    """
+    number_of_tracks = len(model)
+    action = rng.choice(("remove", "move", "jump"))
+    index = rng.randrange(number_of_tracks)
+    if action == "remove":
+        assert queue.remove_track(index)
+        del model[index]
+    elif action == "move":
+        to_index = rng.randrange(number_of_tracks)
+        assert queue.move_track(index, to_index)
+        model.insert(to_index, model.pop(index))
+    else:
+        assert queue.jump_to_track(index)
+        del model[:index]
+
+
+def test_position_sequence_matches_list() -> None:
+    rng = random.Random(0)
+    sequence = PositionSequence()
+    model: typing.List[int] = []
+    next_position = 0
+    for _ in range(2000):
+        action = rng.randrange(6)
+        if action == 0:
+            length = rng.randrange(1, 50)
+            sequence.append_range(next_position, next_position + length)
+            model.extend(range(next_position, next_position + length))
+            next_position += length
+        elif action == 1:
+            index, length = rng.randrange(len(model) + 1), rng.randrange(1, 5)
+            sequence.insert_range(index, next_position, next_position + length)
+            model[index:index] = range(next_position, next_position + length)
+            next_position += length
+        elif action == 2 and model:
+            index = rng.randrange(len(model))
+            assert sequence.pop(index) == model.pop(index)
+        elif action == 3 and model:
+            from_index, to_index = rng.randrange(len(model)), rng.randrange(len(model))
+            position = sequence.pop(from_index)
+            sequence.insert(to_index, position)
+            model.insert(to_index, model.pop(from_index))
+        elif action == 4:
+            count = rng.randrange(10)
+            runs = sequence.pop_front(count)
+            assert [position for start, end in runs for position in range(start, end)] == model[:count]
+            del model[:count]
+        elif model:
+            index = rng.randrange(len(model))
+            assert sequence.get(index) == model[index]
+
+        assert len(sequence) == len(model)
+        start, end = sorted((rng.randrange(len(model) + 1), rng.randrange(len(model) + 1)))
+        assert [position for a, b in sequence.get_runs(start, end) for position in range(a, b)] == model[start:end]
+
+    sequence.clear()
+    assert len(sequence) == 0
+    assert sequence.get_runs(0, 10) == []
+
+
+@pytest.mark.parametrize("is_shuffle", [False, True])
+def test_queue_editing_matches_list(is_shuffle: bool) -> None:
+    async def run(seed: int) -> None:
+        rng = random.Random(seed)
+        queue, storage, cache = create_queue(30)
+        if is_shuffle:
+            queue.change_shuffle()
+        await wait_for_upload(queue)
+        model = get_order(queue)
+        assert sorted(model) == list(range(30))
+        if not is_shuffle:
+            assert model == list(range(30))
+
+        for _ in range(15):
+            # Часть изменений - пока треки загружаются
+            cache.is_loaded.clear()
+            edit(queue, model, rng)
+            assert get_order(queue) == model
+            if rng.random() < 0.5:
+                cache.is_loaded.set()
+                await wait_for_upload(queue)
+                assert get_order(queue) == model
+            if model and rng.random() < 0.3:
+                cache.is_loaded.set()
+                await wait_for_upload(queue)
+                assert queue.get_next_track().id == model.pop(0)
+                assert get_order(queue) == model
+            if not model:
+                break
+
+        cache.is_loaded.set()
+        await wait_for_upload(queue)
+        assert await play_all(queue) == model
+
+    for seed in range(20):
+        asyncio.run(run(seed))
+
+
+def test_shuffle_keeps_edited_order() -> None:
+    """
+        Выключение перемешивания: треки до места изменения остаются на своих местах,
+        остальные идут в исходном порядке
+    """
+    async def run() -> None:
+        queue, storage, cache = create_queue(20)
+        queue.change_shuffle()
+        await wait_for_upload(queue)
+        model = get_order(queue)
+        assert model != list(range(20))
+
+        assert queue.move_track(10, 0)
+        model.insert(0, model.pop(10))
+        assert get_order(queue) == model
+        await wait_for_upload(queue)
+        played = [queue.get_next_track().id]
+
+        queue.change_shuffle()
+        order = get_order(queue)
+        assert order[:10] == model[1:11]
+        assert order[10:] == sorted(order[10:])
+        assert sorted(played + order) == list(range(20))
+        assert await play_all(queue) == order
+
+    asyncio.run(run())
+
+
+def test_new_tracks_are_shuffled_after_known() -> None:
+    async def run() -> None:
+        queue, storage, cache = create_queue(10)
+        queue.change_shuffle()
+        await wait_for_upload(queue)
+        storage.total_number_of_playable_tracks = 20
+
+        order = get_order(queue)
+        assert sorted(order[:10]) == list(range(10))
+        assert sorted(order[10:]) == list(range(10, 20))
+        assert await play_all(queue) == order
+
+    asyncio.run(run())
+
+
+def test_failed_tracks_are_skipped() -> None:
+    async def run() -> None:
+        queue, storage, cache = create_queue(10)
+        cache.failed_ids = {2, 5}
+        queue.change_shuffle()
+        await wait_for_upload(queue)
+        order = get_order(queue)
+
+        played = await play_all(queue)
+        assert played == [position for position in order if position not in cache.failed_ids]
+
+    asyncio.run(run())
+
+
+def test_previous_shuffled_tracks() -> None:
+    """
+        Предыдущий трек без истории плеера восстанавливается по перестановке
+    """
+    async def run() -> None:
+        queue, storage, cache = create_queue(10)
+        queue.change_shuffle()
+        await wait_for_upload(queue)
+        order = get_order(queue)
+
+        tracks = []
+        for _ in range(5):
+            if queue.is_queue_tracks_empty:
+                queue.update_queue(None)
+                await wait_for_upload(queue)
+            tracks.append(queue.get_next_track())
+        assert [track.id for track in tracks] == order[:5]
+
+        track = tracks[-1]
+        for expected in reversed(order[:4]):
+            track = await queue.get_previous_shuffled_track(track)
+            assert track.id == expected
+        assert await queue.get_previous_shuffled_track(track) is None
+
+        # После выключения перемешивания порядок выбора забывается
+        queue.change_shuffle()
+        assert await queue.get_previous_shuffled_track(tracks[-1]) is None
+
+    asyncio.run(run())
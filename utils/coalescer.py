@@ -0,0 +1,37 @@
+"""
+    Объединение одинаковых одновременных запросов
+    Пока запрос выполняется, все остальные такие же запросы ждут его результат
+"""
+import asyncio
+import typing
+
+from core.log_utils import get_logger
+
+logger = get_logger(__name__)
+
+T = typing.TypeVar("T")
+
+
+class RequestCoalescer:
+    def __init__(self) -> None:
+        self._in_flight: typing.Dict[str, asyncio.Task] = {}
+
+    @property
+    def number_in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: str, func: typing.Callable[[], typing.Awaitable[T]]) -> T:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda completed_task: self.__remove(key, completed_task))
+        else:
+            logger.debug(f"Request {key} is already in flight, waiting for its result.")
+
+        # shield: отмена одного из ожидающих не должна отменять общий запрос
+        return await asyncio.shield(task)
+
+    def __remove(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
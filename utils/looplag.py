@@ -0,0 +1,76 @@
+"""
+    Замер задержки цикла событий
+    Раз в interval секунд ставим call_later и смотрим, насколько позже запланированного он сработал.
+    Задержка показывает, сколько ждут обработчики команд и сообщений, пока цикл занят (или ждет GIL)
+"""
+import asyncio
+import collections
+import dataclasses
+import typing
+
+from core.log_utils import get_logger
+
+logger = get_logger(__name__)
+
+INTERVAL = 0.25
+# Замеры за последний час
+MAX_SAMPLES = 14400
+
+
+@dataclasses.dataclass
+class LagStatistics:
+    number_of_samples: int
+    # Секунды
+    average: float
+    p99: float
+    max: float
+
+
+class EventLoopLagMonitor:
+    def __init__(self, interval: float = INTERVAL, max_samples: int = MAX_SAMPLES) -> None:
+        self._interval: float = interval
+        self._samples: typing.Deque[float] = collections.deque(maxlen=max_samples)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._expected_time: float = 0
+
+    def start(self) -> None:
+        if self._handle is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.__schedule()
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def get_statistics(self) -> LagStatistics:
+        samples = sorted(self._samples)
+        if not samples:
+            return LagStatistics(number_of_samples=0, average=0, p99=0, max=0)
+        return LagStatistics(number_of_samples=len(samples),
+                             average=sum(samples) / len(samples),
+                             p99=samples[min(int(len(samples) * 0.99), len(samples) - 1)],
+                             max=samples[-1])
+
+    def reset(self) -> None:
+        self._samples.clear()
+
+    def log_statistics(self) -> None:
+        """
+            Статистика с прошлого вызова
+        """
+        statistics = self.get_statistics()
+        self.reset()
+        logger.info(f"Event loop lag: samples: {statistics.number_of_samples}; "
+                    f"average: {statistics.average * 1000:.1f} ms; p99: {statistics.p99 * 1000:.1f} ms; "
+                    f"max: {statistics.max * 1000:.1f} ms.")
+
+    def __schedule(self) -> None:
+        self._expected_time = self._loop.time() + self._interval
+        self._handle = self._loop.call_later(self._interval, self.__measure)
+
+    def __measure(self) -> None:
+        self._samples.append(max(self._loop.time() - self._expected_time, 0))
+        self.__schedule()
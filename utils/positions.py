@@ -0,0 +1,161 @@
+"""
+    Последовательность номеров треков с произвольным порядком
+    Хранится как декартово дерево по неявному ключу, каждый узел - непрерывный промежуток номеров [start, end).
+    Очередь из тысяч треков подряд занимает один узел, а удаление, вставка и поиск по порядковому номеру - O(log n)
+"""
+import random
+import typing
+
+
+class _Node:
+    __slots__ = ("start", "end", "priority", "left", "right", "size")
+
+    def __init__(self, start: int, end: int, priority: float | None = None) -> None:
+        self.start: int = start
+        self.end: int = end
+        self.priority: float = random.random() if priority is None else priority
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+        # Кол-во номеров во всем поддереве
+        self.size: int = end - start
+
+
+def _get_size(node: _Node | None) -> int:
+    return node.size if node is not None else 0
+
+
+def _update(node: _Node) -> None:
+    node.size = _get_size(node.left) + (node.end - node.start) + _get_size(node.right)
+
+
+def _merge(left: _Node | None, right: _Node | None) -> _Node | None:
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _split(node: _Node | None, count: int) -> typing.Tuple[_Node | None, _Node | None]:
+    """
+        Разделяет дерево на первые count номеров и остальные
+    """
+    if node is None:
+        return None, None
+
+    left_size = _get_size(node.left)
+    length = node.end - node.start
+    if count <= left_size:
+        left, right = _split(node.left, count)
+        node.left = right
+        _update(node)
+        return left, node
+
+    if count >= left_size + length:
+        left, right = _split(node.right, count - left_size - length)
+        node.right = left
+        _update(node)
+        return node, right
+
+    # Граница проходит внутри промежутка: делим узел на два.
+    # Вторая часть получает тот же приоритет, поэтому свойства кучи сохраняются
+    middle = node.start + count - left_size
+    second = _Node(middle, node.end, node.priority)
+    second.right = node.right
+    node.end = middle
+    node.right = None
+    _update(node)
+    _update(second)
+    return node, second
+
+
+class PositionSequence:
+    def __init__(self) -> None:
+        self._root: _Node | None = None
+
+    def __len__(self) -> int:
+        return _get_size(self._root)
+
+    def append_range(self, start: int, end: int) -> None:
+        if start >= end:
+            return
+        self._root = _merge(self._root, _Node(start, end))
+
+    def insert_range(self, index: int, start: int, end: int) -> None:
+        if start >= end:
+            return
+        left, right = _split(self._root, index)
+        self._root = _merge(_merge(left, _Node(start, end)), right)
+
+    def insert(self, index: int, position: int) -> None:
+        self.insert_range(index, position, position + 1)
+
+    def get(self, index: int) -> int:
+        if index < 0 or index >= len(self):
+            raise IndexError("position sequence index out of range")
+
+        node = self._root
+        while True:
+            left_size = _get_size(node.left)
+            length = node.end - node.start
+            if index < left_size:
+                node = node.left
+            elif index < left_size + length:
+                return node.start + index - left_size
+            else:
+                index -= left_size + length
+                node = node.right
+
+    def pop(self, index: int) -> int:
+        if index < 0 or index >= len(self):
+            raise IndexError("position sequence index out of range")
+
+        left, rest = _split(self._root, index)
+        middle, right = _split(rest, 1)
+        self._root = _merge(left, right)
+        return middle.start
+
+    def pop_front(self, count: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+            Удаляет первые count номеров и возвращает их промежутками
+        """
+        front, self._root = _split(self._root, max(count, 0))
+        runs: typing.List[typing.Tuple[int, int]] = []
+        self.__collect_runs(front, 0, 0, _get_size(front), runs)
+        return runs
+
+    def get_runs(self, start: int, end: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+            Промежутки номеров, стоящих на местах [start, end). Дерево не изменяется
+        """
+        runs: typing.List[typing.Tuple[int, int]] = []
+        self.__collect_runs(self._root, 0, max(start, 0), min(end, len(self)), runs)
+        return runs
+
+    def clear(self) -> None:
+        self._root = None
+
+    def __collect_runs(self, node: _Node | None, offset: int, start: int, end: int,
+                       runs: typing.List[typing.Tuple[int, int]]) -> None:
+        if node is None or offset >= end or offset + node.size <= start:
+            return
+
+        left_size = _get_size(node.left)
+        self.__collect_runs(node.left, offset, start, end, runs)
+
+        run_offset = offset + left_size
+        length = node.end - node.start
+        low = max(start, run_offset)
+        high = min(end, run_offset + length)
+        if low < high:
+            runs.append((node.start + low - run_offset, node.start + high - run_offset))
+
+        self.__collect_runs(node.right, run_offset + length, start, end, runs)
@@ -0,0 +1,217 @@
+"""
+    Перемешанный порядок номеров треков без хранения перестановки
+    Перестановка [0, size) вычисляется по номеру шага: сеть Фейстеля на ближайшем четном числе бит
+    и cycle walking (значения вне диапазона шифруются повторно, в среднем меньше 4 раз).
+    Порядок задается seed и курсором: следующий и предыдущий номер - O(1), память не зависит от числа треков
+"""
+import random
+import typing
+
+from utils.positions import PositionSequence
+
+ROUNDS = 4
+MASK_64 = (1 << 64) - 1
+MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class RandomPermutation:
+    """
+        Биекция [0, size) -> [0, size), одна и та же для одного seed
+    """
+
+    def __init__(self, size: int, seed: int) -> None:
+        self._size: int = size
+        self._half_bits: int = max((max(size - 1, 1).bit_length() + 1) // 2, 1)
+        self._half_mask: int = (1 << self._half_bits) - 1
+        generator = random.Random(seed)
+        self._keys: typing.Tuple[int, ...] = tuple(generator.getrandbits(64) for _ in range(ROUNDS))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, index: int) -> int:
+        if index < 0 or index >= self._size:
+            raise IndexError("permutation index out of range")
+
+        value = self.__encrypt(index)
+        while value >= self._size:
+            value = self.__encrypt(value)
+        return value
+
+    def __encrypt(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._half_mask
+        for key in self._keys:
+            mixed = ((right ^ key) * MULTIPLIER) & MASK_64
+            left, right = right, left ^ ((mixed ^ (mixed >> 32)) & self._half_mask)
+        return (left << self._half_bits) | right
+
+
+class _Segment:
+    """
+        Номера, перемешанные одной перестановкой. positions после добавления не меняется
+    """
+    __slots__ = ("positions", "permutation", "cursor")
+
+    def __init__(self, positions: PositionSequence, seed: int) -> None:
+        self.positions: PositionSequence = positions
+        self.permutation: RandomPermutation = RandomPermutation(len(positions), seed)
+        # Сколько номеров уже выбрано
+        self.cursor: int = 0
+
+    def get(self, index: int) -> int:
+        """
+            index-й номер в перемешанном порядке (считая уже выбранные)
+        """
+        return self.positions.get(self.permutation.get(index))
+
+
+class ShuffledPositions:
+    """
+        Номера треков в перемешанном порядке. Номера, добавленные позже, перемешиваются отдельным отрезком
+        и идут после уже перемешанных. Выбранные номера не забываются: шаг выбора можно отменить (rewind)
+        и узнать номер любого прошлого шага (get_drawn)
+    """
+
+    def __init__(self, seed: int | None = None) -> None:
+        self._random: random.Random = random.Random(seed)
+        self._segments: typing.List[_Segment] = []
+        # Первый отрезок, в котором остались не выбранные номера
+        self._current: int = 0
+        self._length: int = 0
+        self._number_of_drawn: int = 0
+
+    def __len__(self) -> int:
+        """
+            Сколько номеров еще не выбрано
+        """
+        return self._length
+
+    @property
+    def number_of_drawn(self) -> int:
+        return self._number_of_drawn
+
+    def append(self, positions: PositionSequence) -> None:
+        """
+            positions больше нельзя изменять
+        """
+        if len(positions) == 0:
+            return
+        self._segments.append(_Segment(positions, self._random.getrandbits(64)))
+        self._length += len(positions)
+
+    def append_range(self, start: int, end: int) -> None:
+        positions = PositionSequence()
+        positions.append_range(start, end)
+        self.append(positions)
+
+    def pop_front(self, count: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+            Выбирает следующие count номеров и возвращает их промежутками
+        """
+        runs: typing.List[typing.Tuple[int, int]] = []
+        for segment, start, end in self.__advance(count):
+            for index in range(start, end):
+                self.__add_to_runs(runs, segment.get(index))
+        return runs
+
+    def skip(self, count: int) -> None:
+        self.__advance(count)
+
+    def rewind(self, count: int) -> None:
+        """
+            Отменяет последние count выборов: эти номера снова станут следующими
+        """
+        count = min(max(count, 0), self._number_of_drawn)
+        if count == 0:
+            return
+        self._number_of_drawn -= count
+        self._length += count
+        # Отрезки выбираются по порядку: все выбранные номера - в отрезках до текущего и в нем самом
+        index = min(self._current, len(self._segments) - 1)
+        while True:
+            segment = self._segments[index]
+            step = min(count, segment.cursor)
+            segment.cursor -= step
+            count -= step
+            if count == 0:
+                break
+            index -= 1
+        self._current = index
+
+    def get_drawn(self, draw: int) -> int:
+        """
+            Номер, выбранный на шаге draw (с нуля)
+        """
+        if draw < 0 or draw >= self._number_of_drawn:
+            raise IndexError("draw index out of range")
+        for segment in self._segments:
+            if draw < segment.cursor:
+                return segment.get(draw)
+            draw -= segment.cursor
+        raise IndexError("draw index out of range")
+
+    def get_runs(self, start: int, end: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+            Номера, которые будут выбраны на местах [start, end) среди не выбранных
+        """
+        runs: typing.List[typing.Tuple[int, int]] = []
+        for segment in self._segments[self._current:]:
+            if start >= end:
+                break
+            remaining = len(segment.positions) - segment.cursor
+            for index in range(segment.cursor + max(start, 0), segment.cursor + min(end, remaining)):
+                self.__add_to_runs(runs, segment.get(index))
+            start -= remaining
+            end -= remaining
+        return runs
+
+    def get_remaining_runs(self) -> typing.List[typing.Tuple[int, int]]:
+        """
+            Не выбранные номера в исходном порядке. Время и временная память - по числу выбранных номеров
+        """
+        runs: typing.List[typing.Tuple[int, int]] = []
+        for segment in self._segments[self._current:]:
+            drawn_indices = sorted(segment.permutation.get(index) for index in range(segment.cursor))
+            start = 0
+            for index in drawn_indices + [len(segment.positions)]:
+                if start < index:
+                    for run in segment.positions.get_runs(start, index):
+                        self.__add_to_runs(runs, *run)
+                start = index + 1
+        return runs
+
+    def clear(self) -> None:
+        self._segments.clear()
+        self._current = 0
+        self._length = 0
+        self._number_of_drawn = 0
+
+    def __advance(self, count: int) -> typing.List[typing.Tuple[_Segment, int, int]]:
+        """
+            Сдвигает курсор на count номеров. Возвращает выбранные места: (отрезок, начало, конец)
+        """
+        count = min(max(count, 0), self._length)
+        self._length -= count
+        self._number_of_drawn += count
+        steps = []
+        while count > 0:
+            segment = self._segments[self._current]
+            step = min(count, len(segment.positions) - segment.cursor)
+            if step > 0:
+                steps.append((segment, segment.cursor, segment.cursor + step))
+                segment.cursor += step
+                count -= step
+            if segment.cursor == len(segment.positions):
+                self._current += 1
+        while self._current < len(self._segments) and \
+                self._segments[self._current].cursor == len(self._segments[self._current].positions):
+            self._current += 1
+        return steps
+
+    @staticmethod
+    def __add_to_runs(runs: typing.List[typing.Tuple[int, int]], start: int, end: int | None = None) -> None:
+        end = start + 1 if end is None else end
+        if runs and runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], end)
+        else:
+            runs.append((start, end))
@@ -0,0 +1,238 @@
+"""
+    Общий для всего бота сервис таймеров - иерархическое колесо таймеров
+    6 уровней по 64 ячейки, шаг - 1 мс. Ячейка уровня n охватывает 64^n мс, всего колесо охватывает ~2000 лет.
+    Постановка и отмена таймера - O(1). Цикл событий будит колесо только к ближайшей занятой ячейке,
+    поэтому работа пропорциональна числу сработавших таймеров, а не числу существующих
+"""
+import asyncio
+import math
+import time
+import typing
+
+from core.log_utils import get_logger
+
+logger = get_logger(__name__)
+
+SLOT_BITS = 6
+NUMBER_OF_SLOTS = 1 << SLOT_BITS
+SLOT_MASK = NUMBER_OF_SLOTS - 1
+NUMBER_OF_LEVELS = 6
+# Длительность шага колеса в секундах
+TICK = 0.001
+# Насколько раньше срока цикл событий может вызвать callback (asyncio использует то же значение)
+CLOCK_RESOLUTION = time.get_clock_info("monotonic").resolution
+
+
+class WheelTimer:
+    """
+        Таймер в колесе. Создается через TimerWheel.schedule
+    """
+    __slots__ = ("_wheel", "_callback", "_deadline", "_remaining", "_position")
+
+    def __init__(self, wheel: "TimerWheel", callback: typing.Callable[[], None], deadline: int) -> None:
+        self._wheel: TimerWheel = wheel
+        self._callback: typing.Callable[[], None] = callback
+        # Время срабатывания в шагах колеса
+        self._deadline: int = deadline
+        # Оставшиеся время (в шагах) таймера на паузе
+        self._remaining: int | None = None
+        # Уровень и номер ячейки, в которой лежит таймер. None - таймер не ждет срабатывания
+        self._position: typing.Tuple[int, int] | None = None
+
+    @property
+    def is_pending(self) -> bool:
+        return self._position is not None
+
+    @property
+    def is_paused(self) -> bool:
+        return self._remaining is not None
+
+    @property
+    def remaining_time(self) -> float:
+        """
+            Оставшиеся время в секундах
+        """
+        if self._remaining is not None:
+            return self._remaining * TICK
+        if self._position is None:
+            return 0
+        return max(self._deadline - self._wheel.current_tick, 0) * TICK
+
+    def cancel(self) -> None:
+        self._wheel.remove(self)
+        self._remaining = None
+
+    def pause(self) -> None:
+        if self._position is None:
+            return
+        self._remaining = max(self._deadline - self._wheel.current_tick, 0)
+        self._wheel.remove(self)
+
+    def resume(self) -> None:
+        if self._remaining is None:
+            return
+        self._deadline = self._wheel.get_deadline(self._remaining * TICK)
+        self._remaining = None
+        self._wheel.insert(self)
+
+
+class TimerWheel:
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._origin: float = 0
+        # До какого шага колесо обработано
+        self._elapsed: int = 0
+        self._levels: typing.List[typing.List[typing.Set[WheelTimer]]] = [
+            [set() for _ in range(NUMBER_OF_SLOTS)] for _ in range(NUMBER_OF_LEVELS)
+        ]
+        # Бит n - в ячейке n уровня есть таймеры
+        self._occupied: typing.List[int] = [0] * NUMBER_OF_LEVELS
+        self._number_of_pending_timers: int = 0
+
+        # Единственный вызов в цикле событий, который будит колесо
+        self._wake_up_handle: asyncio.TimerHandle | None = None
+        self._wake_up_tick: int | None = None
+
+    @property
+    def number_of_pending_timers(self) -> int:
+        return self._number_of_pending_timers
+
+    @property
+    def current_tick(self) -> int:
+        if self._loop is None:
+            return 0
+        return int((self._loop.time() - self._origin) / TICK)
+
+    def schedule(self, delay: float, callback: typing.Callable[[], None]) -> WheelTimer:
+        """
+            Вызывает callback через delay секунд. Не раньше, с точностью до миллисекунды
+        """
+        timer = WheelTimer(self, callback, self.get_deadline(delay))
+        self.insert(timer)
+        return timer
+
+    def get_deadline(self, delay: float) -> int:
+        """
+            Первый шаг, который начинается не раньше чем через delay секунд от текущего момента.
+            Считается от времени цикла событий, а не от начала текущего шага, иначе таймер сработал бы до 1 мс раньше.
+            Минимум - следующий шаг, поэтому таймер, поставленный из callback, не сработает в том же шаге
+            (current_tick из-за округления может отставать на шаг, поэтому учитываем и обрабатываемый шаг)
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+            self._origin = self._loop.time()
+
+        now = self._loop.time() - self._origin
+        return max(math.ceil((now + delay) / TICK), self.current_tick + 1, self._elapsed + 1)
+
+    def insert(self, timer: WheelTimer) -> None:
+        if timer.is_pending:
+            return
+
+        self.__place(timer)
+        self._number_of_pending_timers += 1
+        self.__schedule_wake_up()
+
+    def remove(self, timer: WheelTimer) -> None:
+        if timer._position is None:
+            return
+
+        level, index = timer._position
+        slot = self._levels[level][index]
+        slot.discard(timer)
+        timer._position = None
+        self._number_of_pending_timers -= 1
+        if len(slot) == 0:
+            self._occupied[level] &= ~(1 << index)
+        # Пробуждение не переносим: лишнее пробуждение дешевле поиска следующей ячейки при каждой отмене
+
+    def log_statistics(self) -> None:
+        logger.info(f"Timer wheel: pending timers: {self._number_of_pending_timers}.")
+
+    def __get_position(self, deadline: int) -> typing.Tuple[int, int]:
+        # Уровень определяется старшей группой бит, в которой срок отличается от текущего шага
+        difference = (deadline ^ self._elapsed) | SLOT_MASK
+        level = min((difference.bit_length() - 1) // SLOT_BITS, NUMBER_OF_LEVELS - 1)
+        return level, (deadline >> (level * SLOT_BITS)) & SLOT_MASK
+
+    def __place(self, timer: WheelTimer) -> None:
+        deadline = max(timer._deadline, self._elapsed)
+        level, index = self.__get_position(deadline)
+        self._levels[level][index].add(timer)
+        timer._position = (level, index)
+        self._occupied[level] |= 1 << index
+
+    def __get_next_expiration(self) -> typing.Tuple[int, int, int] | None:
+        """
+            Ближайшая занятая ячейка: (уровень, номер, шаг начала ячейки)
+            Ячейки нижнего уровня всегда срабатывают раньше ячеек верхнего
+        """
+        for level in range(NUMBER_OF_LEVELS):
+            shift = level * SLOT_BITS
+            current_index = (self._elapsed >> shift) & SLOT_MASK
+            occupied = self._occupied[level] & ~((1 << current_index) - 1)
+            if occupied == 0:
+                continue
+
+            index = (occupied & -occupied).bit_length() - 1
+            rotation_start = self._elapsed & ~((1 << (shift + SLOT_BITS)) - 1)
+            return level, index, rotation_start + (index << shift)
+        return None
+
+    def __schedule_wake_up(self) -> None:
+        expiration = self.__get_next_expiration()
+        if expiration is None:
+            return
+
+        _, _, tick = expiration
+        if self._wake_up_handle is not None:
+            if self._wake_up_tick <= tick:
+                return
+            self._wake_up_handle.cancel()
+
+        self._wake_up_tick = tick
+        self._wake_up_handle = self._loop.call_at(self._origin + tick * TICK, self.__wake_up)
+
+    def __wake_up(self) -> None:
+        wake_up_tick = self._wake_up_tick
+        wake_up_time = self._origin + wake_up_tick * TICK
+        if self._loop.time() < wake_up_time:
+            # Цикл событий разбудил раньше срока (в пределах разрешения часов).
+            # Ждем дальше, иначе таймеры сработали бы до своей задержки
+            self._wake_up_handle = self._loop.call_at(wake_up_time + CLOCK_RESOLUTION, self.__wake_up)
+            return
+
+        self._wake_up_handle = None
+        self._wake_up_tick = None
+        self.__advance(max(self.current_tick, wake_up_tick))
+        self.__schedule_wake_up()
+
+    def __advance(self, target: int) -> None:
+        while True:
+            expiration = self.__get_next_expiration()
+            if expiration is None or expiration[2] > target:
+                break
+
+            level, index, tick = expiration
+            self._elapsed = tick
+            slot = self._levels[level][index]
+            # Таймеры достаем по одному: callback может отменить другой таймер этой же ячейки
+            while slot:
+                timer = slot.pop()
+                timer._position = None
+                if level == 0 or timer._deadline <= tick:
+                    self._number_of_pending_timers -= 1
+                    self.__fire(timer)
+                else:
+                    # Спускаем таймер на нижний уровень
+                    self.__place(timer)
+            self._occupied[level] &= ~(1 << index)
+
+        self._elapsed = max(self._elapsed, target)
+
+    @staticmethod
+    def __fire(timer: WheelTimer) -> None:
+        try:
+            timer._callback()
+        except Exception as e:
+            logger.error(f"Timer callback failed: {e}", exc_info=True)
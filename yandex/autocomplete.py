@@ -0,0 +1,180 @@
+"""
+    Подсказки для команды /play
+    Дискорд ждет ответ на автодополнение не более 3 секунд, поэтому:
+    1) сначала ищем в локальном индексе уже известных треков;
+    2) результаты поиска в Я.Музыке кэшируются по запросу;
+    3) новый ввод пользователя отменяет его предыдущий незавершенный поиск;
+    4) по истечению дедлайна отдаем лучшее, что есть в кэше.
+"""
+import asyncio
+import collections
+import dataclasses
+import time
+import typing
+
+from core.builders import YandexBuilderUrl
+from core.config import ConfigManager
+from core.log_utils import get_logger
+from requests_to_music_service.executing_requests import ExecutingRequests
+from storage.storage import Storage
+from storage.trackindex import TrackSearchIndex, IndexedTrack
+from yandex.client import YandexMusicBase
+from yandex.track import format_name_to_search
+from yandex.utils import get_track_wrapper, normalize_search
+
+logger = get_logger(__name__)
+
+
+@dataclasses.dataclass
+class AutocompleteChoice:
+    name: str
+    value: str
+
+
+@dataclasses.dataclass
+class CachedSearch:
+    choices: typing.Tuple[AutocompleteChoice, ...]
+    created_at: float
+
+
+class AutocompleteEngine:
+    def __init__(self, api: YandexMusicBase, track_index: TrackSearchIndex, config: ConfigManager) -> None:
+        self._api: YandexMusicBase = api
+        self._track_index: TrackSearchIndex = track_index
+        # Если локально нашлось меньше треков, считаем результат слабым и идем в Я.Музыку
+        self._local_min_results: int = int(config["autocomplete_local_min_results"])
+        self._max_choices: int = int(config["autocomplete_max_choices"])
+        self._deadline: float = float(config["autocomplete_deadline"])
+        self._debounce: float = float(config["autocomplete_debounce"])
+        self._cache_size: int = int(config["autocomplete_cache_size"])
+        self._cache_ttl: float = float(config["autocomplete_cache_ttl"])
+
+        # Кэш результатов поиска: нормализованный запрос -> подсказки
+        self._cache: collections.OrderedDict[str, CachedSearch] = collections.OrderedDict()
+        # Незавершенный поиск каждого пользователя
+        self._searches_by_user: typing.Dict[int, typing.Tuple[str, asyncio.Task]] = {}
+
+    async def search(self, user_id: int, guild_id: int | None, text: str) -> typing.List[AutocompleteChoice]:
+        query = normalize_search(text)
+        if query == "":
+            return []
+
+        local_choices = self.__search_local(query, guild_id)
+        if len(local_choices) >= self._local_min_results:
+            return local_choices
+
+        cached = self.__get_from_cache(query)
+        if cached is not None:
+            return self.__merge(local_choices, cached)
+
+        task = self.__get_or_create_search(user_id, query)
+        done, _ = await asyncio.wait({task}, timeout=self._deadline)
+        if task in done and not task.cancelled() and task.exception() is None:
+            return self.__merge(local_choices, task.result())
+
+        # Не успели: поиск продолжится в фоне и заполнит кэш для следующих нажатий
+        logger.debug(f"Autocomplete deadline exceeded for request: {query}.")
+        return self.__merge(local_choices, self.__get_best_cached(query))
+
+    def __search_local(self, query: str, guild_id: int | None) -> typing.List[AutocompleteChoice]:
+        found_tracks = self._track_index.search(query, guild_id, self._max_choices)
+        return [self.__get_choice_from_index(found_track.track) for found_track in found_tracks]
+
+    def __merge(self, local_choices: typing.List[AutocompleteChoice],
+                remote_choices: typing.Sequence[AutocompleteChoice]) -> typing.List[AutocompleteChoice]:
+        result = list(local_choices)
+        values = {choice.value for choice in result}
+        for choice in remote_choices:
+            if choice.value in values:
+                continue
+            result.append(choice)
+            values.add(choice.value)
+        return result[:self._max_choices]
+
+    @staticmethod
+    def __get_choice_from_index(track: IndexedTrack) -> AutocompleteChoice:
+        builder = YandexBuilderUrl()
+        if track.album_id is not None:
+            builder.set_album_id(track.album_id)
+        builder.set_track_id(track.id)
+
+        name = format_name_to_search(track.title, track.artists, track.duration_in_milliseconds // 1000)
+        return AutocompleteChoice(name=name, value=builder.get_result())
+
+    def __get_or_create_search(self, user_id: int, query: str) -> asyncio.Task:
+        previous = self._searches_by_user.get(user_id)
+        if previous is not None:
+            previous_query, previous_task = previous
+            if previous_query == query and not previous_task.done():
+                return previous_task
+            # Пользователь продолжил ввод, старый поиск больше не нужен
+            previous_task.cancel()
+
+        task = asyncio.create_task(self.__search_with_debounce(query))
+        self._searches_by_user[user_id] = (query, task)
+        task.add_done_callback(lambda completed_task: self.__remove_search(user_id, completed_task))
+        return task
+
+    def __remove_search(self, user_id: int, task: asyncio.Task) -> None:
+        # Поиск мог упасть, когда ответ по дедлайну уже отдан: забираем ошибку здесь, иначе ее не прочитает никто
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Autocomplete search failed: {task.exception()!r}.")
+
+        current = self._searches_by_user.get(user_id)
+        if current is not None and current[1] is task:
+            del self._searches_by_user[user_id]
+
+    async def __search_with_debounce(self, query: str) -> typing.Tuple[AutocompleteChoice, ...]:
+        # Если за это время пользователь нажмет еще одну клавишу, запрос к сервису не уйдет
+        await asyncio.sleep(self._debounce)
+
+        choices = await self.__search_tracks(query)
+        if choices is None:
+            # Ошибку не кэшируем: следующее нажатие повторит поиск
+            return tuple()
+        self.__put_to_cache(query, choices)
+        return choices
+
+    async def __search_tracks(self, query: str) -> typing.Tuple[AutocompleteChoice, ...] | None:
+        """
+            None - сервис не ответил
+        """
+        search_request = self._api.get_request_by_search(query, max_tracks=self._max_choices)
+        # Одна попытка: повторять запрос, когда ответ уже никому не нужен, нет смысла
+        executing = ExecutingRequests(number_of_attempts=1, delay_between_errors=0)
+        storage = Storage(executing)
+        if not await storage.add(search_request):
+            logger.debug(f"Autocomplete search failed for request: {query}.")
+            return None
+
+        tracks = storage.get_tracks_range(0, self._max_choices)
+        wrappers = [get_track_wrapper(track, storage) for track in tracks]
+        return tuple(AutocompleteChoice(name=track.get_name_to_search(), value=track.url) for track in wrappers)
+
+    def __get_from_cache(self, query: str) -> typing.Tuple[AutocompleteChoice, ...] | None:
+        cached = self._cache.get(query)
+        if cached is None:
+            return None
+
+        if time.monotonic() - cached.created_at > self._cache_ttl:
+            del self._cache[query]
+            return None
+
+        self._cache.move_to_end(query)
+        return cached.choices
+
+    def __put_to_cache(self, query: str, choices: typing.Tuple[AutocompleteChoice, ...]) -> None:
+        self._cache[query] = CachedSearch(choices=choices, created_at=time.monotonic())
+        self._cache.move_to_end(query)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def __get_best_cached(self, query: str) -> typing.Tuple[AutocompleteChoice, ...]:
+        """
+            Ищем в кэше самый длинный уже найденный префикс текущего запроса
+        """
+        for length in range(len(query) - 1, 0, -1):
+            cached = self.__get_from_cache(query[:length])
+            if cached is not None:
+                return cached
+        return tuple()
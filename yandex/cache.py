@@ -21,12 +21,10 @@ class CacheTracks(CacheTracksProtocol):
         self._config = config
 
     def get_any_tracks_in_range(self, min_value: int, max_value: int) -> typing.List[TrackData]:
-        tracks = self._storage.get_tracks_range(min_value, max_value)
-        available_tracks = [track for track in tracks if track.available]
-        return available_tracks
+        return list(self._storage.get_playable_tracks_range(min_value, max_value))
 
     async def get_downloaded_tracks_in_range(self, min_value: int, max_value: int) -> typing.List[TrackData]:
-        tracks = self._storage.get_tracks_range(min_value, max_value)
+        tracks = self._storage.get_playable_tracks_range(min_value, max_value)
 
         result = []
         # Треки которые необходимо загрузить
@@ -46,9 +44,6 @@ class CacheTracks(CacheTracksProtocol):
             # Треки, поставленные на загрузку
             loading_tracks = []
             for track_to_download in tracks_to_download:
-                if not track_to_download.available:
-                    continue
-
                 if self._config["loading_tracks_into_ram"]:
                     coro = self._tracks_loader.upload_track_to_RAM(track_to_download)
                 else:
@@ -1,7 +1,8 @@
+import os
 import typing
 from abc import ABC, abstractmethod
 
-from yandex_music import ClientAsync, Track
+from yandex_music import Track
 
 from core.log_utils import get_logger
 from core.config import ConfigManager
@@ -9,8 +10,12 @@ from requests_to_music_service.executing_requests import ExecutingRequests
 from requests_to_music_service.protocol import RequestToServiceProtocol, ExecutingRequestsProtocol, \
     RequestToInstallTrack
 from storage.data import TrackData
+from storage.registry import MetadataRegistry
+from storage.trackindex import TrackSearchIndex
 from requests_to_music_service.yandex_music import RequestToYandexMusicService, RequestToInstallYandexTrack
 from yandex.requests import RequestBuilder
+from utils.coalescer import RequestCoalescer
+from yandex.pool import YandexClientPool
 from yandex.protocol import TracksLoaderProtocol
 from yandex.utils import is_yandex_music_url
 from yandex.utils import get_track_path
@@ -23,6 +28,10 @@ class YandexMusicBase(ABC):
     async def init(self) -> None:
         raise NotImplemented
 
+    @abstractmethod
+    async def close(self) -> None:
+        raise NotImplemented
+
     @abstractmethod
     def get_request_by_url(self, url: str) -> RequestToServiceProtocol:
         raise NotImplemented
@@ -42,15 +51,27 @@ class YandexMusicBase(ABC):
 
 class YandexMusicAccount(YandexMusicBase, TracksLoaderProtocol):
 
-    def __init__(self, config: ConfigManager) -> None:
+    def __init__(self, config: ConfigManager, track_index: TrackSearchIndex | None = None,
+                 registry: MetadataRegistry | None = None) -> None:
         self._max_tracks_in_list = config["max_tracks_in_list"]
-        self._client = ClientAsync(token=config["yandex_token"])
+        self._pool = YandexClientPool(config)
+        # Одинаковые запросы от разных гильдий выполняются один раз
+        self._coalescer = RequestCoalescer()
+        self._track_index: TrackSearchIndex | None = track_index
+        self._registry: MetadataRegistry | None = registry
         self._config = config
         self._executing_requests: ExecutingRequestsProtocol = ExecutingRequests(self._config["number_of_attempts_when_requesting_music_service"],
                                                                                 self._config["delay_in_case_of_error_when_requesting_music_service"])
 
     async def init(self) -> None:
-        await self._client.init()
+        await self._pool.init()
+
+    async def close(self) -> None:
+        self._pool.log_statistics()
+        await self._pool.close()
+
+    def log_statistics(self) -> None:
+        self._pool.log_statistics()
 
     async def upload_track_to_RAM(self, track: TrackData) -> bool:
         state = await self.__download_tracks([track], True, None)
@@ -61,17 +82,17 @@ class YandexMusicAccount(YandexMusicBase, TracksLoaderProtocol):
         return state
 
     def get_request_by_url(self, url: str) -> RequestToServiceProtocol:
-        ym_request = RequestBuilder(self._config).set_url(url).get_result(self._client)
-        return RequestToYandexMusicService(ym_request)
+        ym_request = RequestBuilder(self._config).set_url(url).get_result(self._pool.get_client())
+        return RequestToYandexMusicService(ym_request, self._coalescer, self._track_index, self._registry)
 
     def get_request_from_favorite(self, index: int) -> RequestToServiceProtocol:
-        ym_request = RequestBuilder(self._config).set_is_favorite().get_result(self._client)
-        return RequestToYandexMusicService(ym_request)
+        ym_request = RequestBuilder(self._config).set_is_favorite().get_result(self._pool.get_client())
+        return RequestToYandexMusicService(ym_request, self._coalescer, self._track_index, self._registry)
 
     def get_request_by_search(self, search: str, max_tracks: int) -> RequestToServiceProtocol:
         ym_request = RequestBuilder(self._config).set_search(search).set_max_tracks(max_tracks)
-        result = ym_request.get_result(self._client)
-        return RequestToYandexMusicService(result)
+        result = ym_request.get_result(self._pool.get_client())
+        return RequestToYandexMusicService(result, self._coalescer, self._track_index, self._registry)
 
     def get_automatic_request(self, request: str, max_tracks: int) -> RequestToServiceProtocol:
         """
@@ -85,12 +106,20 @@ class YandexMusicAccount(YandexMusicBase, TracksLoaderProtocol):
         else:
             ym_request.set_search(request)
 
-        result = ym_request.get_result(self._client)
-        return RequestToYandexMusicService(result)
+        result = ym_request.get_result(self._pool.get_client())
+        return RequestToYandexMusicService(result, self._coalescer, self._track_index, self._registry)
 
     async def __download_tracks(self, tracks_data: typing.List[TrackData], ram: bool) -> bool:
+        if not ram:
+            # Уже скаченные треки (например, упреждающей загрузкой) не запрашиваем у сервиса повторно
+            tracks_data = [track for track in tracks_data if not os.path.exists(get_track_path(track))]
+            if len(tracks_data) == 0:
+                return True
+
         track_ids = [track.id for track in tracks_data]
-        tracks_ym: typing.List[Track] = await self._client.tracks(track_ids=track_ids)
+        # Все запросы одной загрузки выполняются через один и тот же аккаунт
+        client = self._pool.get_client()
+        tracks_ym: typing.List[Track] = await client.tracks(track_ids=track_ids)
         track_requests: typing.List[RequestToInstallTrack] = []
         for i in range(len(tracks_data)):
             track_ym = tracks_ym[i]
@@ -1,11 +1,15 @@
 import asyncio
+import collections
+import dataclasses
 import math
-import sys
 import typing
+import weakref
 from typing import Protocol
 
 from core.log_utils import get_logger
 from storage.protocol import TracksStorageProtocol
+from utils.positions import PositionSequence
+from utils.shuffle import ShuffledPositions
 from utils.taskmanager.taskmanager import TaskWrapperProtocol, TaskManagerProtocol
 from utils.taskmanager.wrapper import Wrapper
 from yandex.errors import TracksAlreadyBeingUploaded
@@ -16,6 +20,25 @@ from yandex.track import TrackWrapperBase
 logger = get_logger(__name__)
 
 
+@dataclasses.dataclass
+class QueueRow:
+    """
+        Строка очереди для отображения. Не требует создания TrackWrapper
+    """
+    number: int  # Номер в очереди, начиная с 1
+    title: str
+    artists: str
+    duration_in_milliseconds: int | None
+
+
+@dataclasses.dataclass
+class QueuePage:
+    offset: int
+    rows: typing.Tuple[QueueRow, ...]
+    total_number_of_tracks: int
+    is_shuffle: bool = False
+
+
 class TrackQueue(Protocol):
 
     @property
@@ -25,9 +48,15 @@ class TrackQueue(Protocol):
     def get_next_track(self) -> TrackWrapperBase | None:
         raise NotImplemented
 
-    def get_all_next_tracks(self) -> typing.Tuple[TrackWrapperBase]:
+    def peek_next_track(self) -> TrackWrapperBase | None:
+        """
+            Следующий загруженный трек без удаления из очереди
+        """
+        raise NotImplemented
+
+    def get_next_tracks_page(self, offset: int, limit: int) -> QueuePage:
         """
-            Возвращает все следующие треки, которые есть в очереди
+            Возвращает страницу следующих треков очереди
             ВАЖНО: треки не доступны для прослушивания и нужны только для отображения
         """
         raise NotImplemented
@@ -39,22 +68,52 @@ class TrackQueue(Protocol):
         raise NotImplemented
 
 
+@dataclasses.dataclass
+class QueuedTrack:
+    position: int | None  # Номер среди доступных треков хранилища. None - трек вернули из истории
+    track: TrackWrapperBase
+
+
 class TrackQueueManager(TrackQueue):
+    """
+        Очередь состоит из двух частей:
+        1) Загруженные треки (deque), готовые к проигрыванию. Треки, возвращенные из истории, всегда стоят в начале
+        2) Порядок всех остальных треков (номера в хранилище). Удаление, перемещение и переход к треку - O(log n)
+
+        При перемешивании за треками, поставленными пользователем, идут остальные в порядке случайной перестановки
+        (utils.shuffle): следующий и предыдущий трек - O(1), память не зависит от числа треков.
+        После выключения перемешивания оставшиеся треки идут в исходном порядке
+    """
+
     def __init__(self, max_tracks_in_list: int, task_manager: TaskManagerProtocol,
                  storage: TracksStorageProtocol,
                  cache: CacheTracksProtocol) -> None:
-        self._queue_tracks: typing.List[TrackWrapperBase] = []
+        self._queue_tracks: typing.Deque[QueuedTrack] = collections.deque()
 
         self._storage = storage
         self._cache: CacheTracksProtocol = cache
 
-        # В ОЗУ будем хранить не более max_tracks_in_list треков за раз
-        self._max_tracks_in_list: int = max_tracks_in_list
         self._download_task: asyncio.Task | TaskWrapperProtocol | None = None
         self._task_manager: TaskManagerProtocol = task_manager
-
-        # С какого трека начинаем закачку
-        self._current_track_index: int = 0
+        # Вызывается после завершения текущей загрузки
+        self._on_complete_action: typing.Callable[[], None] | None = None
+
+        # Номера треков, которые еще не загружены, в порядке проигрывания.
+        # При перемешивании - только треки, которые сыграют до случайных (поставленные пользователем)
+        self._order: PositionSequence = PositionSequence()
+        # Сколько треков хранилища уже попало в очередь
+        self._number_of_known_tracks: int = 0
+        # Номера треков, которые загружаются прямо сейчас: сначала из порядка, затем выбранные случайно
+        self._loading_planned_runs: typing.List[typing.Tuple[int, int]] = []
+        self._loading_drawn_runs: typing.List[typing.Tuple[int, int]] = []
+        # Шаг перемешивания, на котором выбран первый загружаемый трек
+        self._loading_first_draw: int | None = None
+
+        # Остальные треки при перемешивании. Новые треки хранилища перемешиваются отдельно и идут после них
+        self._is_shuffle: bool = False
+        self._shuffled: ShuffledPositions = ShuffledPositions()
+        # Шаг перемешивания, на котором выбран трек. Нужен, чтобы вернуться к треку, которого уже нет в истории
+        self._draws: weakref.WeakKeyDictionary[TrackWrapperBase, int] = weakref.WeakKeyDictionary()
 
         # Максимально возможное количество треков, которое намерены грузить
         self._max_tracks_in_list: int = max_tracks_in_list
@@ -65,95 +124,339 @@ class TrackQueueManager(TrackQueue):
 
     @property
     def is_empty(self) -> bool:
-        return len(self._queue_tracks) == 0
+        return self.number_of_tracks == 0
+
+    @property
+    def is_shuffle(self) -> bool:
+        return self._is_shuffle
 
     @property
     def is_queue_tracks_empty(self) -> bool:
         return len(self._queue_tracks) == 0
 
+    @property
+    def number_of_tracks(self) -> int:
+        number_of_new_tracks = max(self._storage.total_number_of_playable_tracks - self._number_of_known_tracks, 0)
+        return len(self._queue_tracks) + self.__number_of_loading_tracks + len(self._order) + \
+            len(self._shuffled) + number_of_new_tracks
+
     def add_track_first_to_queue(self, track: TrackWrapperBase) -> None:
-        self._queue_tracks.insert(0, track)
+        self._queue_tracks.appendleft(QueuedTrack(position=None, track=track))
 
     def get_next_track(self) -> TrackWrapperBase | None:
         if len(self._queue_tracks) == 0:
             return None
 
-        first_track = self._queue_tracks.pop(0)
-        return first_track
+        return self._queue_tracks.popleft().track
 
-    def get_all_next_tracks(self) -> typing.Tuple[TrackWrapperBase]:
-        current_track_index = self._current_track_index - len(self._queue_tracks)
-        if current_track_index < 0:
-            logger.error("get_all_next_tracks: current track index < 0.")
-            current_track_index = 0
+    def peek_next_track(self) -> TrackWrapperBase | None:
+        if len(self._queue_tracks) == 0:
+            return None
+
+        return self._queue_tracks[0].track
+
+    async def get_previous_shuffled_track(self, track: TrackWrapperBase) -> TrackWrapperBase | None:
+        """
+            Трек, выбранный при перемешивании перед track. Нужен, когда в истории плеера треков уже нет
+        """
+        draw = self._draws.get(track)
+        if not self._is_shuffle or draw is None or draw == 0 or draw > self._shuffled.number_of_drawn:
+            return None
 
-        tracks = self._cache.get_any_tracks_in_range(current_track_index, current_track_index + sys.maxsize)
+        position = self._shuffled.get_drawn(draw - 1)
+        tracks = await self._cache.get_downloaded_tracks_in_range(position, position + 1)
+        # Очередь могли очистить, пока трек загружался
+        if len(tracks) == 0 or self._draws.get(track) != draw:
+            return None
 
-        wrappers = tuple(get_track_wrapper(track, self._storage) for track in tracks)
-        return wrappers
+        previous_track = get_track_wrapper(tracks[0], self._storage)
+        self._draws[previous_track] = draw - 1
+        return previous_track
+
+    def change_shuffle(self) -> None:
+        """
+            Загруженные треки возвращаются в порядок.
+            При включении перемешиваются все следующие треки, при выключении оставшиеся идут в исходном порядке
+        """
+        self.__prepare_for_editing()
+        if self._is_shuffle:
+            for start, end in self._shuffled.get_remaining_runs():
+                self._order.append_range(start, end)
+            self._shuffled.clear()
+            self._draws.clear()
+        else:
+            self._shuffled.append(self._order)
+            self._order = PositionSequence()
+        self._is_shuffle = not self._is_shuffle
+        self.update_queue(None)
+        logger.debug(f"Is shuffle tracks: {self._is_shuffle}")
+
+    def remove_track(self, index: int) -> bool:
+        """
+            Удаляет трек под номером index (с нуля)
+        """
+        if index < 0 or index >= self.number_of_tracks:
+            return False
+
+        self.__prepare_for_editing()
+        if index < len(self._queue_tracks):
+            del self._queue_tracks[index]
+        else:
+            order_index = index - len(self._queue_tracks)
+            self.__plan_shuffled_tracks(order_index + 1)
+            self._order.pop(order_index)
+        self.update_queue(None)
+        return True
+
+    def move_track(self, from_index: int, to_index: int) -> bool:
+        """
+            Перемещает трек с места from_index на место to_index (с нуля)
+            Треки, возвращенные из истории, уже загружены, поэтому перемещаются только между собой
+        """
+        number_of_tracks = self.number_of_tracks
+        if from_index < 0 or from_index >= number_of_tracks or to_index < 0 or to_index >= number_of_tracks:
+            return False
+
+        self.__prepare_for_editing()
+        number_of_returned_tracks = len(self._queue_tracks)
+        if from_index < number_of_returned_tracks:
+            queued_track = self._queue_tracks[from_index]
+            del self._queue_tracks[from_index]
+            self._queue_tracks.insert(min(to_index, number_of_returned_tracks - 1), queued_track)
+        else:
+            from_order_index = from_index - number_of_returned_tracks
+            to_order_index = max(to_index, number_of_returned_tracks) - number_of_returned_tracks
+            # Трек, перемещенный среди случайных, сыграет на своем месте
+            self.__plan_shuffled_tracks(max(from_order_index, to_order_index) + 1)
+            self._order.insert(to_order_index, self._order.pop(from_order_index))
+        self.update_queue(None)
+        return True
+
+    def jump_to_track(self, index: int) -> bool:
+        """
+            Удаляет все треки перед index, трек под номером index становится следующим
+        """
+        if index < 0 or index >= self.number_of_tracks:
+            return False
+
+        self.__prepare_for_editing()
+        number_of_returned_tracks = len(self._queue_tracks)
+        if index <= number_of_returned_tracks:
+            for _ in range(index):
+                self._queue_tracks.popleft()
+        else:
+            self._queue_tracks.clear()
+            number_of_skipped_tracks = index - number_of_returned_tracks
+            number_of_skipped_shuffled_tracks = max(number_of_skipped_tracks - len(self._order), 0)
+            self._order.pop_front(number_of_skipped_tracks - number_of_skipped_shuffled_tracks)
+            # Пропуск случайных треков только сдвигает перестановку
+            self._shuffled.skip(number_of_skipped_shuffled_tracks)
+        self.update_queue(None)
+        return True
+
+    def get_next_tracks_page(self, offset: int, limit: int) -> QueuePage:
+        """
+            Сначала уже загруженные треки, затем все, что еще не загружено
+            Стоимость зависит только от размера страницы
+        """
+        self.__sync_with_storage()
+        number_of_queued_tracks = len(self._queue_tracks)
+        total_number_of_tracks = self.number_of_tracks
+        offset = max(min(offset, total_number_of_tracks), 0)
+        end = min(offset + limit, total_number_of_tracks)
+
+        rows: typing.List[QueueRow] = []
+        for number in range(offset, min(end, number_of_queued_tracks)):
+            rows.append(self.__get_row_from_wrapper(number + 1, self._queue_tracks[number].track))
+
+        number = max(offset, number_of_queued_tracks)
+        for start, stop in self.__get_not_queued_runs(number - number_of_queued_tracks, end - number_of_queued_tracks):
+            for track in self._cache.get_any_tracks_in_range(start, stop):
+                number += 1
+                rows.append(QueueRow(number=number,
+                                     title=track.title,
+                                     artists=', '.join(artist.name for artist in track.artists),
+                                     duration_in_milliseconds=track.duration_in_milliseconds))
+
+        return QueuePage(offset=offset, rows=tuple(rows), total_number_of_tracks=total_number_of_tracks,
+                         is_shuffle=self._is_shuffle)
+
+    @staticmethod
+    def __get_row_from_wrapper(number: int, track: TrackWrapperBase) -> QueueRow:
+        info = track.info(add_urls=False)
+        return QueueRow(number=number,
+                        title=info["title"],
+                        artists=info["artists"],
+                        duration_in_milliseconds=int(track.duration() * 1000))
 
     def update_queue(self, on_complete_action: typing.Callable[[], None] | None) -> None:
+        if on_complete_action is not None:
+            self._on_complete_action = on_complete_action
+
+        # Действие выполнится после текущей загрузки
         if self._download_task is not None:
             return
 
         wrapper = Wrapper()
-        if on_complete_action is not None:
-            wrapper.set_func(self.__upload_tracks_to_queue_with_action, on_complete_action=on_complete_action)
-        else:
-            wrapper.set_func(self.__upload_tracks_to_queue_without_action)
+        wrapper.set_func(self.__upload_tracks_to_queue_in_background)
         self._download_task = self._task_manager.add_task(wrapper, name="update_queue")
 
     async def upload_queue_async(self) -> None:
         if self._download_task is not None:
             raise TracksAlreadyBeingUploaded("Tracks are being loaded!")
 
-        self._download_task = asyncio.create_task(self.__upload_tracks_to_queue())
-        await self._download_task
-        self._download_task = None
-
-    async def __upload_tracks_to_queue(self) -> None:
-        if len(self._queue_tracks) >= self._max_tracks_in_list:
-            return
-
-        number_of_tracks_uploaded = len(self._queue_tracks)
-        number_tracks_to_download = self._max_tracks_in_list - number_of_tracks_uploaded
-
-        if number_tracks_to_download == 0:
-            logger.warning("No tracks found to download")
-            return
-
-        if number_tracks_to_download < 0:
-            logger.error(f"Invalid value: number tracks to download: {number_tracks_to_download}.\n"
-                         f"Max tracks in list: {self._max_tracks_in_list};"
-                         f"Number of tracks uploaded: {number_tracks_to_download}")
+        task = asyncio.create_task(self.__upload_tracks_to_queue())
+        self._download_task = task
+        try:
+            await task
+        except asyncio.CancelledError:
+            # Загрузку прервало изменение очереди, оно же запустило загрузку заново
+            if self._download_task is task:
+                raise
             return
+        self.__complete_upload()
 
-        tracks = await self._cache.get_downloaded_tracks_in_range(self._current_track_index,
-                                                                  self._current_track_index + number_tracks_to_download)
+    @property
+    def __number_of_loading_tracks(self) -> int:
+        return sum(end - start for start, end in self._loading_planned_runs + self._loading_drawn_runs)
 
-        wrappers = [get_track_wrapper(track, self._storage) for track in tracks]
+    def __sync_with_storage(self) -> None:
+        """
+            Добавляет в конец очереди треки, которые появились в хранилище
+        """
+        total_number_of_tracks = self._storage.total_number_of_playable_tracks
+        if total_number_of_tracks > self._number_of_known_tracks:
+            if self._is_shuffle:
+                self._shuffled.append_range(self._number_of_known_tracks, total_number_of_tracks)
+            else:
+                self._order.append_range(self._number_of_known_tracks, total_number_of_tracks)
+            self._number_of_known_tracks = total_number_of_tracks
+
+    def __get_not_queued_runs(self, start: int, end: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+            Номера треков, стоящих на местах [start, end) после загруженных:
+            сначала загружаемые, затем порядок, затем перемешанные
+        """
+        runs: typing.List[typing.Tuple[int, int]] = []
+        offset = 0
+        for run_start, run_end in self._loading_planned_runs + self._loading_drawn_runs:
+            low = max(start, offset)
+            high = min(end, offset + run_end - run_start)
+            if low < high:
+                runs.append((run_start + low - offset, run_start + high - offset))
+            offset += run_end - run_start
+        runs.extend(self._order.get_runs(start - offset, end - offset))
+        offset += len(self._order)
+        runs.extend(self._shuffled.get_runs(max(start - offset, 0), end - offset))
+        return runs
+
+    def __plan_shuffled_tracks(self, number_of_tracks: int) -> None:
+        """
+            Переносит в порядок столько следующих случайных треков, чтобы в нем было number_of_tracks треков.
+            Нужно для изменения трека среди случайных, стоимость - по месту изменения
+        """
+        for start, end in self._shuffled.pop_front(number_of_tracks - len(self._order)):
+            self._order.append_range(start, end)
 
-        self._queue_tracks.extend(wrappers)
-        if len(tracks) >= number_tracks_to_download and len(tracks) != number_tracks_to_download:
-            logger.error(f"The number of tracks does not match the set ones. "
-                         f"Downloaded tracks: {len(tracks)}; "
-                         f"Number tracks to download: {number_tracks_to_download}")
+    def __prepare_for_editing(self) -> None:
+        """
+            Возвращает в порядок все, что загружается или уже загружено.
+            В очереди остаются только треки из истории, остальное догрузится после изменения
+        """
+        self.__sync_with_storage()
+        if self._download_task is not None:
+            self._download_task.cancel()
+            self._download_task = None
 
-        # Обязательно len(tracks), а не number_tracks_to_download
-        # Так как не всегда мы загружаем именно столько треков сколько было передано в number_tracks_to_download
-        self._current_track_index += len(tracks)
+        runs = []
+        first_draw = self._loading_first_draw
+        for queued in self._queue_tracks:
+            if queued.position is None:
+                continue
+            draw = self._draws.get(queued.track)
+            if draw is None:
+                runs.append((queued.position, queued.position + 1))
+            elif first_draw is None or draw < first_draw:
+                first_draw = draw
+        runs.extend(self._loading_planned_runs)
+        self._loading_planned_runs = []
+        self._loading_drawn_runs = []
+        self._loading_first_draw = None
+
+        index = 0
+        for start, end in runs:
+            self._order.insert_range(index, start, end)
+            index += end - start
+        # Случайные треки загружаются подряд: они снова станут следующими в перестановке
+        if first_draw is not None:
+            self._shuffled.rewind(self._shuffled.number_of_drawn - first_draw)
+
+        self._queue_tracks = collections.deque(queued for queued in self._queue_tracks if queued.position is None)
 
-    async def __upload_tracks_to_queue_with_action(self, on_complete_action: typing.Callable[[], None]) -> None:
-        await self.__upload_tracks_to_queue_without_action()
-        on_complete_action()
+    async def __upload_tracks_to_queue(self) -> None:
+        self.__sync_with_storage()
+        number_tracks_to_download = self._max_tracks_in_list - len(self._queue_tracks)
+        if number_tracks_to_download <= 0:
+            return
 
-    async def __upload_tracks_to_queue_without_action(self) -> None:
+        planned_runs = self._order.pop_front(number_tracks_to_download)
+        number_of_planned_tracks = sum(end - start for start, end in planned_runs)
+        first_draw = self._shuffled.number_of_drawn
+        drawn_runs = self._shuffled.pop_front(number_tracks_to_download - number_of_planned_tracks)
+        if len(planned_runs) == 0 and len(drawn_runs) == 0:
+            return
+        self._loading_planned_runs = planned_runs
+        self._loading_drawn_runs = drawn_runs
+        self._loading_first_draw = first_draw if len(drawn_runs) != 0 else None
+
+        runs = planned_runs + drawn_runs
+        downloaded_tracks = await asyncio.gather(*(self._cache.get_downloaded_tracks_in_range(start, end)
+                                                   for start, end in runs))
+        downloaded_ids = {track.id for tracks in downloaded_tracks for track in tracks}
+
+        number_of_tracks = 0
+        for start, end in runs:
+            for position, track in enumerate(self._cache.get_any_tracks_in_range(start, end), start):
+                number_of_tracks += 1
+                # Трек, который не удалось скачать, пропускается
+                if track.id not in downloaded_ids:
+                    continue
+                wrapper = get_track_wrapper(track, self._storage)
+                if number_of_tracks > number_of_planned_tracks:
+                    self._draws[wrapper] = first_draw + number_of_tracks - number_of_planned_tracks - 1
+                self._queue_tracks.append(QueuedTrack(position=position, track=wrapper))
+
+        if len(downloaded_ids) != number_of_tracks:
+            logger.warning(f"Not all tracks were downloaded. "
+                           f"Downloaded tracks: {len(downloaded_ids)}; "
+                           f"Number tracks to download: {number_of_tracks}")
+        self._loading_planned_runs = []
+        self._loading_drawn_runs = []
+        self._loading_first_draw = None
+
+    async def __upload_tracks_to_queue_in_background(self) -> None:
         await self.__upload_tracks_to_queue()
+        self.__complete_upload()
+
+    def __complete_upload(self) -> None:
         self._download_task = None
 
+        on_complete_action = self._on_complete_action
+        self._on_complete_action = None
+        if on_complete_action is not None:
+            on_complete_action()
+
     def clear(self) -> None:
-        self._current_track_index = 0
         self._queue_tracks.clear()
+        self._order.clear()
+        self._number_of_known_tracks = 0
+        self._loading_planned_runs = []
+        self._loading_drawn_runs = []
+        self._loading_first_draw = None
+        self._on_complete_action = None
+        self._is_shuffle = False
+        self._shuffled.clear()
+        self._draws.clear()
 
         if self._download_task is not None:
             self._download_task.cancel()
@@ -0,0 +1,110 @@
+"""
+    Пул авторизованных клиентов Я.Музыки
+    Позволяет распределять запросы между несколькими аккаунтами
+"""
+import asyncio
+import typing
+
+from yandex_music import ClientAsync
+
+from core.config import ConfigManager
+from core.log_utils import get_logger
+from yandex.transport import PooledRequest
+
+logger = get_logger(__name__)
+
+
+class YandexAccount:
+    """
+        Один аккаунт: клиент и его транспорт
+    """
+
+    def __init__(self, index: int, token: str | None, config: ConfigManager) -> None:
+        self._index: int = index
+        self._request: PooledRequest = PooledRequest(config)
+        self._client: ClientAsync = ClientAsync(token=token, request=self._request)
+        self._is_initialized: bool = False
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def client(self) -> ClientAsync:
+        return self._client
+
+    @property
+    def in_flight(self) -> int:
+        return self._request.in_flight
+
+    @property
+    def is_available(self) -> bool:
+        return self._is_initialized and not self._request.is_throttled
+
+    @property
+    def throttled_until(self) -> float:
+        return self._request.throttled_until
+
+    async def init(self) -> bool:
+        try:
+            await self._client.init()
+            self._is_initialized = True
+        except Exception as e:
+            logger.error(f"Account {self._index}: failed to initialize the client: {e}.")
+            self._is_initialized = False
+        return self._is_initialized
+
+    async def close(self) -> None:
+        await self._request.close()
+
+    def log_statistics(self) -> None:
+        logger.info(f"Account {self._index}: in flight: {self.in_flight}; available: {self.is_available}.")
+        self._request.log_statistics()
+
+
+class YandexClientPool:
+    """
+        Выбирает клиента для каждого запроса:
+        сначала доступные аккаунты, среди них - с наименьшим кол-вом выполняющихся запросов
+    """
+
+    def __init__(self, config: ConfigManager) -> None:
+        tokens = self.__get_tokens(config)
+        self._accounts: typing.List[YandexAccount] = [YandexAccount(index, token, config)
+                                                      for index, token in enumerate(tokens)]
+
+    @property
+    def number_of_accounts(self) -> int:
+        return len(self._accounts)
+
+    async def init(self) -> None:
+        results = await asyncio.gather(*(account.init() for account in self._accounts))
+        logger.info(f"Initialized {sum(results)} of {len(self._accounts)} Yandex Music accounts.")
+
+    async def close(self) -> None:
+        await asyncio.gather(*(account.close() for account in self._accounts))
+
+    def get_client(self) -> ClientAsync:
+        return self.get_account().client
+
+    def get_account(self) -> YandexAccount:
+        available_accounts = [account for account in self._accounts if account.is_available]
+        if len(available_accounts) != 0:
+            return min(available_accounts, key=lambda account: account.in_flight)
+
+        # Все аккаунты ограничены, берем тот, который освободится раньше остальных
+        logger.warning("All Yandex Music accounts are unavailable.")
+        return min(self._accounts, key=lambda account: account.throttled_until)
+
+    def log_statistics(self) -> None:
+        for account in self._accounts:
+            account.log_statistics()
+
+    @staticmethod
+    def __get_tokens(config: ConfigManager) -> typing.List[str | None]:
+        tokens = config["yandex_tokens"]
+        if tokens:
+            return [token.strip() for token in tokens.split(",") if token.strip()]
+
+        # Один аккаунт, как и раньше
+        return [config["yandex_token"]]
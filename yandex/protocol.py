@@ -8,6 +8,7 @@ class CacheTracksProtocol(Protocol):
     """
         Сохраняет треки в кэше
         Является оберткой над requests
+        Номера треков считаются только по доступным для прослушивания трекам
     """
 
     def get_any_tracks_in_range(self, min_value: int, max_value: int) -> typing.List[TrackData]:
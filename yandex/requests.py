@@ -11,7 +11,7 @@ from core.enumes import MusicCommandType
 from core.log_utils import get_logger
 from yandex.data import YandexMusicRequestData
 from yandex.errors import YandexMusicDataCouldNotBeFound
-from yandex.utils import pattern_yandex_body
+from yandex.utils import pattern_yandex_body, normalize_url, normalize_search
 
 logger = get_logger(__name__)
 
@@ -22,6 +22,14 @@ class RequestToYandexMusicBase(ABC):
         self._client = ym_client
         self._max_tracks = max_tracks
 
+    @property
+    def key(self) -> str | None:
+        """
+            Ключ запроса. Одинаковые запросы имеют одинаковый ключ
+            None - запрос ни с чем не объединяется
+        """
+        return None
+
     @abstractmethod
     async def get_data(self) -> YandexMusicRequestData:
         """
@@ -44,6 +52,10 @@ class RequestForTracksByUrl(RequestToYandexMusicBase):
         super().__init__(config, ym_client, max_tracks)
         self._url = url
 
+    @property
+    def key(self) -> str | None:
+        return f"url:{normalize_url(self._url)}"
+
     async def get_data(self) -> YandexMusicRequestData | None:
         data_about_url = self.__get_info_about_url(self._url)
         keys = data_about_url.keys()
@@ -177,6 +189,10 @@ class RequestForTracksBySearch(RequestToYandexMusicBase):
         super().__init__(config, ym_client, max_tracks)
         self._search = search
 
+    @property
+    def key(self) -> str | None:
+        return f"search:{self._max_tracks}:{normalize_search(self._search)}"
+
     async def get_data(self) -> YandexMusicRequestData:
         data = YandexMusicRequestData(command_type=MusicCommandType.SEARCH, artist=None, album=None, playlist=None,
                                       track=None, search_tracks=None)
@@ -0,0 +1,163 @@
+"""
+    Упреждающая подготовка первой подсказки /play
+    Пока пользователь видит подсказки, получаем данные и скачиваем трек из первой из них.
+    Если пользователь выберет именно ее, команда /play начнется без ожидания запроса и загрузки.
+"""
+import asyncio
+import collections
+import dataclasses
+import os
+import time
+import typing
+
+from core.config import ConfigManager
+from core.log_utils import get_logger
+from requests_to_music_service.executing_requests import ExecutingRequests
+from requests_to_music_service.protocol import RequestToServiceProtocol
+from storage.data import TrackData
+from yandex.client import YandexMusicAccount
+from yandex.track import TrackWrapperBase
+from utils.timerwheel import TimerWheel, WheelTimer
+from yandex.utils import normalize_url, get_track_path
+
+logger = get_logger(__name__)
+
+
+@dataclasses.dataclass
+class Speculation:
+    url: str
+    # Ссылка без домена и параметров, по ней сравниваем выбор пользователя
+    key: str
+    request: RequestToServiceProtocol
+    created_at: float
+    task: asyncio.Task | None = None
+    timer: WheelTimer | None = None
+    # Запись в бюджете, если начата загрузка файла
+    reservation: typing.Tuple[float, int] | None = None
+
+
+class SpeculativeResolver:
+    def __init__(self, api: YandexMusicAccount, config: ConfigManager, timer_wheel: TimerWheel) -> None:
+        self._api: YandexMusicAccount = api
+        self._timer_wheel: TimerWheel = timer_wheel
+        self._is_enabled: bool = config.get_bool("speculative_autocomplete")
+        self._lifetime: float = float(config["speculative_lifetime"])
+        # Сколько байт можем потратить впустую за окно времени
+        self._budget_in_bytes: int = int(float(config["speculative_download_budget_mb"]) * 1024 * 1024)
+        self._budget_window: float = float(config["speculative_budget_window"])
+        # Упреждающая работа не должна занимать больше N загрузок одновременно
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(int(config["speculative_max_concurrent"]))
+
+        self._speculations: typing.Dict[int, Speculation] = {}
+        # (время, байты) упреждающих загрузок, которые не пригодились или еще ждут выбора
+        self._spent: typing.Deque[typing.Tuple[float, int]] = collections.deque()
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._is_enabled
+
+    def prepare(self, guild_id: int, url: str) -> None:
+        """
+            Вызывается из автодополнения для первой подсказки
+        """
+        if not self._is_enabled:
+            return
+
+        key = normalize_url(url)
+        current = self._speculations.get(guild_id)
+        if current is not None:
+            if current.key == key:
+                return
+            self.__discard(guild_id)
+
+        # Запрос строим по исходной ссылке: без домена сервис ее не распознает
+        speculation = Speculation(url=url, key=key, request=self._api.get_request_by_url(url),
+                                  created_at=time.monotonic())
+        speculation.task = asyncio.create_task(self.__resolve(speculation))
+        speculation.timer = self._timer_wheel.schedule(self._lifetime, lambda: self.__expire(guild_id, speculation))
+        self._speculations[guild_id] = speculation
+
+    def take(self, guild_id: int, request: str) -> RequestToServiceProtocol | None:
+        """
+            Возвращает подготовленный запрос, если пользователь выбрал именно его
+            Любой другой выбор отменяет подготовку
+        """
+        speculation = self._speculations.get(guild_id)
+        if speculation is None:
+            return None
+
+        is_fresh = time.monotonic() - speculation.created_at <= self._lifetime
+        if not is_fresh or speculation.key != normalize_url(request):
+            self.__discard(guild_id)
+            return None
+
+        # Подготовка не удалась: /play выполнит запрос заново со всеми попытками
+        if speculation.task is not None and speculation.task.done() and not speculation.request.is_loaded:
+            self.__discard(guild_id)
+            return None
+
+        # Если подготовка еще идет, повторный запрос к сервису присоединится к ней (см. RequestCoalescer)
+        del self._speculations[guild_id]
+        if speculation.timer is not None:
+            speculation.timer.cancel()
+        if speculation.reservation is not None and speculation.reservation in self._spent:
+            # Загрузка пригодилась, бюджет не тратим
+            self._spent.remove(speculation.reservation)
+        logger.debug(f"Speculative request {speculation.url} is used.")
+        return speculation.request
+
+    async def __resolve(self, speculation: Speculation) -> None:
+        async with self._semaphore:
+            # Одна попытка: это лишь предположение, повторять запрос нет смысла
+            executing = ExecutingRequests(number_of_attempts=1, delay_between_errors=0)
+            data = await executing.processing(speculation.request)
+            if data is None:
+                return
+
+            # Скачиваем только одиночный трек, плейлисты и альбомы слишком дорого угадывать
+            tracks = data.album.tracks if data.album is not None and data.playlist is None else tuple()
+            if len(tracks) != 1 or not tracks[0].available:
+                return
+
+            track = tracks[0]
+            if os.path.exists(get_track_path(track)):
+                return
+
+            size = self.__estimate_size(track)
+            if not self.__has_budget(size):
+                logger.debug(f"Speculative download of {track.title} is skipped: budget is exhausted.")
+                return
+
+            # Учитываем загрузку сразу: отмененная на середине загрузка тоже тратит трафик
+            speculation.reservation = (time.monotonic(), size)
+            self._spent.append(speculation.reservation)
+            # Отмененная загрузка сама удаляет свой временный файл
+            await self._api.upload_track_to_hard_drive(track)
+
+    def __expire(self, guild_id: int, speculation: Speculation) -> None:
+        if self._speculations.get(guild_id) is speculation:
+            logger.debug(f"Speculative request {speculation.url} expired.")
+            self.__discard(guild_id)
+
+    def __discard(self, guild_id: int) -> None:
+        speculation = self._speculations.pop(guild_id, None)
+        if speculation is None:
+            return
+
+        if speculation.timer is not None:
+            speculation.timer.cancel()
+        if speculation.task is not None:
+            speculation.task.cancel()
+
+    def __has_budget(self, size: int) -> bool:
+        now = time.monotonic()
+        while len(self._spent) != 0 and now - self._spent[0][0] > self._budget_window:
+            self._spent.popleft()
+
+        spent = sum(item[1] for item in self._spent)
+        return spent + size <= self._budget_in_bytes
+
+    @staticmethod
+    def __estimate_size(track: TrackData) -> int:
+        duration_in_seconds = (track.duration_in_milliseconds or 0) / 1000
+        return int(duration_in_seconds * TrackWrapperBase.bitrate_in_kbps * 1000 / 8)
@@ -3,13 +3,23 @@ import typing
 from abc import ABC, abstractmethod
 
 from core.builders import YandexBuilderUrl
-from core.ffmpeg_utils import get_duration_track
 from core.log_utils import get_logger
-from core.path_utils import check_existence_of_file
 
 logger = get_logger(__name__)
 
 
+def format_duration(duration_in_seconds: int) -> str:
+    minutes, seconds = divmod(duration_in_seconds, 60)
+    return "{:02d}:{:02d}".format(minutes, seconds)
+
+
+def format_name_to_search(title: str, artists: str, duration_in_seconds: int) -> str:
+    """
+        Имя трека в подсказках /play
+    """
+    return f"🎵 {title} - {artists} [{format_duration(duration_in_seconds)}]"
+
+
 class ArtistBuilder:
     def __init__(self, artist_id: int, name: str) -> None:
         self._artist_id = artist_id
@@ -276,22 +286,16 @@ class TrackWrapper(TrackWrapperBase):
         return None
 
     def duration(self) -> float:
+        """
+            Длительность из ответа сервиса. 0 - неизвестна, тогда плеер берет ее из профилей запуска FFmpeg
+        """
         if self._duration_ms is not None:
             seconds, milliseconds = divmod(self._duration_ms, 1000)
             return seconds
-
-        if not self.__contains_track_in_storage():
-            logger.error(
-                "Before determining the duration of a track, you need to set the track. Use try_download(_async)")
-            return 0
-
-        duration = get_duration_track(self._path)
-        return duration
+        return 0
 
     def duration_str(self) -> str:
-        duration_in_seconds = int(self.duration())
-        minutes, seconds = divmod(duration_in_seconds, 60)
-        return "{:02d}:{:02d}".format(minutes, seconds)
+        return format_duration(int(self.duration()))
 
     def cover_url(self, size=1000) -> str | None:
         if self._uri is None:
@@ -333,14 +337,10 @@ class TrackWrapper(TrackWrapperBase):
 
     def get_name_to_search(self) -> str:
         artists = ', '.join([artist.name for artist in self._artists])
-        duration = self.duration_str()
-        return f"🎵 {self._title} - {artists} [{duration}]"
+        return format_name_to_search(self._title, artists, int(self.duration()))
 
     def __get_yandex_music_url(self, size=1000) -> str:
         url = self._uri
         url = url.replace("%%", '')
         url = f"https://{url}m{size}x{size}"
         return url
-
-    def __contains_track_in_storage(self) -> bool:
-        return check_existence_of_file(self._path)
@@ -0,0 +1,241 @@
+"""
+    Транспортный слой для клиента Я.Музыки
+    Держим постоянные keep-alive соединения вместо создания новой сессии на каждый запрос
+"""
+import asyncio
+import dataclasses
+import time
+import typing
+
+import aiohttp
+from yandex_music.exceptions import BadRequestError, NetworkError, NotFoundError, TimedOutError, UnauthorizedError, \
+    YandexMusicError
+from yandex_music.utils.request_async import Request, USER_AGENT, default_timeout
+
+from core.config import ConfigManager
+from core.log_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclasses.dataclass
+class TransportStatistics:
+    """
+        Статистика использования соединений одного пула
+    """
+    requests: int = 0
+    created_connections: int = 0
+    reused_connections: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+    errors: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.created_connections + self.reused_connections
+        if total == 0:
+            return 0
+        return self.reused_connections / total
+
+
+class ConnectionPool:
+    """
+        Сессия aiohttp с собственным коннектором, таймаутом и статистикой
+        Создается лениво, так как сессии нужен запущенный event loop
+    """
+
+    def __init__(self, name: str, limit: int, timeout: float, keepalive_timeout: float, dns_cache_ttl: int) -> None:
+        self._name: str = name
+        self._limit: int = limit
+        self._timeout: float = timeout
+        self._keepalive_timeout: float = keepalive_timeout
+        self._dns_cache_ttl: int = dns_cache_ttl
+        self._session: aiohttp.ClientSession | None = None
+        self._statistics: TransportStatistics = TransportStatistics()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+
+    @property
+    def statistics(self) -> TransportStatistics:
+        return self._statistics
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._limit,
+                                             keepalive_timeout=self._keepalive_timeout,
+                                             ttl_dns_cache=self._dns_cache_ttl,
+                                             use_dns_cache=True)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self._timeout),
+                                                  trace_configs=[self.__create_trace_config()])
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is None:
+            return
+
+        await self._session.close()
+        self._session = None
+
+    def __create_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self.__on_request_start)
+        trace_config.on_connection_create_end.append(self.__on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self.__on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(self.__on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(self.__on_dns_cache_miss)
+        trace_config.on_request_exception.append(self.__on_request_exception)
+        return trace_config
+
+    async def __on_request_start(self, *_) -> None:
+        self._statistics.requests += 1
+
+    async def __on_connection_create_end(self, *_) -> None:
+        self._statistics.created_connections += 1
+
+    async def __on_connection_reuseconn(self, *_) -> None:
+        self._statistics.reused_connections += 1
+
+    async def __on_dns_cache_hit(self, *_) -> None:
+        self._statistics.dns_cache_hits += 1
+
+    async def __on_dns_cache_miss(self, *_) -> None:
+        self._statistics.dns_cache_misses += 1
+
+    async def __on_request_exception(self, *_) -> None:
+        self._statistics.errors += 1
+
+
+class PooledRequest(Request):
+    """
+        Замена стандартного Request из yandex_music
+        Метаданные (get/post) и загрузка файлов (retrieve/download) идут через разные пулы
+    """
+
+    def __init__(self, config: ConfigManager, client=None, headers=None, proxy_url=None) -> None:
+        keepalive_timeout = float(config["yandex_keepalive_timeout"])
+        dns_cache_ttl = int(config["yandex_dns_cache_ttl"])
+
+        self._metadata_pool = ConnectionPool("metadata",
+                                             limit=int(config["yandex_metadata_pool_size"]),
+                                             timeout=float(config["yandex_metadata_timeout"]),
+                                             keepalive_timeout=keepalive_timeout,
+                                             dns_cache_ttl=dns_cache_ttl)
+        self._media_pool = ConnectionPool("media",
+                                          limit=int(config["yandex_media_pool_size"]),
+                                          timeout=float(config["yandex_media_timeout"]),
+                                          keepalive_timeout=keepalive_timeout,
+                                          dns_cache_ttl=dns_cache_ttl)
+        # Сколько секунд аккаунт не используется после ограничения со стороны сервиса
+        self._throttle_cooldown: float = float(config["yandex_throttle_cooldown"])
+        # Кол-во выполняющихся запросов
+        self._in_flight: int = 0
+        # До какого момента (time.monotonic) аккаунт считается ограниченным
+        self._throttled_until: float = 0
+        super().__init__(client=client, headers=headers, proxy_url=proxy_url, timeout=self._metadata_pool.timeout)
+
+    @property
+    def statistics(self) -> typing.Dict[str, TransportStatistics]:
+        return {
+            self._metadata_pool.name: self._metadata_pool.statistics,
+            self._media_pool.name: self._media_pool.statistics
+        }
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def is_throttled(self) -> bool:
+        return self._throttled_until > time.monotonic()
+
+    @property
+    def throttled_until(self) -> float:
+        return self._throttled_until
+
+    def mark_throttled(self) -> None:
+        self._throttled_until = time.monotonic() + self._throttle_cooldown
+        logger.warning(f"The account is throttled and removed from rotation for {self._throttle_cooldown} seconds.")
+
+    async def get(self, url: str, params: dict = None, timeout=default_timeout, **kwargs) -> dict | str:
+        result = await self.__request(self._metadata_pool, "GET", url, timeout,
+                                      params=params, headers=self.headers, **kwargs)
+        return self._parse(result).get_result()
+
+    async def post(self, url, data=None, timeout=default_timeout, **kwargs) -> dict | str:
+        result = await self.__request(self._metadata_pool, "POST", url, timeout,
+                                      data=data, headers=self.headers, **kwargs)
+        return self._parse(result).get_result()
+
+    async def retrieve(self, url, timeout=default_timeout, **kwargs) -> bytes:
+        return await self.__request(self._media_pool, "GET", url, timeout, **kwargs)
+
+    async def close(self) -> None:
+        await self._metadata_pool.close()
+        await self._media_pool.close()
+
+    def log_statistics(self) -> None:
+        for name, statistics in self.statistics.items():
+            logger.info(f"Transport pool {name}: requests: {statistics.requests}; "
+                        f"created connections: {statistics.created_connections}; "
+                        f"reused connections: {statistics.reused_connections} ({statistics.reuse_ratio:.0%}); "
+                        f"dns cache hits: {statistics.dns_cache_hits}; errors: {statistics.errors}.")
+
+    async def __request(self, pool: ConnectionPool, method: str, url: str, timeout, **kwargs) -> bytes:
+        """
+            Повторяет Request._request_wrapper, но использует постоянную сессию пула
+        """
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["User-Agent"] = USER_AGENT
+        total = pool.timeout if timeout is default_timeout else timeout
+
+        self._in_flight += 1
+        try:
+            session = pool.get_session()
+            async with session.request(method, url, headers=headers, proxy=self.proxy_url,
+                                       timeout=aiohttp.ClientTimeout(total=total), **kwargs) as response:
+                content = await response.read()
+                status = response.status
+        except asyncio.TimeoutError as e:
+            raise TimedOutError from e
+        except aiohttp.ClientError as e:
+            raise NetworkError(e) from e
+        finally:
+            self._in_flight -= 1
+
+        if 200 <= status <= 299:
+            return content
+
+        self._raise_for_status(status, content)
+
+    def _raise_for_status(self, status: int, content: bytes) -> typing.NoReturn:
+        """
+            Ошибки разбираем так же, как это делает библиотека
+        """
+        try:
+            message = self._parse(content).get_error()
+        except YandexMusicError:
+            message = "Unknown HTTPError"
+
+        if status in (401, 403, 429):
+            # Сервис ограничил аккаунт, убираем его из ротации
+            self.mark_throttled()
+
+        if status in (401, 403):
+            raise UnauthorizedError(message)
+        if status == 400:
+            raise BadRequestError(message)
+        if status == 404:
+            raise NotFoundError(message)
+        if status in (409, 413):
+            raise NetworkError(message)
+        if status == 502:
+            raise NetworkError("Bad Gateway")
+
+        raise NetworkError(f"{message} ({status}): {content}")
@@ -4,6 +4,7 @@
 """
 import re
 import typing
+from urllib.parse import urlsplit
 
 from core.log_utils import get_logger
 from core.path_utils import check_existence_of_file, get_path_to_music
@@ -53,6 +54,19 @@ def is_yandex_music_url(url: str) -> bool:
     return True
 
 
+def normalize_url(url: str) -> str:
+    """
+        Приводит ссылку к виду, по которому можно сравнивать запросы:
+        без домена, параметров и лишних слэшей
+    """
+    path = urlsplit(url.strip()).path
+    return path.strip('/')
+
+
+def normalize_search(search: str) -> str:
+    return ' '.join(search.split()).casefold()
+
+
 def get_track_path(track: TrackData | TrackWrapperBase) -> str:
     name = get_name_track(track)
     return get_path_to_music(name)